@@ -1,6 +1,8 @@
 import jwt
 import os
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, status, Depends
@@ -13,6 +15,11 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# bcrypt is CPU bound, so it runs on a bounded pool instead of the event loop
+BCRYPT_MAX_WORKERS = int(os.getenv("BCRYPT_MAX_WORKERS", "4"))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "0"))  # 0 = unbounded
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
@@ -24,6 +31,95 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool and keeps queue-depth metrics.
+
+    bcrypt releases the GIL while hashing, so threads are enough to keep the
+    event loop free. At most ``max_workers`` hashes run at once; callers past
+    that wait in the queue, and once ``max_queue`` callers are waiting new
+    requests are rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, max_workers: int = BCRYPT_MAX_WORKERS, max_queue: int = BCRYPT_MAX_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+        return self._semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run a blocking bcrypt call on the pool"""
+        if self.max_queue and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry shortly"
+            )
+        
+        slots = self._slots()
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            await slots.acquire()
+        finally:
+            self.queued -= 1
+        
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            slots.release()
+
+    def stats(self) -> dict:
+        """Current pool metrics"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher()
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await password_hasher.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -61,4 +157,10 @@ def verify_token(token: str) -> dict:
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Dependency to get current authenticated user"""
     token = credentials.credentials
-    return verify_token(token)
\ No newline at end of file
+    return verify_token(token)
+
+def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[dict]:
+    """Dependency for endpoints that also accept anonymous callers"""
+    if not credentials:
+        return None
+    return verify_token(credentials.credentials)
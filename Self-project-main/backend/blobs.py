@@ -0,0 +1,146 @@
+import base64
+import binascii
+import unicodedata
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+from bson import Binary, ObjectId
+from fastapi import HTTPException, status
+
+# Chunked blob store for uploaded files.
+#
+# Same layout as GridFS (``blobs.files`` + ``blobs.chunks``, chunks keyed by
+# (files_id, n)), so the standard tools can read it, but written with plain
+# Motor calls so a blob can be written and read back one chunk at a time.
+# Documents that own a file keep only its id and a little metadata.
+
+BUCKET = "blobs"
+CHUNK_SIZE = 255 * 1024
+
+def files_collection(db):
+    return db[f"{BUCKET}.files"]
+
+def chunks_collection(db):
+    return db[f"{BUCKET}.chunks"]
+
+async def create_blob_indexes(db):
+    await chunks_collection(db).create_index([("files_id", 1), ("n", 1)], unique=True)
+    await files_collection(db).create_index([("filename", 1), ("uploadDate", 1)])
+    await files_collection(db).create_index("metadata.owner_id")
+    # Only unclaimed anonymous uploads carry a client_ip
+    await files_collection(db).create_index("metadata.client_ip", sparse=True)
+
+class BlobWriter:
+    """Writes a blob chunk by chunk.
+
+    Data passed to write() is buffered up to CHUNK_SIZE and flushed as one
+    chunk document. The files document is only inserted by close(), so a
+    blob is never visible half written; abort() removes written chunks.
+    """
+
+    def __init__(self, db, filename: Optional[str], content_type: Optional[str], metadata: Optional[dict] = None):
+        self.db = db
+        self.file_id = ObjectId()
+        self.filename = filename
+        self.content_type = content_type or "application/octet-stream"
+        self.metadata = metadata or {}
+        self.length = 0
+        self._buffer = bytearray()
+        self._next_chunk = 0
+
+    async def write(self, data: bytes):
+        self._buffer.extend(data)
+        self.length += len(data)
+        while len(self._buffer) >= CHUNK_SIZE:
+            await self._flush(bytes(self._buffer[:CHUNK_SIZE]))
+            del self._buffer[:CHUNK_SIZE]
+
+    async def _flush(self, data: bytes):
+        await chunks_collection(self.db).insert_one({
+            "files_id": self.file_id,
+            "n": self._next_chunk,
+            "data": Binary(data)
+        })
+        self._next_chunk += 1
+
+    async def close(self) -> dict:
+        """Flush the last chunk and publish the blob. Returns its files document."""
+        if self._buffer:
+            await self._flush(bytes(self._buffer))
+            self._buffer.clear()
+        info = {
+            "_id": self.file_id,
+            "length": self.length,
+            "chunkSize": CHUNK_SIZE,
+            "uploadDate": datetime.utcnow(),
+            "filename": self.filename,
+            "contentType": self.content_type,
+            "metadata": self.metadata
+        }
+        await files_collection(self.db).insert_one(info)
+        return info
+
+    async def abort(self):
+        await chunks_collection(self.db).delete_many({"files_id": self.file_id})
+
+async def put_blob(db, data: bytes, filename: Optional[str], content_type: Optional[str], metadata: Optional[dict] = None) -> dict:
+    """Store a complete blob. Returns its files document."""
+    writer = BlobWriter(db, filename, content_type, metadata)
+    try:
+        await writer.write(data)
+        return await writer.close()
+    except BaseException:
+        await writer.abort()
+        raise
+
+async def get_blob_info(db, file_id: ObjectId) -> Optional[dict]:
+    return await files_collection(db).find_one({"_id": file_id})
+
+async def iter_blob(db, file_id: ObjectId) -> AsyncIterator[bytes]:
+    """Yield a blob's content one chunk at a time"""
+    cursor = chunks_collection(db).find({"files_id": file_id}, {"data": 1}).sort("n", 1).batch_size(4)
+    async for chunk in cursor:
+        yield bytes(chunk["data"])
+
+async def read_blob(db, file_id: ObjectId) -> bytes:
+    return b"".join([chunk async for chunk in iter_blob(db, file_id)])
+
+async def delete_blob(db, file_id: ObjectId):
+    await files_collection(db).delete_one({"_id": file_id})
+    await chunks_collection(db).delete_many({"files_id": file_id})
+
+def content_disposition(disposition: str, filename: str) -> str:
+    """Content-Disposition header value for a user-supplied file name.
+
+    Quotes, backslashes and control characters are dropped. The plain
+    ``filename`` is an ASCII fallback; the real name goes in the RFC 5987
+    ``filename*`` parameter, so the header stays latin-1 safe.
+    """
+    cleaned = "".join(
+        ch for ch in filename
+        if ch not in '"\\' and unicodedata.category(ch) not in ("Cc", "Cf", "Zl", "Zp")
+    ).strip() or "download"
+    fallback = "".join(
+        ch if 32 <= ord(ch) < 127 else "_"
+        for ch in unicodedata.normalize("NFKD", cleaned)
+        if not unicodedata.combining(ch)
+    )
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(cleaned, safe='')}"
+
+def decode_base64_document(data: str, content_type: Optional[str] = None) -> tuple:
+    """Decode a base64 upload, with or without a data: URI prefix.
+
+    Returns (bytes, content_type); the prefix's type is used when no type
+    was given.
+    """
+    if data.startswith("data:") and "," in data:
+        header, data = data.split(",", 1)
+        if not content_type:
+            content_type = header[5:].split(";")[0] or None
+    try:
+        return base64.b64decode(data, validate=False), content_type
+    except (binascii.Error, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid document data"
+        )
@@ -1,8 +1,56 @@
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from typing import Optional
+from models import ContractStatus
 import uuid
 
+# Contract state machine.
+# action -> statuses it may start from, resulting status, which parties may
+# perform it, the signature it records (if any) and the error shown when the
+# contract is in any other status.
+CONTRACT_TRANSITIONS = {
+    "provider_accept": {
+        "from": [ContractStatus.PENDING_PROVIDER_APPROVAL],
+        "to": ContractStatus.AWAITING_STUDENT_CONFIRMATION,
+        "actors": ["provider_id"],
+        "signature": "provider_signature",
+        "error": "Contract is not pending approval"
+    },
+    "provider_reject": {
+        "from": [ContractStatus.PENDING_PROVIDER_APPROVAL],
+        "to": ContractStatus.REJECTED,
+        "actors": ["provider_id"],
+        "signature": None,
+        "error": "Contract is not pending approval"
+    },
+    "student_confirm": {
+        "from": [ContractStatus.AWAITING_STUDENT_CONFIRMATION],
+        "to": ContractStatus.ACTIVE,
+        "actors": ["student_id"],
+        "signature": "student_signature",
+        "error": "Contract is not awaiting your confirmation"
+    },
+    "cancel": {
+        "from": [
+            ContractStatus.DRAFT,
+            ContractStatus.PENDING_PROVIDER_APPROVAL,
+            ContractStatus.AWAITING_STUDENT_CONFIRMATION,
+            ContractStatus.ACTIVE
+        ],
+        "to": ContractStatus.CANCELLED,
+        "actors": ["student_id", "provider_id"],
+        "signature": None,
+        "error": "Contract can no longer be cancelled"
+    },
+    "complete": {
+        "from": [ContractStatus.ACTIVE],
+        "to": ContractStatus.COMPLETED,
+        "actors": ["student_id"],
+        "signature": None,
+        "error": "Only ACTIVE contracts can be marked as completed"
+    },
+}
+
 def generate_contract_terms(service: dict, provider: dict, student: dict, duration_months: int, start_date) -> str:
     """Generate auto-contract terms based on service type"""
     
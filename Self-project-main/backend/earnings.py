@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Provider earnings rollups.
+#
+# ``provider_earnings`` holds running totals per provider, kept up to date by
+# record_earnings() on every payment so the dashboard never scans payments:
+#   period "all"   -> lifetime totals, one document per provider
+#   period "day"   -> one document per provider per UTC day ("2025-01-31")
+#   period "month" -> one document per provider per UTC month ("2025-01")
+# Each holds earnings (provider share), gross, platform_fees and
+# transactions. rebuild_earnings() recomputes everything from payments.
+
+TOTAL_FIELDS = ("earnings", "gross", "platform_fees", "transactions")
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+def rollup_id(provider_id, period: str, bucket: Optional[str] = None) -> str:
+    return f"{provider_id}:{period}" if bucket is None else f"{provider_id}:{period}:{bucket}"
+
+def bucket_start(period: str, when: datetime) -> datetime:
+    """First instant of the day or month that ``when`` falls in"""
+    if period == "month":
+        return datetime(when.year, when.month, 1)
+    return datetime(when.year, when.month, when.day)
+
+def earnings_rows(payment: dict) -> list:
+    """(rollup _id, identifying fields, increments) for each rollup a payment touches"""
+    paid_at = payment["paid_at"]
+    provider_id = payment["provider_id"]
+    increments = {
+        "earnings": payment["provider_amount"],
+        "gross": payment["amount"],
+        "platform_fees": payment["platform_fee"],
+        "transactions": 1
+    }
+    rows = [(rollup_id(provider_id, "all"), {"provider_id": provider_id, "period": "all"}, increments)]
+    for period, fmt in PERIOD_FORMATS.items():
+        bucket = paid_at.strftime(fmt)
+        rows.append((
+            rollup_id(provider_id, period, bucket),
+            {"provider_id": provider_id, "period": period, "bucket": bucket, "start": bucket_start(period, paid_at)},
+            increments
+        ))
+    return rows
+
+def earnings_updates(payment: dict) -> list:
+    """Upserts that add one payment to its provider's total, day and month"""
+    updates = []
+    for doc_id, identity, increments in earnings_rows(payment):
+        update = {"$inc": increments, "$setOnInsert": identity}
+        if identity["period"] == "all":
+            update["$max"] = {"last_payment_at": payment["paid_at"]}
+        updates.append(UpdateOne({"_id": doc_id}, update, upsert=True))
+    return updates
+
+async def record_earnings(db, payment: dict):
+    """Fold one payment into the provider's rollups in a single round trip"""
+    await db.provider_earnings.bulk_write(earnings_updates(payment), ordered=False)
+
+def serialize_bucket(doc: dict) -> dict:
+    return {
+        "bucket": doc["bucket"],
+        "start": doc["start"],
+        "earnings": round(doc.get("earnings", 0), 2),
+        "gross": round(doc.get("gross", 0), 2),
+        "platform_fees": round(doc.get("platform_fees", 0), 2),
+        "transactions": doc.get("transactions", 0)
+    }
+
+async def rebuild_earnings(db, apply: bool = True) -> dict:
+    """Recompute every provider's rollups from the payments collection.
+
+    Returns how many rollup documents were expected and how many were
+    missing or wrong. With ``apply=False`` nothing is written.
+    """
+    expected = {}
+    async for payment in db.payments.find(
+        {}, {"provider_id": 1, "amount": 1, "provider_amount": 1, "platform_fee": 1, "paid_at": 1}
+    ):
+        for doc_id, identity, increments in earnings_rows(payment):
+            doc = expected.setdefault(doc_id, dict(identity, **{field: 0 for field in TOTAL_FIELDS}))
+            for field, amount in increments.items():
+                doc[field] += amount
+            if identity["period"] == "all":
+                doc["last_payment_at"] = max(doc.get("last_payment_at") or payment["paid_at"], payment["paid_at"])
+
+    drifted = []
+    current_ids = set()
+    async for doc in db.provider_earnings.find({}):
+        current_ids.add(doc["_id"])
+        wanted = expected.get(doc["_id"])
+        if wanted is None or any(
+            round(doc.get(field, 0), 2) != round(wanted[field], 2) for field in TOTAL_FIELDS
+        ):
+            drifted.append(doc["_id"])
+    drifted.extend(doc_id for doc_id in expected if doc_id not in current_ids)
+
+    if apply and drifted:
+        batch = []
+        for doc_id in drifted:
+            if doc_id in expected:
+                batch.append(UpdateOne({"_id": doc_id}, {"$set": expected[doc_id]}, upsert=True))
+        stale = [doc_id for doc_id in drifted if doc_id not in expected]
+        for start in range(0, len(batch), 1000):
+            await db.provider_earnings.bulk_write(batch[start:start + 1000], ordered=False)
+        if stale:
+            await db.provider_earnings.delete_many({"_id": {"$in": stale}})
+
+    return {"expected": len(expected), "drifted": len(drifted), "drifted_ids": drifted[:100], "applied": apply}
+
+async def main():
+    apply = "--check" not in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    result = await rebuild_earnings(db, apply=apply)
+    action = "Fixed" if apply else "Found"
+    print(f"💰 Checked {result['expected']} earnings rollups. {action} {result['drifted']} missing or drifted.")
+    for rollup in result["drifted_ids"]:
+        print(f"   - {rollup}")
+
+    client.close()
+
+if __name__ == "__main__":
+    # python earnings.py          -> rebuild rollups from payments
+    # python earnings.py --check  -> report drift only
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+# Internal pub/sub.
+#
+# Code that changes state publishes an event on a topic ("chat", "contracts",
+# "services"); every worker runs the handlers subscribed to that topic, so a
+# WebSocket held by one worker hears about a message sent through another.
+# Events on a topic reach each worker's handlers in the order they were
+# published, one at a time.
+#
+# Backends (EVENT_BUS_BACKEND):
+#   memory -> handlers run in the publishing process; fine for one worker
+#   mongo  -> events are appended to a capped collection that every worker
+#             tails; its insertion order is the delivery order everywhere
+#
+# A tailable cursor has to scan the capped collection from its start, so the
+# mongo bus keeps one open across empty batches and reopens it only when it
+# dies (an error, or the collection was empty). A reopened cursor skips, in
+# natural order, up to the last event delivered; if the cap already evicted
+# that one it falls back to events newer than CLOCK_SKEW before the newest
+# seen, less the ids already delivered.
+
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "memory")
+EVENTS_COLLECTION = "events"
+EVENTS_CAPPED_BYTES = int(os.getenv("EVENTS_CAPPED_BYTES", str(64 * 1024 * 1024)))
+TAIL_RETRY_SECONDS = 0.1
+# How far behind the newest event a publisher's clock may be; a reopened
+# tail that lost its place looks back this far
+CLOCK_SKEW = timedelta(seconds=5)
+
+Handler = Callable[[str, dict], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+class EventBus:
+    """Topic subscriptions and in-order dispatch shared by the backends"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self.published = 0
+        self.dispatched = 0
+        self.handler_errors = 0
+        self.publish_errors = 0
+
+    def subscribe(self, topic: str, handler: Handler):
+        self._handlers[topic].append(handler)
+
+    async def _dispatch(self, topic: str, payload: dict):
+        for handler in self._handlers.get(topic, ()):
+            try:
+                await handler(topic, payload)
+            except Exception:
+                # One failing handler must not stop delivery to the others
+                self.handler_errors += 1
+                logger.exception("Event handler failed for topic %s", topic)
+        self.dispatched += 1
+
+    async def publish(self, topic: str, payload: dict):
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "published": self.published,
+            "dispatched": self.dispatched,
+            "handler_errors": self.handler_errors,
+            "publish_errors": self.publish_errors
+        }
+
+class InMemoryEventBus(EventBus):
+    """Dispatches in the publishing process. A lock per topic keeps its events in order."""
+
+    backend = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def publish(self, topic: str, payload: dict):
+        self.published += 1
+        lock = self._locks.setdefault(topic, asyncio.Lock())
+        async with lock:
+            await self._dispatch(topic, payload)
+
+class MongoEventBus(EventBus):
+    """Appends events to a capped collection and dispatches what a tailable cursor returns"""
+
+    backend = "mongo"
+
+    def __init__(self, db, collection: str = EVENTS_COLLECTION, capped_bytes: int = EVENTS_CAPPED_BYTES):
+        super().__init__()
+        self.db = db
+        self.collection_name = collection
+        self.capped_bytes = capped_bytes
+        self._task: Optional[asyncio.Task] = None
+        self._last_id: Optional[ObjectId] = None  # last event delivered, in natural order
+        # Newest event timestamp seen, and the ids delivered within CLOCK_SKEW of it
+        self._since: Optional[datetime] = None
+        self._recent_ids: set = set()
+        self._recent = deque()  # (ts, _id) in delivery order
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    async def publish(self, topic: str, payload: dict):
+        """Best effort: callers publish after their own write has committed,
+        so a failed insert is logged and counted instead of failing them"""
+        try:
+            await self.collection.insert_one({
+                "_id": ObjectId(),
+                "topic": topic,
+                "payload": payload,
+                "ts": datetime.utcnow()
+            })
+        except PyMongoError:
+            self.publish_errors += 1
+            logger.exception("Could not publish event on topic %s", topic)
+            return
+        self.published += 1
+
+    async def start(self):
+        try:
+            await self.db.create_collection(self.collection_name, capped=True, size=self.capped_bytes)
+        except CollectionInvalid:
+            pass  # already there
+        # Only events published from now on: start after the newest one there
+        now = datetime.utcnow()
+        self._since = now.replace(microsecond=now.microsecond // 1000 * 1000)  # BSON dates are ms
+        newest = await self.collection.find_one({}, {"ts": 1}, sort=[("$natural", -1)])
+        if newest:
+            self._remember(newest)
+        self._task = asyncio.create_task(self._tail())
+
+    def _remember(self, event: dict):
+        self._last_id = event["_id"]
+        self._since = max(self._since, event["ts"])
+        self._recent.append((event["ts"], event["_id"]))
+        self._recent_ids.add(event["_id"])
+        horizon = self._since - CLOCK_SKEW
+        while self._recent and self._recent[0][0] < horizon:
+            self._recent_ids.discard(self._recent.popleft()[1])
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _open(self):
+        """A tailable cursor from the start of the collection, and whether to
+        skip up to the last event delivered (False once the cap evicted it)"""
+        cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+        if self._last_id is None:
+            return cursor, False
+        kept = await self.collection.find_one({"_id": self._last_id}, {"_id": 1})
+        return cursor, kept is not None
+
+    async def _tail(self):
+        cursor = None
+        skipping = False
+        while True:
+            try:
+                if cursor is None or not cursor.alive:
+                    cursor, skipping = await self._open()
+                # Ends on an empty batch; the cursor stays alive for the next one
+                async for event in cursor:
+                    if skipping:
+                        skipping = event["_id"] != self._last_id
+                        continue
+                    if event["_id"] in self._recent_ids or event["ts"] < self._since - CLOCK_SKEW:
+                        continue
+                    self._remember(event)
+                    await self._dispatch(event["topic"], event["payload"])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError:
+                logger.exception("Event bus tail failed; reopening")
+                cursor = None
+            if cursor is None or not cursor.alive:
+                # Dead when the collection was empty, or after an error
+                await asyncio.sleep(TAIL_RETRY_SECONDS)
+
+def create_event_bus(db, backend: str = EVENT_BUS_BACKEND) -> EventBus:
+    if backend == "mongo":
+        return MongoEventBus(db)
+    if backend == "memory":
+        return InMemoryEventBus()
+    raise ValueError(f"Unknown EVENT_BUS_BACKEND {backend!r} (expected 'memory' or 'mongo')")
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+MAX_KEY_LENGTH = 255
+
+# Idempotency-Key store.
+#
+# One document per (user, endpoint, key) in ``idempotency_keys``. The _id is
+# built from those three parts, so the mandatory _id index is the unique
+# index and a claim is a single insert; the only other index is the TTL
+# index on ``expires_at``. A claimed key is "in_progress" until the handler
+# returns, then holds the response that every retry gets back.
+#
+# An in-progress claim is a lease: it carries ``locked_until`` and a random
+# ``claim`` token. If the worker dies mid-request, a retry after the lease
+# runs out takes the claim over instead of getting 409s until the TTL. The
+# lease must outlast the slowest request; release and completion only touch
+# the key while it still holds this request's token.
+
+def request_fingerprint(payload: dict) -> str:
+    """Stable hash of a request body, to spot a key reused for another request"""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+async def run_idempotent(
+    db,
+    key: Optional[str],
+    user_id: str,
+    scope: str,
+    payload: dict,
+    handler: Callable[[], Awaitable[dict]]
+) -> dict:
+    """Run ``handler`` at most once per Idempotency-Key.
+
+    Without a key the handler simply runs. With a key, the first request
+    runs it and stores the response; retries with the same key and body get
+    the stored response, a different body is a 422 and a retry that arrives
+    while the first request is still running is a 409, until its lease
+    expires. A failed request releases its key so it can be retried, so
+    handlers must raise only before their first committed write.
+    """
+    if not key:
+        return await handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+        )
+
+    key_id = f"{user_id}:{scope}:{key}"
+    fingerprint = request_fingerprint(payload)
+    now = datetime.utcnow()
+    claim = uuid.uuid4().hex
+    locked_until = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": key_id,
+            "fingerprint": fingerprint,
+            "status": "in_progress",
+            "claim": claim,
+            "locked_until": locked_until,
+            "response": None,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+        })
+    except DuplicateKeyError:
+        stored = await db.idempotency_keys.find_one({"_id": key_id})
+        if stored is None:
+            # Expired or released between the insert and the read
+            return await run_idempotent(db, key, user_id, scope, payload, handler)
+        if stored["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if stored["status"] == "completed":
+            return stored["response"]
+        # Still in progress: take the claim over only if its lease ran out
+        taken = await db.idempotency_keys.find_one_and_update(
+            {
+                "_id": key_id,
+                "status": "in_progress",
+                "$or": [{"locked_until": {"$lt": now}}, {"locked_until": {"$exists": False}}]
+            },
+            {"$set": {"claim": claim, "locked_until": locked_until}},
+            projection={"_id": 1}
+        )
+        if not taken:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+
+    try:
+        response = await handler()
+    except BaseException:
+        await db.idempotency_keys.delete_one({"_id": key_id, "claim": claim, "status": "in_progress"})
+        raise
+
+    await db.idempotency_keys.update_one(
+        {"_id": key_id, "claim": claim},
+        {"$set": {"status": "completed", "response": jsonable_encoder(response)}, "$unset": {"locked_until": ""}}
+    )
+    return response
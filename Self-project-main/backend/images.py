@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+from blobs import put_blob, read_blob, delete_blob, decode_base64_document, get_blob_info
+
+# Service image variants.
+#
+# When a listing is created or updated each of its images is decoded once and
+# re-encoded at a few sizes on a process pool (Pillow work is CPU bound and
+# would otherwise stall the event loop). The variants go to the blob store and
+# the service keeps their URLs in ``image_variants``, one entry per image:
+#   {"original": ..., "thumb": ..., "medium": ..., "large": ...}
+# List endpoints only send thumbnails; the detail view gets the large ones.
+# External image URLs are kept as they are, since the server never fetches them.
+# A listing only ever deletes blobs its provider owns: another provider's
+# /api/images URL is copied in, not reused, and variants of dropped images
+# are deleted by the caller once the listing write has committed.
+
+IMAGE_VARIANTS = {
+    "thumb": 320,
+    "medium": 800,
+    "large": 1600,
+}
+VARIANT_QUALITY = 82
+IMAGE_MAX_WORKERS = int(os.getenv("IMAGE_MAX_WORKERS", "2"))
+IMAGE_URL = re.compile(r"^/api/images/([0-9a-f]{24})$")
+
+def image_url(file_id: ObjectId) -> str:
+    return f"/api/images/{file_id}"
+
+def render_variants(data: bytes) -> dict:
+    """Decode an image and encode every variant as JPEG. Runs on the process pool."""
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+    variants = {}
+    for name, max_edge in IMAGE_VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        variant.save(buffer, "JPEG", quality=VARIANT_QUALITY, optimize=True, progressive=True)
+        variants[name] = buffer.getvalue()
+    return variants
+
+class ImageProcessor:
+    """Runs render_variants on a lazily started process pool"""
+
+    def __init__(self, max_workers: int = IMAGE_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def render(self, data: bytes) -> dict:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), render_variants, data)
+        except Image.DecompressionBombError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="One of the images has too many pixels"
+            )
+        except (UnidentifiedImageError, OSError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not read one of the images"
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+image_processor = ImageProcessor()
+
+async def load_original(db, image: str, owner_id: ObjectId) -> tuple:
+    """Return (original URL, bytes) for an image reference; bytes is None for external URLs.
+
+    Inline base64 images, and stored images that belong to someone else,
+    are stored as a new blob owned by ``owner_id`` on the way.
+    """
+    match = IMAGE_URL.match(image)
+    if match:
+        info = await get_blob_info(db, ObjectId(match.group(1)))
+        if not info:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Image {image} not found"
+            )
+        data = await read_blob(db, info["_id"])
+        if info.get("metadata", {}).get("owner_id") == owner_id:
+            return image, data
+        content_type = info.get("contentType")
+    elif image.startswith(("http://", "https://")):
+        return image, None
+    else:
+        data, content_type = decode_base64_document(image)
+    info = await put_blob(
+        db, data, None, content_type or "image/jpeg",
+        metadata={"owner_id": owner_id, "kind": "service_image", "attached": True}
+    )
+    return image_url(info["_id"]), data
+
+async def build_image_variants(db, image: str, owner_id: ObjectId) -> dict:
+    """Store the variants of one image and return its ``image_variants`` entry"""
+    original, data = await load_original(db, image, owner_id)
+    if data is None:
+        return {"original": original, **{name: original for name in IMAGE_VARIANTS}}
+
+    rendered = await image_processor.render(data)
+    entry = {"original": original}
+    for name, variant in rendered.items():
+        info = await put_blob(
+            db, variant, f"{name}.jpg", "image/jpeg",
+            metadata={"owner_id": owner_id, "kind": "service_image", "attached": True, "variant": name}
+        )
+        entry[name] = image_url(info["_id"])
+    return entry
+
+async def process_service_images(db, images: list, owner_id: ObjectId, existing: Optional[list] = None) -> list:
+    """Build ``image_variants`` for a listing's images.
+
+    Images that already have an entry in ``existing`` (sent back as any of
+    its URLs) are reused. Nothing is deleted here: once the listing is saved,
+    pass ``dropped_image_variants(existing, entries)`` to delete_image_variants.
+    """
+    existing = existing or []
+    by_url = {url: entry for entry in existing for url in entry.values()}
+
+    pending = {
+        index: build_image_variants(db, image, owner_id)
+        for index, image in enumerate(images) if image not in by_url
+    }
+
+    built = dict(zip(pending, await asyncio.gather(*pending.values())))
+    return [built[index] if index in built else by_url[image] for index, image in enumerate(images)]
+
+def dropped_image_variants(existing: Optional[list], entries: list) -> list:
+    """Entries of ``existing`` that ``entries`` no longer uses"""
+    return [entry for entry in existing or [] if not any(entry == kept for kept in entries)]
+
+async def delete_image_variants(db, entry: dict, owner_id: ObjectId):
+    """Remove the stored original and variants of a dropped image, if ``owner_id`` owns them"""
+    for url in set(entry.values()):
+        match = IMAGE_URL.match(url)
+        if not match:
+            continue
+        info = await get_blob_info(db, ObjectId(match.group(1)))
+        if info and info.get("metadata", {}).get("owner_id") == owner_id:
+            await delete_blob(db, info["_id"])
+
+def variant_urls(service_doc: dict, name: str) -> list:
+    """One URL per listing image at the given size, falling back to the stored image"""
+    entries = service_doc.get("image_variants")
+    if entries is None:
+        return service_doc.get("images", [])
+    return [entry[name] for entry in entries]
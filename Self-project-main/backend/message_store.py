@@ -0,0 +1,289 @@
+import asyncio
+import os
+import sys
+from typing import List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+from pagination import apply_cursor, decode_cursor, sort_spec
+
+load_dotenv()
+
+# Message storage layouts (MESSAGE_STORAGE).
+#
+#   documents -> one document per message in ``messages``, indexed on
+#                (conversation_id, timestamp, _id)
+#   dual      -> reads ``messages``, writes both layouts (cutover only)
+#   buckets   -> messages packed BUCKET_SIZE at a time into
+#                ``message_buckets`` documents, one index entry per bucket:
+#                {conversation_id, seq, count, first_ts, last_ts, closed, messages: [...]}
+#
+# Each bucket keeps its own ``count``, so an offset page first reads the
+# counts (no messages) to find the buckets it spans, then just those; a
+# changed BUCKET_SIZE or a partly full bucket never skews it. Appends are a
+# single conditional $push into the open bucket; when it is full the next one
+# is inserted and every older bucket is marked ``closed``, so a larger
+# BUCKET_SIZE never refills an old bucket. The unique (conversation_id, seq)
+# index settles concurrent roll-overs. All stores return plain message dicts, so MessageResponse does
+# not change.
+#
+# Cutover: run with MESSAGE_STORAGE=dual, then `python message_store.py`
+# until it reports nothing left to pack, then switch to buckets. Packing is
+# incremental (messages whose _id is not in a bucket yet), and dual mode only
+# appends to conversations that already have buckets, so nothing written
+# during the cutover is lost. Going back from dual is safe; going back from
+# buckets is not - messages sent in buckets mode exist only in buckets.
+
+MESSAGE_STORAGE = os.getenv("MESSAGE_STORAGE", "documents")
+BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", "200"))
+
+class DocumentMessageStore:
+    """One document per message"""
+
+    layout = "documents"
+
+    async def create_indexes(self, db):
+        await db.messages.create_index([("conversation_id", 1), ("timestamp", 1), ("_id", 1)])
+
+    async def append(self, db, msg_doc: dict):
+        await db.messages.insert_one(msg_doc)
+
+    async def page(self, db, conversation_id: str, skip: int, limit: int) -> List[dict]:
+        """Oldest first, by offset"""
+        cursor = db.messages.find({"conversation_id": conversation_id}).sort("timestamp", 1).skip(skip).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def page_after(self, db, conversation_id: str, token: str, limit: int) -> List[dict]:
+        """Oldest first, continuing after a cursor"""
+        cursor = db.messages.find(
+            apply_cursor({"conversation_id": conversation_id}, "timestamp", token, descending=False)
+        ).sort(sort_spec("timestamp", descending=False)).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def latest(self, db, conversation_id: str, limit: int) -> List[dict]:
+        """The newest ``limit`` messages, oldest first"""
+        cursor = db.messages.find({"conversation_id": conversation_id}).sort(sort_spec("timestamp")).limit(limit)
+        return list(reversed(await cursor.to_list(length=limit)))
+
+class BucketMessageStore:
+    """Messages packed into fixed-size per-conversation buckets"""
+
+    layout = "buckets"
+
+    def __init__(self, bucket_size: int = BUCKET_SIZE):
+        self.bucket_size = max(1, bucket_size)
+
+    async def create_indexes(self, db):
+        await db.message_buckets.create_index([("conversation_id", 1), ("seq", 1)], unique=True)
+
+    async def _contains(self, db, conversation_id: str, message_id) -> bool:
+        return await db.message_buckets.find_one(
+            {"conversation_id": conversation_id, "messages._id": message_id}, {"_id": 1}
+        ) is not None
+
+    async def append(self, db, msg_doc: dict, dedupe: bool = False):
+        """Append a message to the conversation's newest bucket.
+
+        With ``dedupe`` a message that is already in a bucket is left alone;
+        the packer and dual writes, which can race on the same message, use it.
+        """
+        conversation_id = msg_doc["conversation_id"]
+        entry = {k: v for k, v in msg_doc.items() if k != "conversation_id"}
+        if dedupe and await self._contains(db, conversation_id, entry["_id"]):
+            return
+        while True:
+            bucket = await db.message_buckets.find_one_and_update(
+                {
+                    "conversation_id": conversation_id,
+                    "count": {"$lt": self.bucket_size},
+                    "closed": {"$ne": True},
+                    "messages._id": {"$ne": entry["_id"]}
+                },
+                {
+                    "$push": {"messages": entry},
+                    "$inc": {"count": 1},
+                    "$max": {"last_ts": entry["timestamp"]}
+                },
+                sort=[("seq", -1)],
+                projection={"_id": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if bucket:
+                return
+            if dedupe and await self._contains(db, conversation_id, entry["_id"]):
+                return  # pushed by the racing writer meanwhile
+
+            # Newest bucket is full (or there is none yet): open the next one
+            newest = await db.message_buckets.find_one(
+                {"conversation_id": conversation_id}, {"seq": 1}, sort=[("seq", -1)]
+            )
+            seq = newest["seq"] + 1 if newest else 0
+            try:
+                await db.message_buckets.insert_one({
+                    "conversation_id": conversation_id,
+                    "seq": seq,
+                    "count": 1,
+                    "first_ts": entry["timestamp"],
+                    "last_ts": entry["timestamp"],
+                    "messages": [entry]
+                })
+            except DuplicateKeyError:
+                continue  # another append opened it first; push into that one
+            await db.message_buckets.update_many(
+                {"conversation_id": conversation_id, "seq": {"$lt": seq}, "closed": {"$ne": True}},
+                {"$set": {"closed": True}}
+            )
+            return
+
+    def _flatten(self, conversation_id: str, buckets: List[dict]) -> List[dict]:
+        return [
+            {**message, "conversation_id": conversation_id}
+            for bucket in buckets for message in bucket["messages"]
+        ]
+
+    async def page(self, db, conversation_id: str, skip: int, limit: int) -> List[dict]:
+        """Oldest first, by offset: reads the bucket counts, then only the buckets the page spans"""
+        spanned = []
+        start = skip
+        position = 0
+        counts = db.message_buckets.find({"conversation_id": conversation_id}, {"seq": 1, "count": 1}).sort("seq", 1)
+        async for bucket in counts:
+            if position + bucket["count"] > skip and position < skip + limit:
+                if not spanned:
+                    start = skip - position
+                spanned.append(bucket["seq"])
+            position += bucket["count"]
+            if position >= skip + limit:
+                break
+        if not spanned:
+            return []
+        cursor = db.message_buckets.find(
+            {"conversation_id": conversation_id, "seq": {"$gte": spanned[0], "$lte": spanned[-1]}},
+            {"messages": 1}
+        ).sort("seq", 1)
+        messages = self._flatten(conversation_id, await cursor.to_list(length=len(spanned)))
+        return messages[start:start + limit]
+
+    async def page_after(self, db, conversation_id: str, token: str, limit: int) -> List[dict]:
+        """Oldest first, continuing after a cursor"""
+        if not token:
+            return await self.page(db, conversation_id, 0, limit)
+        after_ts, after_id = decode_cursor(token)
+        cursor = db.message_buckets.find(
+            {"conversation_id": conversation_id, "last_ts": {"$gte": after_ts}},
+            {"messages": 1}
+        ).sort("seq", 1)
+        page = []
+        async for bucket in cursor:
+            page.extend(
+                message for message in self._flatten(conversation_id, [bucket])
+                if (message["timestamp"], message["_id"]) > (after_ts, after_id)
+            )
+            if len(page) >= limit:
+                break
+        page.sort(key=lambda message: (message["timestamp"], message["_id"]))
+        return page[:limit]
+
+    async def latest(self, db, conversation_id: str, limit: int) -> List[dict]:
+        """The newest ``limit`` messages, oldest first, reading buckets newest first"""
+        cursor = db.message_buckets.find(
+            {"conversation_id": conversation_id}, {"messages": 1}
+        ).sort("seq", -1).batch_size(limit // self.bucket_size + 2)
+        newest_first = []
+        async for bucket in cursor:
+            newest_first.extend(reversed(self._flatten(conversation_id, [bucket])))
+            if len(newest_first) >= limit:
+                break
+        return list(reversed(newest_first[:limit]))
+
+class DualWriteMessageStore(DocumentMessageStore):
+    """Reads per-message documents, also appends to conversations already packed"""
+
+    layout = "dual"
+
+    def __init__(self, buckets: Optional[BucketMessageStore] = None):
+        self.buckets = buckets or BucketMessageStore()
+
+    async def create_indexes(self, db):
+        await super().create_indexes(db)
+        await self.buckets.create_indexes(db)
+
+    async def append(self, db, msg_doc: dict):
+        await super().append(db, msg_doc)
+        # Unpacked conversations are left to the packer, which keeps their order
+        if await db.message_buckets.find_one({"conversation_id": msg_doc["conversation_id"]}, {"_id": 1}):
+            await self.buckets.append(db, msg_doc, dedupe=True)
+
+def create_message_store(layout: str = MESSAGE_STORAGE):
+    if layout == "buckets":
+        return BucketMessageStore()
+    if layout == "dual":
+        return DualWriteMessageStore()
+    if layout == "documents":
+        return DocumentMessageStore()
+    raise ValueError(f"Unknown MESSAGE_STORAGE {layout!r} (expected 'documents', 'dual' or 'buckets')")
+
+async def pack_messages_into_buckets(db, apply: bool = True, store: Optional[BucketMessageStore] = None) -> dict:
+    """Copy per-message documents that are not in a bucket yet into buckets.
+
+    Incremental: a conversation without buckets is packed whole, one that
+    has buckets gets its missing messages appended in order. ``messages`` is
+    left as it is.
+    """
+    store = store or BucketMessageStore()
+    packed_conversations = 0
+    packed_messages = 0
+    for conversation_id in await db.messages.distinct("conversation_id"):
+        packed_ids = {
+            message["_id"]
+            async for bucket in db.message_buckets.find({"conversation_id": conversation_id}, {"messages._id": 1})
+            for message in bucket["messages"]
+        }
+        cursor = db.messages.find({"conversation_id": conversation_id}).sort(sort_spec("timestamp", descending=False))
+        messages = [
+            {k: v for k, v in message.items() if k not in ("conversation_id", "is_read")}
+            async for message in cursor
+            if message["_id"] not in packed_ids
+        ]
+        if not messages:
+            continue
+        if apply and packed_ids:
+            for message in messages:
+                # Dual writes may push the same message meanwhile
+                await store.append(db, {**message, "conversation_id": conversation_id}, dedupe=True)
+        elif apply:
+            chunks = [messages[i:i + store.bucket_size] for i in range(0, len(messages), store.bucket_size)]
+            await db.message_buckets.insert_many([{
+                "conversation_id": conversation_id,
+                "seq": seq,
+                "count": len(chunk),
+                "first_ts": chunk[0]["timestamp"],
+                "last_ts": max(message["timestamp"] for message in chunk),
+                "closed": seq < len(chunks) - 1,
+                "messages": chunk
+            } for seq, chunk in enumerate(chunks)])
+        packed_conversations += 1
+        packed_messages += len(messages)
+    return {"conversations": packed_conversations, "messages": packed_messages}
+
+async def main():
+    apply = "--check" not in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    store = BucketMessageStore()
+    if apply:
+        await store.create_indexes(db)
+    result = await pack_messages_into_buckets(db, apply=apply, store=store)
+    action = "Packed" if apply else "Would pack"
+    print(f"💬 {action} {result['messages']} messages from {result['conversations']} conversations into buckets of {store.bucket_size}.")
+
+    client.close()
+
+if __name__ == "__main__":
+    # python message_store.py          -> pack messages not in a bucket yet
+    # python message_store.py --check  -> report what would be packed
+    # run it with the API on MESSAGE_STORAGE=dual until nothing is left,
+    # then switch to MESSAGE_STORAGE=buckets (one-way)
+    asyncio.run(main())
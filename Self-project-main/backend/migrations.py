@@ -0,0 +1,156 @@
+import asyncio
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+from search import search_fields, SEARCH_FIELDS_VERSION
+from models import ContractStatus
+from earnings import rebuild_earnings
+from blobs import put_blob, decode_base64_document
+from images import process_service_images, image_processor
+from fastapi import HTTPException
+
+load_dotenv()
+
+BATCH_SIZE = 1000
+
+async def backfill_search_fields(db):
+    """(Re)compute derived search fields on services with an older version"""
+    cursor = db.services.find({"search_version": {"$ne": SEARCH_FIELDS_VERSION}})
+    updated = 0
+    batch = []
+    async for service in cursor:
+        batch.append(UpdateOne({"_id": service["_id"]}, {"$set": search_fields(service)}))
+        if len(batch) >= BATCH_SIZE:
+            await db.services.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.services.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
+
+async def mark_reserved_slots(db):
+    """Flag ACTIVE contracts from before slot tracking as holding their slot"""
+    result = await db.contracts.update_many(
+        {"status": ContractStatus.ACTIVE, "slot_reserved": {"$exists": False}},
+        {"$set": {"slot_reserved": True}}
+    )
+    return result.modified_count
+
+async def backfill_earnings(db):
+    """Build provider earnings rollups for payments made before they existed"""
+    result = await rebuild_earnings(db)
+    return result["drifted"]
+
+async def move_verification_documents_to_blobs(db):
+    """Move base64 documents embedded in user profiles into the blob store"""
+    moved = 0
+    cursor = db.users.find(
+        {"$or": [
+            {"profile.verification_documents": {"$type": "string"}},
+            {"profile.verification_documents.file_data": {"$type": "string"}}
+        ]},
+        {"profile.verification_documents": 1}
+    )
+    async for user in cursor:
+        documents = []
+        for document in user["profile"]["verification_documents"]:
+            if isinstance(document, str):
+                document = {"file_name": None, "file_type": None, "file_data": document, "uploaded_at": None}
+            if not document.get("file_data"):
+                documents.append(document)
+                continue
+            try:
+                data, file_type = decode_base64_document(document["file_data"], document.get("file_type"))
+            except HTTPException:
+                # Unreadable upload: leave it where it is for an admin to look at
+                documents.append(document)
+                continue
+            info = await put_blob(
+                db, data, document.get("file_name"), file_type,
+                metadata={"owner_id": user["_id"], "kind": "verification_document"}
+            )
+            documents.append({
+                "file_id": info["_id"],
+                "file_name": document.get("file_name"),
+                "file_type": info["contentType"],
+                "size": info["length"],
+                "uploaded_at": document.get("uploaded_at") or info["uploadDate"]
+            })
+            moved += 1
+        await db.users.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"profile.verification_documents": documents}}
+        )
+    return moved
+
+async def build_service_image_variants(db):
+    """Move listing images into the blob store and render their thumbnails and size variants"""
+    built = 0
+    cursor = db.services.find({"image_variants": {"$exists": False}}, {"images": 1, "provider_id": 1})
+    async for service in cursor:
+        try:
+            image_variants = await process_service_images(db, service.get("images", []), service["provider_id"])
+        except HTTPException:
+            # Undecodable image: leave the listing as it is
+            continue
+        await db.services.update_one(
+            {"_id": service["_id"]},
+            {"$set": {
+                "images": [entry["original"] for entry in image_variants],
+                "image_variants": image_variants
+            }}
+        )
+        built += 1
+    image_processor.shutdown()
+    return built
+
+async def backfill_read_watermarks(db):
+    """Derive per-participant read watermarks and unread counters from per-message is_read flags"""
+    updated = 0
+    cursor = db.conversations.find({"read_up_to": {"$exists": False}}, {"participants": 1})
+    async for conv in cursor:
+        conversation_id = str(conv["_id"])
+        read_up_to, unread = {}, {}
+        for p_id in conv["participants"]:
+            # Everything the participant sent or was marked as having read
+            latest_read = await db.messages.find_one(
+                {"conversation_id": conversation_id, "$or": [{"sender_id": p_id}, {"is_read": True}]},
+                {"timestamp": 1},
+                sort=[("timestamp", -1)]
+            )
+            read_up_to[p_id] = latest_read["timestamp"] if latest_read else None
+            unread_query = {"conversation_id": conversation_id, "sender_id": {"$ne": p_id}}
+            if read_up_to[p_id]:
+                unread_query["timestamp"] = {"$gt": read_up_to[p_id]}
+            unread[p_id] = await db.messages.count_documents(unread_query)
+        await db.conversations.update_one(
+            {"_id": conv["_id"]},
+            {"$set": {"read_up_to": read_up_to, "unread": unread}}
+        )
+        updated += 1
+    return updated
+
+MIGRATIONS = [
+    backfill_search_fields,
+    mark_reserved_slots,
+    backfill_earnings,
+    move_verification_documents_to_blobs,
+    build_service_image_variants,
+    backfill_read_watermarks,
+]
+
+async def run_migrations():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    
+    print("🔧 Running Muyassir data migrations...")
+    for migration in MIGRATIONS:
+        result = await migration(db)
+        print(f"✅ {migration.__name__}: {result}")
+    
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_migrations())
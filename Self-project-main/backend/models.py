@@ -4,9 +4,12 @@ from datetime import datetime, date
 from enum import Enum
 
 class VerificationDocument(BaseModel):
+    file_id: Optional[str] = None  # Blob store id; download from GET /api/documents/{file_id}
     file_name: Optional[str] = None
     file_type: Optional[str] = None
-    file_data: str
+    size: Optional[int] = None
+    uploaded_at: Optional[datetime] = None
+    file_data: Optional[str] = None  # Legacy inline base64, until migrations.py has run
 
 
 class UserRole(str, Enum):
@@ -52,6 +55,11 @@ class ContractStatus(str, Enum):
     CANCELLED = "cancelled"
     REJECTED = "rejected"
 
+class WaitlistStatus(str, Enum):
+    WAITING = "waiting"
+    PROMOTED = "promoted"
+    LEFT = "left"
+
 class PaymentStatus(str, Enum):
     PENDING = "pending"
     PAID = "paid"
@@ -82,6 +90,8 @@ class UserCreate(BaseModel):
     university: Optional[str] = None
     student_id: Optional[str] = None
     verification_document: Optional[str] = None  # Base64 encoded Civil ID or Company Registration
+    verification_document_id: Optional[str] = None  # Or the id returned by POST /uploads
+    verification_document_token: Optional[str] = None  # With the claim_token returned alongside it
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -101,6 +111,20 @@ class Token(BaseModel):
     token_type: str
     user: UserResponse
 
+# Upload Models
+class UploadKind(str, Enum):
+    VERIFICATION_DOCUMENT = "verification_document"
+    SERVICE_IMAGE = "service_image"
+
+class UploadResponse(BaseModel):
+    id: str
+    kind: UploadKind
+    file_name: Optional[str] = None
+    file_type: str
+    size: int
+    url: str
+    claim_token: Optional[str] = None  # Anonymous uploads only; needed to claim it
+
 # Service Models
 class LocationCoordinates(BaseModel):
     lat: float
@@ -141,7 +165,7 @@ class ServiceCreate(BaseModel):
     title: str = Field(..., min_length=1)
     description: str
     category: str = Field(..., min_length=1)
-    images: List[str] = []
+    images: List[str] = []  # Image URLs or ids returned by POST /uploads
     price_monthly: float = Field(..., gt=0)
     capacity: int
     location: ServiceLocation
@@ -182,9 +206,14 @@ class ServiceResponse(BaseModel):
     safety_score: float
     status: ServiceStatus
     auto_accept: bool = False  # If True, skip provider approval step
+    distance_km: Optional[float] = None  # Only set by "near me" searches
     created_at: datetime
     updated_at: datetime
 
+class ServicePage(BaseModel):
+    items: List[ServiceResponse]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
+
 # Review Models
 class ReviewCategories(BaseModel):
     punctuality: Optional[int] = None
@@ -213,6 +242,21 @@ class ReviewResponse(BaseModel):
     provider_response: Optional[str] = None
     provider_response_at: Optional[datetime] = None
 
+class CategoryAverage(BaseModel):
+    average: float = 0.0
+    count: int = 0
+
+class RatingSummary(BaseModel):
+    service_id: str
+    average: float = 0.0
+    count: int = 0
+    histogram: Dict[str, int]  # "1".."5" -> number of reviews
+    categories: Dict[str, CategoryAverage]  # ReviewCategories field -> average
+
+class ReviewPage(BaseModel):
+    items: List[ReviewResponse]
+    next_cursor: Optional[str] = None
+
 # Search and Filter
 class ServiceFilters(BaseModel):
     service_type: Optional[ServiceType] = None
@@ -220,9 +264,14 @@ class ServiceFilters(BaseModel):
     max_price: Optional[float] = None
     city: Optional[str] = None
     university: Optional[str] = None
+    fuzzy_location: bool = False  # Substring match on city/university instead of indexed prefix match
     min_rating: Optional[float] = None
     gender_restriction: Optional[GenderRestriction] = None
     amenities: Optional[List[str]] = None
+    q: Optional[str] = Field(default=None, max_length=200)  # Keyword search (Arabic or English)
+    near_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    near_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    radius_km: Optional[float] = Field(default=None, gt=0)
     skip: int = 0
     limit: int = 20
 
@@ -269,6 +318,53 @@ class ContractResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class ContractPage(BaseModel):
+    items: List[ContractResponse]
+    next_cursor: Optional[str] = None
+
+class ContractSummary(BaseModel):
+    """List view of a contract: no terms or payment schedule (see GET /contracts/{id})"""
+    id: str
+    student_id: str
+    student_name: str
+    provider_id: str
+    provider_name: str
+    service_id: str
+    service_title: str
+    start_date: date
+    end_date: date
+    monthly_price: float
+    duration_months: int
+    total_amount: float
+    payments_paid: int
+    payments_total: int
+    next_payment_due: Optional[date] = None
+    status: ContractStatus
+    created_at: datetime
+    updated_at: datetime
+
+class ContractSummaryPage(BaseModel):
+    items: List[ContractSummary]
+    next_cursor: Optional[str] = None
+
+# Waitlist Models
+class WaitlistJoin(BaseModel):
+    start_date: date
+    duration_months: int
+
+class WaitlistEntryResponse(BaseModel):
+    id: str
+    service_id: str
+    service_title: str
+    student_id: str
+    start_date: date
+    duration_months: int
+    status: WaitlistStatus
+    position: Optional[int] = None  # 1-based place in line while waiting
+    contract_id: Optional[str] = None  # Pending contract created on promotion
+    created_at: datetime
+    promoted_at: Optional[datetime] = None
+
 # Payment Models
 class PaymentCreate(BaseModel):
     contract_id: str
@@ -320,6 +416,10 @@ class MessageResponse(BaseModel):
     timestamp: datetime
     is_read: bool
 
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
 class ConversationResponse(BaseModel):
     id: str
     participants: List[Dict[str, Any]]  # List of {id, name, role}
@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, List
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+# Keyset (cursor) pagination helpers.
+#
+# A cursor is an opaque token that encodes the sort key and _id of the last
+# document on the previous page. The next page is fetched with a range
+# condition on (sort_field, _id), so Mongo seeks straight to it through the
+# index instead of walking every skipped document.
+
+def encode_cursor(sort_value: datetime, doc_id: ObjectId) -> str:
+    """Build an opaque cursor token from a (timestamp, _id) pair"""
+    payload = json.dumps({"v": sort_value.isoformat(), "id": str(doc_id)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> tuple:
+    """Decode a cursor token back into a (timestamp, _id) pair"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["v"]), ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def sort_spec(field: str, descending: bool = True) -> list:
+    """Sort on the cursor field with _id as a unique tie-breaker"""
+    direction = -1 if descending else 1
+    return [(field, direction), ("_id", direction)]
+
+def apply_cursor(query: dict, field: str, token: Optional[str], descending: bool = True) -> dict:
+    """Restrict a query to documents after the cursor position"""
+    if not token:
+        return query
+
+    value, doc_id = decode_cursor(token)
+    op = "$lt" if descending else "$gt"
+    after = {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: doc_id}}
+    ]}
+    return {"$and": [query, after]} if query else after
+
+def next_cursor(docs: List[dict], field: str, limit: int) -> Optional[str]:
+    """Cursor for the page after ``docs``, or None when this was the last page"""
+    if len(docs) < limit or not docs:
+        return None
+    last = docs[-1]
+    return encode_cursor(last[field], last["_id"])
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+from typing import Optional
+from models import ReviewCategories
+
+load_dotenv()
+
+STARS = ("1", "2", "3", "4", "5")
+CATEGORIES = tuple(ReviewCategories.model_fields)
+
+# Service rating aggregates.
+#
+# Each service keeps running totals in its ``rating`` subdocument so that a new
+# review is a single atomic write instead of a re-read of every review:
+#   sum, count       -> average
+#   safety_sum       -> sum of safety_rating over the same reviews
+#   histogram        -> number of reviews per star, "1".."5"
+#   categories.<name>.{sum, count, average} for each ReviewCategories field
+# reconcile_ratings() rebuilds the totals from the reviews collection.
+
+def _increment(path: str, amount) -> dict:
+    return {"$add": [{"$ifNull": [f"${path}", 0]}, amount]}
+
+def rating_update_pipeline(rating: int, safety_rating: int, categories: Optional[dict] = None) -> list:
+    """Update pipeline that folds one new review into a service's totals.
+
+    Runs server-side as one write, so concurrent reviews never lose an
+    increment. Services rated before the totals existed start from
+    average * count; their histogram and category totals only cover new
+    reviews until reconcile_ratings() is run.
+    """
+    count = {"$ifNull": ["$rating.count", 0]}
+    legacy_sum = {"$multiply": [{"$ifNull": ["$rating.average", 0]}, count]}
+    totals = {
+        "rating.sum": {"$add": [{"$ifNull": ["$rating.sum", legacy_sum]}, rating]},
+        "rating.safety_sum": _increment("rating.safety_sum", safety_rating),
+        "rating.count": {"$add": [count, 1]},
+        f"rating.histogram.{rating}": _increment(f"rating.histogram.{rating}", 1)
+    }
+    averages = {
+        "rating.average": {"$round": [{"$divide": ["$rating.sum", "$rating.count"]}, 2]}
+    }
+    for name, value in (categories or {}).items():
+        if value is None or name not in CATEGORIES:
+            continue
+        path = f"rating.categories.{name}"
+        totals[f"{path}.sum"] = _increment(f"{path}.sum", value)
+        totals[f"{path}.count"] = _increment(f"{path}.count", 1)
+        averages[f"{path}.average"] = {"$round": [{"$divide": [f"${path}.sum", f"${path}.count"]}, 2]}
+
+    return [{"$set": totals}, {"$set": averages}]
+
+def rating_from_totals(totals: dict) -> dict:
+    """Full rating subdocument for the given review totals"""
+    count = totals.get("count", 0)
+    rating_sum = totals.get("sum", 0)
+    categories = {}
+    for name in CATEGORIES:
+        category_sum = totals.get(f"{name}_sum", 0)
+        category_count = totals.get(f"{name}_count", 0)
+        categories[name] = {
+            "sum": category_sum,
+            "count": category_count,
+            "average": round(category_sum / category_count, 2) if category_count else 0.0
+        }
+    return {
+        "average": round(rating_sum / count, 2) if count else 0.0,
+        "count": count,
+        "sum": rating_sum,
+        "safety_sum": totals.get("safety_sum", 0),
+        "histogram": {star: totals.get(f"star_{star}", 0) for star in STARS},
+        "categories": categories
+    }
+
+def rating_summary(service_id, rating: Optional[dict]) -> dict:
+    """Public rating breakdown built from a service's stored aggregates"""
+    rating = rating or {}
+    histogram = rating.get("histogram") or {}
+    categories = rating.get("categories") or {}
+    return {
+        "service_id": str(service_id),
+        "average": rating.get("average", 0.0),
+        "count": rating.get("count", 0),
+        "histogram": {star: histogram.get(star, 0) for star in STARS},
+        "categories": {
+            name: {
+                "average": categories.get(name, {}).get("average", 0.0),
+                "count": categories.get(name, {}).get("count", 0)
+            }
+            for name in CATEGORIES
+        }
+    }
+
+def _totals_group_stage() -> dict:
+    group = {
+        "_id": "$service_id",
+        "count": {"$sum": 1},
+        "sum": {"$sum": "$rating"},
+        "safety_sum": {"$sum": "$safety_rating"}
+    }
+    for star in STARS:
+        group[f"star_{star}"] = {"$sum": {"$cond": [{"$eq": ["$rating", int(star)]}, 1, 0]}}
+    for name in CATEGORIES:
+        field = f"$categories.{name}"
+        group[f"{name}_sum"] = {"$sum": field}
+        group[f"{name}_count"] = {"$sum": {"$cond": [{"$gt": [field, None]}, 1, 0]}}
+    return {"$group": group}
+
+async def reconcile_ratings(db, apply: bool = True) -> dict:
+    """Rebuild every service's rating aggregates from its reviews.
+
+    Returns how many services were checked and how many had drifted. With
+    ``apply=False`` nothing is written, which makes it usable as an audit.
+    """
+    totals = {}
+    async for row in db.reviews.aggregate([_totals_group_stage()]):
+        totals[row["_id"]] = row
+
+    checked = 0
+    drifted = []
+    batch = []
+    async for service in db.services.find({}, {"rating": 1}):
+        checked += 1
+        expected = rating_from_totals(totals.get(service["_id"], {}))
+        current = service.get("rating") or {}
+        if any(current.get(key) != value for key, value in expected.items()):
+            drifted.append(str(service["_id"]))
+            batch.append(UpdateOne({"_id": service["_id"]}, {"$set": {"rating": expected}}))
+        if apply and len(batch) >= 1000:
+            await db.services.bulk_write(batch, ordered=False)
+            batch = []
+    if apply and batch:
+        await db.services.bulk_write(batch, ordered=False)
+
+    return {"checked": checked, "drifted": len(drifted), "drifted_ids": drifted[:100], "applied": apply}
+
+async def main():
+    apply = "--check" not in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    result = await reconcile_ratings(db, apply=apply)
+    action = "Fixed" if apply else "Found"
+    print(f"⭐ Checked {result['checked']} services. {action} {result['drifted']} with drifted ratings.")
+    for service_id in result["drifted_ids"]:
+        print(f"   - {service_id}")
+
+    client.close()
+
+if __name__ == "__main__":
+    # python ratings.py          -> rebuild aggregates
+    # python ratings.py --check  -> report drift only
+    asyncio.run(main())
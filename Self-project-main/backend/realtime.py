@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, Set
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+
+# Push channel for chat and contract updates.
+#
+# Each worker keeps a registry of the WebSocket connections it holds, keyed by
+# user id. Events are offered to every connection of the users they concern
+# without waiting on the network: each connection has a bounded queue drained
+# by its own sender task. A client that falls SUBSCRIBER_QUEUE_SIZE events
+# behind is disconnected (close code 1013) rather than buffered without limit;
+# on reconnect it reloads state over REST, so nothing is silently skipped.
+#
+# Events are JSON objects {"type": ..., "data": ...}:
+#   message.created   -> a new message, to every participant
+#   conversation.read -> read receipt, to the other participants
+#   unread.changed    -> a participant's new unread count for a conversation
+#   contract.updated  -> a contract changed status, to both parties
+#   service.updated   -> a listing was edited, suspended or restored, to its provider
+#
+# Events reach the registry through the event bus (events.py), so a
+# connection hears about writes handled by any worker.
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "100"))
+
+logger = logging.getLogger(__name__)
+
+class Subscriber:
+    """One open connection and its outgoing queue"""
+
+    def __init__(self, user_id: str, max_queue: int = SUBSCRIBER_QUEUE_SIZE):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self.overflowed = False
+
+    def offer(self, event: dict) -> bool:
+        """Queue an event without blocking; on overflow the connection is scheduled to close"""
+        if self.overflowed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Drop the backlog and leave only the close marker
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+class SubscriberRegistry:
+    """In-process map of user id -> open connections"""
+
+    def __init__(self, max_queue: int = SUBSCRIBER_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self.delivered = 0
+        self.disconnected_slow = 0
+
+    def subscribe(self, user_id: str) -> Subscriber:
+        subscriber = Subscriber(user_id, self.max_queue)
+        self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+
+    def publish(self, user_ids: Iterable[str], event: dict) -> int:
+        """Offer an event to every connection of the given users; returns how many took it"""
+        event = jsonable_encoder(event)
+        delivered = 0
+        for user_id in set(user_ids):
+            for subscriber in list(self._subscribers.get(user_id, ())):
+                was_overflowed = subscriber.overflowed
+                if subscriber.offer(event):
+                    delivered += 1
+                elif not was_overflowed:
+                    self.disconnected_slow += 1
+        self.delivered += delivered
+        return delivered
+
+    def stats(self) -> dict:
+        """Current connection metrics"""
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "max_queue": self.max_queue,
+            "delivered": self.delivered,
+            "disconnected_slow": self.disconnected_slow
+        }
+
+registry = SubscriberRegistry()
+
+def push_event(event_type: str, data: dict) -> dict:
+    return {"type": event_type, "data": data}
+
+async def _send_events(websocket: WebSocket, subscriber: Subscriber):
+    while True:
+        event = await subscriber.queue.get()
+        if event is None:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        await websocket.send_json(event)
+
+async def _receive_until_closed(websocket: WebSocket):
+    # Clients only send keep-alives; anything else is ignored
+    try:
+        while True:
+            message = await websocket.receive_text()
+            if message == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        return
+
+async def serve_subscriber(websocket: WebSocket, subscriber: Subscriber):
+    """Pump a subscriber's queue into its socket until either side stops"""
+    tasks = [
+        asyncio.create_task(_send_events(websocket, subscriber)),
+        asyncio.create_task(_receive_until_closed(websocket))
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.warning("Chat socket for %s failed: %s", subscriber.user_id, task.exception())
+    finally:
+        for task in tasks:
+            task.cancel()
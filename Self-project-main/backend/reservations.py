@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+from models import ContractStatus
+
+load_dotenv()
+
+# Service slot reservations.
+#
+# ``available_slots`` on a service is only ever changed by these helpers:
+#   reserve_slot  -> conditional decrement, never takes the counter below 0
+#   release_slot  -> gives back the slot of a contract that holds one
+# A contract holds a slot while ``slot_reserved`` is true and it is still in
+# SLOT_HOLDING_STATUSES. The flag is set in the same write that makes it
+# ACTIVE, or when a request is promoted from the waitlist straight into the
+# slot it frees. reconcile_slots() rebuilds the counters from capacity minus
+# the contracts holding a slot.
+
+SLOT_HOLDING_STATUSES = [
+    ContractStatus.PENDING_PROVIDER_APPROVAL,
+    ContractStatus.AWAITING_STUDENT_CONFIRMATION,
+    ContractStatus.ACTIVE
+]
+
+async def reserve_slot(db, service_id) -> bool:
+    """Take one slot if any is left. Returns False when the service is full.
+
+    A single conditional update, so concurrent callers never overbook and a
+    caller that loses the race fails at once instead of retrying.
+    """
+    result = await db.services.update_one(
+        {"_id": service_id, "available_slots": {"$gt": 0}},
+        {"$inc": {"available_slots": -1}}
+    )
+    return result.modified_count == 1
+
+async def release_slot(db, service_id):
+    """Give one slot back, never above the service capacity"""
+    await db.services.update_one(
+        {"_id": service_id, "$expr": {"$lt": ["$available_slots", "$capacity"]}},
+        {"$inc": {"available_slots": 1}}
+    )
+
+async def reconcile_slots(db, apply: bool = True) -> dict:
+    """Recompute available_slots for every service from its reserved contracts.
+
+    Returns how many services were checked and how many had drifted. With
+    ``apply=False`` nothing is written.
+    """
+    reserved = {}
+    async for row in db.contracts.aggregate([
+        {"$match": {"status": {"$in": SLOT_HOLDING_STATUSES}, "slot_reserved": True}},
+        {"$group": {"_id": "$service_id", "count": {"$sum": 1}}}
+    ]):
+        reserved[row["_id"]] = row["count"]
+
+    checked = 0
+    drifted = []
+    batch = []
+    async for service in db.services.find({}, {"capacity": 1, "available_slots": 1}):
+        checked += 1
+        expected = max(service.get("capacity", 0) - reserved.get(service["_id"], 0), 0)
+        if service.get("available_slots") != expected:
+            drifted.append(str(service["_id"]))
+            batch.append(UpdateOne({"_id": service["_id"]}, {"$set": {"available_slots": expected}}))
+        if apply and len(batch) >= 1000:
+            await db.services.bulk_write(batch, ordered=False)
+            batch = []
+    if apply and batch:
+        await db.services.bulk_write(batch, ordered=False)
+
+    return {"checked": checked, "drifted": len(drifted), "drifted_ids": drifted[:100], "applied": apply}
+
+async def main():
+    apply = "--check" not in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    result = await reconcile_slots(db, apply=apply)
+    action = "Fixed" if apply else "Found"
+    print(f"🚌 Checked {result['checked']} services. {action} {result['drifted']} with drifted slot counts.")
+    for service_id in result["drifted_ids"]:
+        print(f"   - {service_id}")
+
+    client.close()
+
+if __name__ == "__main__":
+    # python reservations.py          -> rebuild slot counters
+    # python reservations.py --check  -> report drift only
+    asyncio.run(main())
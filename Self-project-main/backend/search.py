@@ -0,0 +1,149 @@
+import re
+import unicodedata
+from typing import Optional
+
+# Service search helpers.
+#
+# Derived fields are written next to the user-supplied ``location`` whenever a
+# service is created or its location changes, so search queries can hit an
+# index instead of scanning the collection.
+
+# Bump when derived fields change so migrations.py recomputes them
+SEARCH_FIELDS_VERSION = 2
+
+# Tashkeel, Quranic marks and tatweel carry no meaning for search
+ARABIC_MARKS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9"
+})
+ARABIC_PREFIXES = ("وال", "بال", "فال", "كال", "لل", "ال")
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Canonical keys for places listed under more than one spelling or locale
+PLACE_ALIASES = {
+    "مسقط": "muscat",
+    "السيب": "seeb",
+    "al seeb": "seeb",
+    "as seeb": "seeb",
+    "صحار": "sohar",
+    "صلاله": "salalah",
+    "نزوي": "nizwa",
+    "صور": "sur",
+    "البريمي": "buraimi",
+    "al buraimi": "buraimi",
+    "الخوض": "al khoud",
+    "alkhoud": "al khoud",
+    "squ": "sultan qaboos university",
+    "جامعه السلطان قابوس": "sultan qaboos university",
+    "gutech": "german university of technology",
+    "utas": "university of technology and applied sciences",
+}
+
+def place_key(name: Optional[str]) -> str:
+    """Canonical, index-friendly key for a city or university name"""
+    key = " ".join(TOKEN.findall(normalize_text(name or "")))
+    return PLACE_ALIASES.get(key, key)
+
+def place_filter(raw_field: str, key_field: str, value: str, fuzzy: bool = False) -> dict:
+    """Query condition for a city/university filter.
+
+    The default is an anchored prefix match on the canonical key, which
+    the index can serve; ``fuzzy`` keeps the old case-insensitive substring
+    match on the raw value for callers that still need it.
+    """
+    if fuzzy:
+        return {raw_field: {"$regex": re.escape(value), "$options": "i"}}
+    return {key_field: {"$regex": f"^{re.escape(place_key(value))}"}}
+
+def location_fields(location: Optional[dict]) -> dict:
+    """Derived, indexable fields for a service location"""
+    if not location:
+        return {}
+
+    fields = {
+        "city_key": place_key(location.get("city")),
+        "university_key": place_key(location.get("university_nearby"))
+    }
+    coordinates = location.get("coordinates") or {}
+    if coordinates.get("lat") is not None and coordinates.get("lng") is not None:
+        # GeoJSON wants [longitude, latitude]
+        fields["location_point"] = {
+            "type": "Point",
+            "coordinates": [float(coordinates["lng"]), float(coordinates["lat"])]
+        }
+    return fields
+
+def normalize_text(text: str) -> str:
+    """Fold case and Arabic spelling variants so both locales match"""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = ARABIC_MARKS.sub("", text)
+    return text.translate(ARABIC_LETTERS).casefold()
+
+def strip_arabic_prefix(token: str) -> str:
+    """Drop the definite article (and its clitics) from an Arabic token"""
+    for prefix in ARABIC_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+def search_tokens(text: str) -> list:
+    """Normalized tokens, each followed by its article-less form if different"""
+    tokens = []
+    for token in TOKEN.findall(normalize_text(text)):
+        tokens.append(token)
+        stem = strip_arabic_prefix(token)
+        if stem != token:
+            tokens.append(stem)
+    return tokens
+
+def text_fields(service: dict) -> dict:
+    """Normalized copies of the searchable text, indexed by a text index"""
+    details = service.get("transportation") or service.get("residence") or {}
+    tags = [service.get("category") or "", details.get("vehicle_type") or ""]
+    tags.extend(details.get("amenities") or [])
+    return {
+        "search_title": " ".join(search_tokens(service.get("title", ""))),
+        "search_body": " ".join(search_tokens(service.get("description", ""))),
+        "search_tags": " ".join(search_tokens(" ".join(tags)))
+    }
+
+def search_fields(service: dict) -> dict:
+    """Every derived search field for a (possibly merged) service document"""
+    return {
+        **location_fields(service.get("location")),
+        **text_fields(service),
+        "search_version": SEARCH_FIELDS_VERSION
+    }
+
+def text_query(q: str) -> str:
+    """Turn user input into a $text search string matching text_fields()"""
+    return " ".join(strip_arabic_prefix(token) for token in TOKEN.findall(normalize_text(q)))
+
+def geo_near_pipeline(
+    query: dict,
+    near_lat: float,
+    near_lng: float,
+    radius_km: Optional[float] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> list:
+    """Aggregation returning services nearest first, with ``distance_km`` set"""
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [near_lng, near_lat]},
+        "key": "location_point",
+        "distanceField": "distance_km",
+        "distanceMultiplier": 0.001,  # metres -> km
+        "spherical": True,
+        "query": query
+    }
+    if radius_km is not None:
+        geo_near["maxDistance"] = radius_km * 1000
+
+    return [
+        {"$geoNear": geo_near},
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
@@ -6,6 +6,7 @@ from bson import ObjectId
 import os
 from dotenv import load_dotenv
 from auth import hash_password
+from search import search_fields
 
 load_dotenv()
 
@@ -392,6 +393,8 @@ async def seed_data():
         }
     ]
     
+    for service in transports + residences:
+        service.update(search_fields(service))
     await db.services.insert_many(transports + residences)
     print(f"✅ Created {len(transports)} transportation and {len(residences)} residence services")
     
@@ -1,32 +1,72 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Header, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
 from pathlib import Path
 from bson import ObjectId
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
-from typing import Optional
+from typing import Optional, Union
 
 from pydantic import BaseModel
+import asyncio
 import os
 import logging
 
 from models import (
     UserCreate, UserLogin, Token, UserResponse, UserProfile, UserRole, ClientType,
-    ServiceCreate, ServiceUpdate, ServiceResponse, ServiceFilters,
-    ReviewCreate, ReviewResponse, ServiceType, ServiceStatus, VerificationStatus,
-    ContractCreate, ContractUpdate, ContractResponse, ContractStatus,
+    ServiceCreate, ServiceUpdate, ServiceResponse, ServiceFilters, ServicePage,
+    ReviewCreate, ReviewResponse, ReviewPage, RatingSummary, ServiceType, ServiceStatus, VerificationStatus,
+    ContractCreate, ContractUpdate, ContractResponse, ContractPage, ContractStatus,
+    ContractSummary, ContractSummaryPage,
+    WaitlistJoin, WaitlistEntryResponse, WaitlistStatus,
     PaymentCreate, PaymentResponse, PaymentStatus,
-    ConversationCreate, MessageCreate, MessageResponse, ConversationResponse
+    ConversationCreate, MessageCreate, MessageResponse, MessagePage, ConversationResponse,
+    UploadKind, UploadResponse
+)
+from auth import (
+    hash_password_async,
+    verify_password_async,
+    password_hasher,
+    create_access_token,
+    get_current_user,
+    get_optional_user,
+    verify_token
 )
-from auth import hash_password, verify_password, create_access_token, get_current_user
 from contracts import (
     generate_contract_terms,
     generate_payment_schedule,
     generate_transaction_id,
-    calculate_revenue_split
+    calculate_revenue_split,
+    CONTRACT_TRANSITIONS
+)
+from pagination import apply_cursor, next_cursor, sort_spec
+from ratings import rating_update_pipeline, rating_from_totals, rating_summary
+from reservations import reserve_slot, release_slot
+from waitlist import pop_next_waiting, waitlist_position, stale_promotion_filter, PROMOTION_SWEEP_SECONDS
+from idempotency import run_idempotent
+from earnings import record_earnings, rollup_id, bucket_start, serialize_bucket
+from exports import export_response, EXPORT_FORMATS
+from blobs import (
+    create_blob_indexes,
+    put_blob,
+    get_blob_info,
+    iter_blob,
+    content_disposition,
+    decode_base64_document
 )
+from uploads import stream_upload, claim_upload, new_claim_token
+from images import (
+    image_processor, process_service_images, dropped_image_variants, delete_image_variants, variant_urls
+)
+from realtime import registry, push_event, serve_subscriber
+from events import create_event_bus
+from message_store import create_message_store
+from search import search_fields, text_query, place_filter, geo_near_pipeline
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -36,6 +76,26 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Push events go through the bus so every worker's connections get them
+event_bus = create_event_bus(db)
+
+async def relay_to_subscribers(topic: str, payload: dict):
+    """Hand a published event to the push connections held by this worker"""
+    registry.publish(payload["user_ids"], payload["event"])
+
+for topic in ("chat", "contracts", "services"):
+    event_bus.subscribe(topic, relay_to_subscribers)
+
+# Per-message documents or packed buckets, see message_store.py
+message_store = create_message_store()
+
+async def notify(user_ids, event_type: str, data: dict, topic: str = "chat"):
+    """Publish a push event for the given users to every worker"""
+    await event_bus.publish(topic, {
+        "user_ids": [str(user_id) for user_id in user_ids],
+        "event": jsonable_encoder(push_event(event_type, data))
+    })
+
 # Create indexes
 async def create_indexes():
     # Users indexes
@@ -47,10 +107,50 @@ async def create_indexes():
     await db.services.create_index("service_type")
     await db.services.create_index("status")
     await db.services.create_index([("location.city", 1), ("service_type", 1)])
+    await db.services.create_index([("city_key", 1), ("service_type", 1)])
+    await db.services.create_index("university_key")
+    await db.services.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+    await db.services.create_index([("provider_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.services.create_index([("location_point", "2dsphere")])
+    await db.services.create_index(
+        [("search_title", "text"), ("search_tags", "text"), ("search_body", "text")],
+        weights={"search_title": 10, "search_tags": 5, "search_body": 1},
+        default_language="english",
+        name="service_text_search"
+    )
     
     # Reviews indexes
     await db.reviews.create_index("service_id")
     await db.reviews.create_index("student_id")
+    await db.reviews.create_index([("service_id", 1), ("created_at", -1), ("_id", -1)])
+    
+    # Contracts indexes (keyset pagination)
+    await db.contracts.create_index([("student_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.contracts.create_index([("provider_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.contracts.create_index(
+        [("status", 1), ("updated_at", 1)],
+        partialFilterExpression={"waitlist_entry_id": {"$exists": True}}
+    )
+    
+    # Payments indexes
+    await db.payments.create_index("transaction_id", unique=True)
+    await db.payments.create_index([("provider_id", 1), ("paid_at", -1), ("_id", -1)])
+    await db.provider_earnings.create_index([("provider_id", 1), ("period", 1), ("start", -1)])
+    
+    # Uploaded file chunks
+    await create_blob_indexes(db)
+    
+    # Idempotency keys (_id is the unique key; entries expire at expires_at)
+    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Waitlist indexes (FIFO head per service, one waiting entry per student)
+    await db.waitlist.create_index([("service_id", 1), ("status", 1), ("created_at", 1), ("_id", 1)])
+    await db.waitlist.create_index([("student_id", 1), ("created_at", -1)])
+    await db.waitlist.create_index(
+        [("service_id", 1), ("student_id", 1)],
+        unique=True,
+        partialFilterExpression={"status": WaitlistStatus.WAITING}
+    )
 
 # Create the main app
 app = FastAPI(title="Muyassir API", version="1.0.0")
@@ -97,6 +197,8 @@ def serialize_user(user_doc: dict) -> dict:
                 "file_data": d,
                 "uploaded_at": None
             })
+        elif d.get("file_id"):
+            normalized_docs.append({**d, "file_id": str(d["file_id"])})
         else:
             normalized_docs.append(d)
 
@@ -138,8 +240,11 @@ async def require_verified_user(user_id: str, action: str = "this action"):
             detail=f"Verification required: {status_messages.get(verification_status, 'Account not verified')}"
         )
 
-def serialize_service(service_doc: dict, provider_doc: dict) -> dict:
-    """Convert MongoDB service document to response format"""
+def serialize_service(service_doc: dict, provider_doc: dict, image_size: str = "thumb") -> dict:
+    """Convert MongoDB service document to response format.
+    
+    Lists only carry thumbnail URLs; single-service responses pass image_size="large".
+    """
     return {
         "id": str(service_doc["_id"]),
         "provider_id": str(service_doc["provider_id"]),
@@ -147,7 +252,8 @@ def serialize_service(service_doc: dict, provider_doc: dict) -> dict:
         "service_type": service_doc["service_type"],
         "title": service_doc["title"],
         "description": service_doc["description"],
-        "images": service_doc.get("images", []),
+        "category": service_doc.get("category", "general"),
+        "images": variant_urls(service_doc, image_size),
         "price_monthly": service_doc["price_monthly"],
         "capacity": service_doc["capacity"],
         "available_slots": service_doc.get("available_slots", service_doc["capacity"]),
@@ -158,10 +264,37 @@ def serialize_service(service_doc: dict, provider_doc: dict) -> dict:
         "safety_score": service_doc.get("safety_score", 100.0),
         "status": service_doc.get("status", "active"),
         "auto_accept": service_doc.get("auto_accept", False),
+        "distance_km": service_doc.get("distance_km"),
         "created_at": service_doc.get("created_at", datetime.utcnow()),
         "updated_at": service_doc.get("updated_at", datetime.utcnow())
     }
 
+async def fetch_by_id(collection, ids, projection: dict) -> dict:
+    """Load the documents referenced by a page of results in one round trip"""
+    ids = list({doc_id for doc_id in ids if doc_id is not None})
+    if not ids:
+        return {}
+    cursor = collection.find({"_id": {"$in": ids}}, projection)
+    return {doc["_id"]: doc async for doc in cursor}
+
+# Fallbacks for references whose document no longer exists
+UNKNOWN_USER = {"profile": {"full_name": "Unknown"}}
+UNKNOWN_SERVICE = {"title": "Unknown"}
+
+async def fetch_users_by_id(user_ids) -> dict:
+    """Batched user lookup, projected to what list responses show"""
+    return await fetch_by_id(db.users, user_ids, {"email": 1, "role": 1, "profile.full_name": 1})
+
+async def serialize_services(services: list, include_orphans: bool = False) -> list:
+    """Serialize a page of services with a single batched provider lookup"""
+    providers = await fetch_users_by_id(s["provider_id"] for s in services)
+    results = []
+    for service in services:
+        provider = providers.get(service["provider_id"])
+        if provider or include_orphans:
+            results.append(serialize_service(service, provider or {}))
+    return results
+
 def serialize_review(review_doc: dict, student_doc: dict) -> dict:
     """Convert MongoDB review document to response format"""
     return {
@@ -213,32 +346,40 @@ async def register(user_data: UserCreate):
         verification_status = VerificationStatus.UNVERIFIED"""
     
     # Determine initial verification status
+    user_id = ObjectId()
     verification_docs = []
     verification_status = VerificationStatus.UNVERIFIED
 
-    if user_data.verification_document:
+    if user_data.verification_document_id:
+        # Already streamed in through POST /uploads; just attach it to the new user
+        verification_status = VerificationStatus.PENDING
+        info = await claim_upload(
+            db, user_data.verification_document_id, UploadKind.VERIFICATION_DOCUMENT.value, user_id,
+            claim_token=user_data.verification_document_token
+        )
+        verification_docs = [verification_reference(info)]
+    elif user_data.verification_document:
         verification_status=VerificationStatus.PENDING
+        document = user_data.verification_document
     # If frontend sends structured object
-        if isinstance(user_data.verification_document, dict):
-            verification_docs = [{
-                "file_name": user_data.verification_document.get("file_name"),
-                "file_type": user_data.verification_document.get("file_type"),
-                "file_data": user_data.verification_document.get("file_data"),
-                "uploaded_at": datetime.utcnow(),
-            }]
+        if isinstance(document, dict):
+            file_data = document.get("file_data") or ""
+            file_name = document.get("file_name")
+            file_type = document.get("file_type")
         else:
             # Legacy support (string base64 only)
-            verification_docs = [{
-                "file_name": None,
-                "file_type": None,
-                "file_data": user_data.verification_document,
-                "uploaded_at": datetime.utcnow(),
-            }]
+            file_data, file_name, file_type = document, None, None
+        
+        # The file goes to the blob store; the user only keeps a reference
+        verification_docs = [
+            await store_verification_document(user_id, file_data, file_name, file_type)
+        ]
     
     # Create user document
     user_doc = {
+        "_id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password_async(user_data.password),
         "role": user_data.role,
         "profile": {
             "full_name": user_data.full_name,
@@ -288,7 +429,7 @@ async def login(credentials: UserLogin):
         )
     
     # Verify password
-    if not verify_password(credentials.password, user["password_hash"]):
+    if not await verify_password_async(credentials.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -340,7 +481,30 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 # ============================================================
 
 class DocumentUpload(BaseModel):
-    document: str  # Base64 encoded document
+    document: Optional[str] = None  # Base64 encoded document
+    document_id: Optional[str] = None  # Or the id returned by POST /uploads
+    document_token: Optional[str] = None  # Its claim_token, if uploaded before signing in
+    file_name: Optional[str] = None
+    file_type: Optional[str] = None
+
+def verification_reference(info: dict) -> dict:
+    """The reference to a stored document that is kept on the user"""
+    return {
+        "file_id": info["_id"],
+        "file_name": info.get("filename"),
+        "file_type": info["contentType"],
+        "size": info["length"],
+        "uploaded_at": info["uploadDate"]
+    }
+
+async def store_verification_document(user_id: ObjectId, file_data: str, file_name: Optional[str], file_type: Optional[str]) -> dict:
+    """Save an uploaded document in the blob store and return the reference kept on the user"""
+    data, file_type = decode_base64_document(file_data, file_type)
+    info = await put_blob(
+        db, data, file_name, file_type,
+        metadata={"owner_id": user_id, "kind": "verification_document", "attached": True}
+    )
+    return verification_reference(info)
 
 @api_router.post("/auth/upload-verification-document")
 async def upload_verification_document(
@@ -348,7 +512,8 @@ async def upload_verification_document(
     current_user: dict = Depends(get_current_user)
 ):
     """Upload verification document (Civil ID for clients, Company Registration for providers)"""
-    user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
+    user_id = ObjectId(current_user["user_id"])
+    user = await db.users.find_one({"_id": user_id}, {"profile.verification_status": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -356,17 +521,22 @@ async def upload_verification_document(
     if current_status == VerificationStatus.VERIFIED:
         raise HTTPException(status_code=400, detail="Account is already verified")
     
-    # Add document and set status to pending
+    if doc_data.document_id:
+        info = await claim_upload(
+            db, doc_data.document_id, UploadKind.VERIFICATION_DOCUMENT.value, user_id,
+            claim_token=doc_data.document_token
+        )
+        document = verification_reference(info)
+    elif doc_data.document:
+        document = await store_verification_document(user_id, doc_data.document, doc_data.file_name, doc_data.file_type)
+    else:
+        raise HTTPException(status_code=400, detail="Provide either document or document_id")
+    
+    # Add document reference and set status to pending
     await db.users.update_one(
-        {"_id": ObjectId(current_user["user_id"])},
+        {"_id": user_id},
         {
-            """"$push": {"profile.verification_documents": doc_data.document},"""
-            "$push": {"profile.verification_documents": {
-                "file_name": doc_data.document.get("file_name"),
-                "file_type": doc_data.document.get("file_type"),
-                "file_data": doc_data.document.get("file_data"),
-                "uploaded_at": datetime.utcnow(),
-            }},
+            "$push": {"profile.verification_documents": document},
             "$set": {
                 "profile.verification_status": VerificationStatus.PENDING,
                 "profile.verification_rejected_reason": None
@@ -374,12 +544,93 @@ async def upload_verification_document(
         }
     )
     
-    updated_user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
     return {
         "message": "Document uploaded successfully. Your account is pending verification.",
-        "verification_status": updated_user["profile"]["verification_status"]
+        "verification_status": VerificationStatus.PENDING,
+        "document_id": str(document["file_id"])
+    }
+
+@api_router.post("/uploads", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_file(
+    request: Request,
+    kind: UploadKind = Query(...),
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """Stream a multipart file (field ``file``) into the blob store and return its id.
+    
+    Verification documents may be uploaded before registering; service images
+    need a provider token. The id is then sent in place of the base64 data,
+    together with the ``claim_token`` for an anonymous upload.
+    """
+    if kind == UploadKind.SERVICE_IMAGE and (not current_user or current_user["role"] != UserRole.SERVICE_PROVIDER):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only service providers can upload service images"
+        )
+    
+    owner_id = ObjectId(current_user["user_id"]) if current_user else None
+    claim_token, claim_token_hash = new_claim_token() if owner_id is None else (None, None)
+    info = await stream_upload(db, request, kind.value, owner_id, claim_token_hash)
+    
+    file_id = str(info["_id"])
+    return {
+        "id": file_id,
+        "kind": kind,
+        "file_name": info["filename"],
+        "file_type": info["contentType"],
+        "size": info["length"],
+        "url": f"/api/images/{file_id}" if kind == UploadKind.SERVICE_IMAGE else f"/api/documents/{file_id}",
+        "claim_token": claim_token
     }
 
+@api_router.get("/images/{file_id}")
+async def download_image(file_id: str):
+    """Stream an uploaded service image (public)"""
+    try:
+        info = await get_blob_info(db, ObjectId(file_id))
+    except:
+        raise HTTPException(status_code=400, detail="Invalid image ID")
+    
+    if not info or info.get("metadata", {}).get("kind") != UploadKind.SERVICE_IMAGE.value:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    return StreamingResponse(
+        iter_blob(db, info["_id"]),
+        media_type=info["contentType"],
+        headers={
+            "Content-Length": str(info["length"]),
+            "Cache-Control": "public, max-age=31536000, immutable"
+        }
+    )
+
+@api_router.get("/documents/{file_id}")
+async def download_document(
+    file_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream an uploaded document (its owner or an admin)"""
+    try:
+        info = await get_blob_info(db, ObjectId(file_id))
+    except:
+        raise HTTPException(status_code=400, detail="Invalid document ID")
+    
+    if not info:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    owner_id = info.get("metadata", {}).get("owner_id")
+    if current_user["role"] != UserRole.ADMIN and str(owner_id) != current_user["user_id"]:
+        raise HTTPException(status_code=403, detail="You don't have access to this document")
+    
+    filename = info.get("filename") or f"{file_id}"
+    return StreamingResponse(
+        iter_blob(db, info["_id"]),
+        media_type=info.get("contentType") or "application/octet-stream",
+        headers={
+            "Content-Length": str(info["length"]),
+            "Content-Disposition": content_disposition("inline", filename)
+        }
+    )
+
 class VerificationDecision(BaseModel):
     user_id: str
     decision: str  # "verified" or "rejected"
@@ -424,6 +675,20 @@ async def admin_verify_user(
         "user": serialize_user(updated_user)
     }
 
+def document_metadata(document) -> dict:
+    """What the review queue shows about a verification document; the file itself is fetched from ``url``"""
+    if isinstance(document, str) or not document.get("file_id"):
+        # Still embedded in the profile: run migrations.py to move it to the blob store
+        return {"file_id": None, "file_name": None, "file_type": None, "size": None, "uploaded_at": None, "url": None}
+    return {
+        "file_id": str(document["file_id"]),
+        "file_name": document.get("file_name"),
+        "file_type": document.get("file_type"),
+        "size": document.get("size"),
+        "uploaded_at": document.get("uploaded_at"),
+        "url": f"/api/documents/{document['file_id']}"
+    }
+
 @api_router.get("/admin/pending-verifications")
 async def get_pending_verifications(
     current_user: dict = Depends(get_current_user)
@@ -432,71 +697,110 @@ async def get_pending_verifications(
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    cursor = db.users.find({"profile.verification_status": VerificationStatus.PENDING})
+    # Document metadata only; each file is streamed from GET /documents/{file_id} when opened
+    cursor = db.users.find(
+        {"profile.verification_status": VerificationStatus.PENDING},
+        {"password_hash": 0, "profile.verification_documents.file_data": 0}
+    )
     users = await cursor.to_list(length=100)
     
-    """return [serialize_user(user) for user in users]"""
     results = []
-
     for user in users:
-        profile = user.get("profile", {})
-        docs = profile.get("verification_documents", [])
-
-        normalized_docs = []
-
-        for d in docs:
-            if isinstance(d, str):
-                data_uri = f"data:application/octet-stream;base64,{d}"
-                normalized_docs.append({
-                    "file_name": None,
-                    "file_type": None,
-                    "file_data": d,
-                    "uploaded_at": datetime.utcnow(),
-                    "data_uri": data_uri
-                })
-            else:
-                file_type = d.get("file_type") or "application/octet-stream"
-                data_uri = f"data:{file_type};base64,{d.get('file_data')}"
-                normalized_docs.append({
-                    **d,
-                    "data_uri": data_uri
-                })
-
+        documents = user.get("profile", {}).get("verification_documents", [])
         serialized = serialize_user(user)
-        serialized["profile"]["verification_documents"] = normalized_docs
-
+        serialized["profile"]["verification_documents"] = [document_metadata(d) for d in documents]
         results.append(serialized)
-
+    
     return results
 
+@api_router.get("/admin/metrics")
+async def admin_metrics(current_user: dict = Depends(get_current_user)):
+    """Runtime metrics for background worker pools (admin only)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {
+        "password_hashing": password_hasher.stats(),
+        "realtime": registry.stats(),
+        "event_bus": event_bus.stats()
+    }
+
+# Admin list endpoints return one page as JSON by default; format=ndjson or
+# format=csv streams the whole collection instead (see exports.py)
+EXPORT_FORMAT_PATTERN = "^(json|ndjson|csv)$"
+
+USER_EXPORT_COLUMNS = [
+    ("id", "id"), ("email", "email"), ("role", "role"),
+    ("full_name", "profile.full_name"), ("university", "profile.university"),
+    ("client_type", "profile.client_type"), ("verification_status", "profile.verification_status"),
+    ("safety_score", "safety_score"), ("is_active", "is_active"), ("created_at", "profile.created_at")
+]
+SERVICE_EXPORT_COLUMNS = [
+    ("id", "id"), ("title", "title"), ("service_type", "service_type"), ("category", "category"),
+    ("provider_id", "provider_id"), ("provider_name", "provider_name"),
+    ("city", "location.city"), ("university_nearby", "location.university_nearby"),
+    ("price_monthly", "price_monthly"), ("capacity", "capacity"), ("available_slots", "available_slots"),
+    ("rating", "rating.average"), ("rating_count", "rating.count"),
+    ("status", "status"), ("created_at", "created_at")
+]
+CONTRACT_EXPORT_COLUMNS = [
+    ("id", "id"), ("student_id", "student_id"), ("student_name", "student_name"),
+    ("provider_id", "provider_id"), ("provider_name", "provider_name"),
+    ("service_id", "service_id"), ("service_title", "service_title"),
+    ("status", "status"), ("total_amount", "total_amount"), ("created_at", "created_at")
+]
+
+async def serialize_users(users: list) -> list:
+    return [serialize_user(user) for user in users]
+
+async def serialize_admin_services(services: list) -> list:
+    return await serialize_services(services, include_orphans=True)
+
 @api_router.get("/admin/users")
-async def admin_list_users(current_user: dict = Depends(get_current_user)):
+async def admin_list_users(
+    export_format: str = Query("json", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
     """List all users (admin only)"""
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
-    cursor = db.users.find({})
-    users = await cursor.to_list(length=500)
-    return [serialize_user(user) for user in users]
+    if export_format in EXPORT_FORMATS:
+        # Uploaded documents are left out of exports
+        cursor = db.users.find({}, {"password_hash": 0, "profile.verification_documents.file_data": 0})
+        return export_response(cursor, serialize_users, export_format, USER_EXPORT_COLUMNS, "users")
+    cursor = db.users.find({}, {"password_hash": 0}).sort("_id", -1).skip(skip).limit(limit)
+    users = await cursor.to_list(length=limit)
+    return await serialize_users(users)
 
 @api_router.get("/admin/services")
-async def admin_list_services(current_user: dict = Depends(get_current_user)):
+async def admin_list_services(
+    export_format: str = Query("json", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
     """List all services (admin only)"""
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
-    cursor = db.services.find({})
-    services = await cursor.to_list(length=500)
-    result = []
-    for s in services:
-        provider = await db.users.find_one({"_id": s["provider_id"]})
-        result.append(serialize_service(s, provider or {}))
-    return result
+    projection = {"search_title": 0, "search_tags": 0, "search_body": 0}
+    if export_format in EXPORT_FORMATS:
+        cursor = db.services.find({}, projection)
+        return export_response(cursor, serialize_admin_services, export_format, SERVICE_EXPORT_COLUMNS, "services")
+    cursor = db.services.find({}, projection).sort("_id", -1).skip(skip).limit(limit)
+    services = await cursor.to_list(length=limit)
+    return await serialize_admin_services(services)
 
 @api_router.put("/admin/services/{service_id}/suspend")
 async def admin_suspend_service(service_id: str, current_user: dict = Depends(get_current_user)):
     """Suspend a service (admin only)"""
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
-    await db.services.update_one({"_id": ObjectId(service_id)}, {"$set": {"status": "suspended"}})
+    service = await db.services.find_one_and_update(
+        {"_id": ObjectId(service_id)}, {"$set": {"status": "suspended"}}, projection={"provider_id": 1}
+    )
+    if service:
+        await notify([service["provider_id"]], "service.updated", {"service_id": service_id, "status": "suspended"}, topic="services")
     return {"message": "Service suspended"}
 
 @api_router.put("/admin/services/{service_id}/unsuspend")
@@ -504,38 +808,59 @@ async def admin_unsuspend_service(service_id: str, current_user: dict = Depends(
     """Unsuspend a service (admin only)"""
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
-    await db.services.update_one({"_id": ObjectId(service_id)}, {"$set": {"status": "active"}})
+    service = await db.services.find_one_and_update(
+        {"_id": ObjectId(service_id)}, {"$set": {"status": "active"}}, projection={"provider_id": 1, "status": 1}
+    )
+    if service:
+        await notify([service["provider_id"]], "service.updated", {"service_id": service_id, "status": "active"}, topic="services")
+        if service.get("status") != ServiceStatus.ACTIVE:
+            # Slots freed while it was suspended go to the waitlist first
+            await fill_from_waitlist(service["_id"])
     return {"message": "Service unsuspended"}
 
+async def serialize_admin_contracts(contracts: list) -> list:
+    """Serialize a batch of contracts for the admin list with batched lookups"""
+    users = await fetch_users_by_id(
+        [c["student_id"] for c in contracts] + [c["provider_id"] for c in contracts]
+    )
+    services = await fetch_by_id(db.services, (c["service_id"] for c in contracts), {"title": 1})
+    return [{
+        "id": str(c["_id"]),
+        "student_id": str(c["student_id"]),
+        "student_name": users.get(c["student_id"], UNKNOWN_USER)["profile"]["full_name"],
+        "provider_id": str(c["provider_id"]),
+        "provider_name": users.get(c["provider_id"], UNKNOWN_USER)["profile"]["full_name"],
+        "service_id": str(c["service_id"]),
+        "service_title": services.get(c["service_id"], UNKNOWN_SERVICE)["title"],
+        "status": c["status"],
+        "total_amount": c.get("total_amount", 0),
+        "created_at": c.get("created_at", datetime.utcnow())
+    } for c in contracts]
+
 @api_router.get("/admin/contracts")
-async def admin_list_contracts(current_user: dict = Depends(get_current_user)):
+async def admin_list_contracts(
+    export_format: str = Query("json", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
     """List all contracts (admin only)"""
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
-    cursor = db.contracts.find({}).sort("created_at", -1)
-    contracts = await cursor.to_list(length=500)
-    result = []
-    for c in contracts:
-        student = await db.users.find_one({"_id": c["student_id"]})
-        provider = await db.users.find_one({"_id": c["provider_id"]})
-        service = await db.services.find_one({"_id": c["service_id"]})
-        result.append({
-            "id": str(c["_id"]),
-            "student_id": str(c["student_id"]),
-            "student_name": student["profile"]["full_name"] if student else "Unknown",
-            "provider_id": str(c["provider_id"]),
-            "provider_name": provider["profile"]["full_name"] if provider else "Unknown",
-            "service_id": str(c["service_id"]),
-            "service_title": service["title"] if service else "Unknown",
-            "status": c["status"],
-            "total_amount": c.get("total_amount", 0),
-            "created_at": c.get("created_at", datetime.utcnow())
-        })
-    return result
+    projection = {
+        "student_id": 1, "provider_id": 1, "service_id": 1,
+        "status": 1, "total_amount": 1, "created_at": 1
+    }
+    if export_format in EXPORT_FORMATS:
+        cursor = db.contracts.find({}, projection)
+        return export_response(cursor, serialize_admin_contracts, export_format, CONTRACT_EXPORT_COLUMNS, "contracts")
+    cursor = db.contracts.find({}, projection).sort("_id", -1).skip(skip).limit(limit)
+    contracts = await cursor.to_list(length=limit)
+    return await serialize_admin_contracts(contracts)
 
 
 # Service Endpoints (Clients)
-@api_router.get("/services", response_model=list[ServiceResponse])
+@api_router.get("/services", response_model=Union[list[ServiceResponse], ServicePage])
 async def list_services(
     service_type: Optional[ServiceType] = None,
     min_price: Optional[float] = None,
@@ -543,10 +868,18 @@ async def list_services(
     city: Optional[str] = None,
     university: Optional[str] = None,
     min_rating: Optional[float] = None,
+    fuzzy_location: bool = False,
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    page_cursor: Optional[str] = Query(None, alias="cursor")
 ):
-    """List services with optional filters"""
+    """List services with optional filters.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset
+    pagination and returns ``{items, next_cursor}``; otherwise ``skip``
+    is honoured and a plain list is returned. ``city`` and ``university``
+    are prefix matches on canonical keys unless ``fuzzy_location`` is set.
+    """
     # Build query
     query = {"status": ServiceStatus.ACTIVE}
     
@@ -557,24 +890,26 @@ async def list_services(
     if max_price is not None:
         query.setdefault("price_monthly", {})["$lte"] = max_price
     if city:
-        query["location.city"] = {"$regex": city, "$options": "i"}
+        query.update(place_filter("location.city", "city_key", city, fuzzy_location))
     if university:
-        query["location.university_nearby"] = {"$regex": university, "$options": "i"}
+        query.update(place_filter("location.university_nearby", "university_key", university, fuzzy_location))
     if min_rating is not None:
         query["rating.average"] = {"$gte": min_rating}
     
+    if page_cursor is not None:
+        query = apply_cursor(query, "created_at", page_cursor)
+        cursor = db.services.find(query).sort(sort_spec("created_at")).limit(limit)
+        services = await cursor.to_list(length=limit)
+        return {
+            "items": await serialize_services(services),
+            "next_cursor": next_cursor(services, "created_at", limit)
+        }
+    
     # Get services
     cursor = db.services.find(query).skip(skip).limit(limit).sort("created_at", -1)
     services = await cursor.to_list(length=limit)
     
-    # Get provider info for each service
-    results = []
-    for service in services:
-        provider = await db.users.find_one({"_id": service["provider_id"]})
-        if provider:
-            results.append(serialize_service(service, provider))
-    
-    return results
+    return await serialize_services(services)
 
 @api_router.get("/services/{service_id}", response_model=ServiceResponse)
 async def get_service(service_id: str):
@@ -600,7 +935,7 @@ async def get_service(service_id: str):
             detail="Provider not found"
         )
     
-    return serialize_service(service, provider)
+    return serialize_service(service, provider, image_size="large")
 
 @api_router.post("/services/search", response_model=list[ServiceResponse])
 async def search_services(filters: ServiceFilters):
@@ -615,9 +950,11 @@ async def search_services(filters: ServiceFilters):
     if filters.max_price is not None:
         query.setdefault("price_monthly", {})["$lte"] = filters.max_price
     if filters.city:
-        query["location.city"] = {"$regex": filters.city, "$options": "i"}
+        query.update(place_filter("location.city", "city_key", filters.city, filters.fuzzy_location))
     if filters.university:
-        query["location.university_nearby"] = {"$regex": filters.university, "$options": "i"}
+        query.update(place_filter(
+            "location.university_nearby", "university_key", filters.university, filters.fuzzy_location
+        ))
     if filters.min_rating is not None:
         query["rating.average"] = {"$gte": filters.min_rating}
     if filters.gender_restriction:
@@ -628,21 +965,62 @@ async def search_services(filters: ServiceFilters):
             {"residence.amenities": {"$in": filters.amenities}}
         ]
     
+    near_me = filters.near_lat is not None or filters.near_lng is not None
+    if near_me and filters.q:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Keyword search cannot be combined with near_lat/near_lng"
+        )
+    
+    # Keyword search: text index, best matches first
+    if filters.q:
+        terms = text_query(filters.q)
+        if not terms:
+            return []
+        query["$text"] = {"$search": terms}
+        score = {"score": {"$meta": "textScore"}}
+        cursor = db.services.find(query, score).sort(
+            [("score", {"$meta": "textScore"}), ("_id", -1)]
+        ).skip(filters.skip).limit(filters.limit)
+        services = await cursor.to_list(length=filters.limit)
+        return await serialize_services(services)
+    
+    # "Near me" search: nearest first, with distance_km on each result
+    if near_me:
+        if filters.near_lat is None or filters.near_lng is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="near_lat and near_lng must be provided together"
+            )
+        pipeline = geo_near_pipeline(
+            query,
+            near_lat=filters.near_lat,
+            near_lng=filters.near_lng,
+            radius_km=filters.radius_km,
+            skip=filters.skip,
+            limit=filters.limit
+        )
+        services = await db.services.aggregate(pipeline).to_list(length=filters.limit)
+        return await serialize_services(services)
+    
     # Get services
     cursor = db.services.find(query).skip(filters.skip).limit(filters.limit).sort("created_at", -1)
     services = await cursor.to_list(length=filters.limit)
     
-    # Get provider info
-    results = []
-    for service in services:
-        provider = await db.users.find_one({"_id": service["provider_id"]})
-        if provider:
-            results.append(serialize_service(service, provider))
-    
-    return results
+    return await serialize_services(services)
 
 
 # Service Endpoints (Providers)
+async def resolve_service_images(images: list, provider_id: ObjectId) -> list:
+    """Swap upload ids in a listing's images for their URLs, claiming each upload"""
+    resolved = []
+    for image in images:
+        if ObjectId.is_valid(image):
+            info = await claim_upload(db, image, UploadKind.SERVICE_IMAGE.value, provider_id)
+            image = f"/api/images/{info['_id']}"
+        resolved.append(image)
+    return resolved
+
 @api_router.post("/services", response_model=ServiceResponse, status_code=status.HTTP_201_CREATED)
 async def create_service(
     service_data: ServiceCreate,
@@ -671,18 +1049,25 @@ async def create_service(
             detail="Residence details are required for residence services"
         )
     
+    # Store each image once and render its thumbnail/size variants off the event loop
+    provider_id = ObjectId(current_user["user_id"])
+    images = await resolve_service_images(service_data.images, provider_id)
+    image_variants = await process_service_images(db, images, provider_id)
+    
     # Create service document
     service_doc = {
         "provider_id": ObjectId(current_user["user_id"]),
         "service_type": service_data.service_type,
         "title": service_data.title,
         "description": service_data.description,
-        "images": service_data.images,
+        "category": service_data.category,
+        "images": [entry["original"] for entry in image_variants],
+        "image_variants": image_variants,
         "price_monthly": service_data.price_monthly,
         "capacity": service_data.capacity,
         "available_slots": service_data.capacity,
         "location": service_data.location.model_dump(),
-        "rating": {"average": 0.0, "count": 0},
+        "rating": rating_from_totals({}),
         "safety_score": 100.0,
         "status": ServiceStatus.ACTIVE,
         "auto_accept": service_data.auto_accept,
@@ -695,13 +1080,15 @@ async def create_service(
     if service_data.residence:
         service_doc["residence"] = service_data.residence.model_dump()
     
+    service_doc.update(search_fields(service_doc))
+    
     result = await db.services.insert_one(service_doc)
     service_doc["_id"] = result.inserted_id
     
     # Get provider info
     provider = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
     
-    return serialize_service(service_doc, provider)
+    return serialize_service(service_doc, provider, image_size="large")
 
 @api_router.put("/services/{service_id}", response_model=ServiceResponse)
 async def update_service(
@@ -734,6 +1121,15 @@ async def update_service(
     # Build update document
     update_doc = {"updated_at": datetime.utcnow()}
     update_data = service_data.model_dump(exclude_unset=True)
+    dropped_images = []
+    if update_data.get("images") is not None:
+        images = await resolve_service_images(update_data["images"], service["provider_id"])
+        image_variants = await process_service_images(
+            db, images, service["provider_id"], service.get("image_variants")
+        )
+        update_data["images"] = [entry["original"] for entry in image_variants]
+        update_doc["image_variants"] = image_variants
+        dropped_images = dropped_image_variants(service.get("image_variants"), image_variants)
     
     for key, value in update_data.items():
         if value is not None:
@@ -742,17 +1138,27 @@ async def update_service(
             else:
                 update_doc[key] = value
     
+    # Keep derived search fields in step with the listing
+    update_doc.update(search_fields({**service, **update_doc}))
+    
     # Update service
     await db.services.update_one(
         {"_id": ObjectId(service_id)},
         {"$set": update_doc}
     )
     
+    # Only now that the listing no longer points at them
+    for entry in dropped_images:
+        await delete_image_variants(db, entry, service["provider_id"])
+    
     # Get updated service
     updated_service = await db.services.find_one({"_id": ObjectId(service_id)})
     provider = await db.users.find_one({"_id": service["provider_id"]})
+    await notify([service["provider_id"]], "service.updated", {"service_id": service_id, "status": updated_service["status"]}, topic="services")
+    if service.get("status") != ServiceStatus.ACTIVE and updated_service["status"] == ServiceStatus.ACTIVE:
+        await fill_from_waitlist(service["_id"])
     
-    return serialize_service(updated_service, provider)
+    return serialize_service(updated_service, provider, image_size="large")
 
 @api_router.delete("/services/{service_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_service(
@@ -809,19 +1215,25 @@ async def get_my_listings(
     
     services = await cursor.to_list(length=limit)
     
-    # Get provider info
-    provider = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
-    
-    return [serialize_service(service, provider) for service in services]
+    return await serialize_services(services, include_orphans=True)
 
 
 # Review Endpoints
 @api_router.post("/reviews", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review_data: ReviewCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Create a review for a service"""
+    return await run_idempotent(
+        db, idempotency_key, current_user["user_id"], "reviews", review_data.model_dump(),
+        lambda: record_review(review_data, current_user)
+    )
+
+
+async def record_review(review_data: ReviewCreate, current_user: dict):
+    """Insert a review and fold it into the service rating"""
     # Only students can create reviews
     if current_user["role"] != UserRole.CLIENT:
         raise HTTPException(
@@ -868,33 +1280,33 @@ async def create_review(
         "created_at": datetime.utcnow()
     }
     
+    # Get student info (before the insert: nothing may fail after it)
+    student = await db.users.find_one({"_id": ObjectId(current_user["user_id"])}) or {}
+    
     result = await db.reviews.insert_one(review_doc)
     review_doc["_id"] = result.inserted_id
     
-    # Update service rating
-    all_reviews = await db.reviews.find({"service_id": ObjectId(review_data.service_id)}).to_list(length=1000)
-    avg_rating = sum(r["rating"] for r in all_reviews) / len(all_reviews)
-    
-    await db.services.update_one(
-        {"_id": ObjectId(review_data.service_id)},
-        {"$set": {
-            "rating.average": round(avg_rating, 2),
-            "rating.count": len(all_reviews)
-        }}
-    )
-    
-    # Get student info
-    student = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
+    # Fold the new review into the service's running rating totals. The review
+    # is already committed, so a failed update must not fail the request (a
+    # retry would be refused as a second review); `python ratings.py` repairs it.
+    try:
+        await db.services.update_one(
+            {"_id": ObjectId(review_data.service_id)},
+            rating_update_pipeline(review_data.rating, review_data.safety_rating, review_doc["categories"])
+        )
+    except Exception:
+        logger.exception(f"Rating update failed for review {review_doc['_id']}")
     
     return serialize_review(review_doc, student)
 
-@api_router.get("/reviews/service/{service_id}", response_model=list[ReviewResponse])
+@api_router.get("/reviews/service/{service_id}", response_model=Union[list[ReviewResponse], ReviewPage])
 async def get_service_reviews(
     service_id: str,
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    page_cursor: Optional[str] = Query(None, alias="cursor")
 ):
-    """Get reviews for a service"""
+    """Get reviews for a service (pass ``cursor`` for keyset pagination)"""
     try:
         service = await db.services.find_one({"_id": ObjectId(service_id)})
     except:
@@ -910,53 +1322,33 @@ async def get_service_reviews(
         )
     
     # Get reviews
-    cursor = db.reviews.find(
-        {"service_id": ObjectId(service_id)}
-    ).skip(skip).limit(limit).sort("created_at", -1)
+    query = {"service_id": ObjectId(service_id)}
+    if page_cursor is not None:
+        cursor = db.reviews.find(
+            apply_cursor(query, "created_at", page_cursor)
+        ).sort(sort_spec("created_at")).limit(limit)
+    else:
+        cursor = db.reviews.find(query).skip(skip).limit(limit).sort("created_at", -1)
     
     reviews = await cursor.to_list(length=limit)
     
-    # Get student info for each review
-    results = []
-    for review in reviews:
-        student = await db.users.find_one({"_id": review["student_id"]})
-        if student:
-            results.append(serialize_review(review, student))
+    # One batched lookup for the students of the whole page
+    students = await fetch_users_by_id(review["student_id"] for review in reviews)
+    results = [
+        serialize_review(review, students[review["student_id"]])
+        for review in reviews if review["student_id"] in students
+    ]
     
+    if page_cursor is not None:
+        return {"items": results, "next_cursor": next_cursor(reviews, "created_at", limit)}
     return results
 
 
-# Health check
-@api_router.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "Muyassir API"}
-
-
-
-
-
-# ============================================================
-# CONTRACT ENDPOINTS - Phase 2
-# ============================================================
-
-@api_router.post("/contracts", response_model=ContractResponse, status_code=status.HTTP_201_CREATED)
-async def create_contract(
-    contract_data: ContractCreate,
-    current_user: dict = Depends(get_current_user)
-):
-    """Create a new contract (client only, must be verified)"""
-    if current_user["role"] != UserRole.CLIENT:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only clients can create contracts"
-        )
-    
-    # Check verification status
-    await require_verified_user(current_user["user_id"], "create contracts")
-    
-    # Get service
+@api_router.get("/reviews/service/{service_id}/summary", response_model=RatingSummary)
+async def get_service_rating_summary(service_id: str):
+    """Star histogram and per-category averages, read from the service's aggregates"""
     try:
-        service = await db.services.find_one({"_id": ObjectId(contract_data.service_id)})
+        service = await db.services.find_one({"_id": ObjectId(service_id)}, {"rating": 1})
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -969,45 +1361,42 @@ async def create_contract(
             detail="Service not found"
         )
     
-    # Check availability - block if no slots available
-    available_slots = service.get("available_slots", service.get("capacity", 0))
-    if available_slots <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No available slots for this service. Please try another service or wait for availability."
-        )
-    
-    # Get provider and student info
-    provider = await db.users.find_one({"_id": service["provider_id"]})
-    student = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
-    
-    # Check provider verification status (safety check)
-    provider_verification = provider.get("profile", {}).get("verification_status", "unverified")
-    if provider_verification != VerificationStatus.VERIFIED:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This service provider is not yet verified. Please choose a verified provider."
-        )
-    
+    return rating_summary(service["_id"], service.get("rating"))
+
+
+# Health check
+@api_router.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "Muyassir API"}
+
+
+
+
+
+# ============================================================
+# CONTRACT ENDPOINTS - Phase 2
+# ============================================================
+
+def build_contract_doc(service: dict, provider: dict, student: dict, start_date: date, duration_months: int) -> dict:
+    """Build a new contract document with its terms and payment schedule"""
     # Calculate dates
-    start_date = contract_data.start_date
-    end_date = start_date + relativedelta(months=contract_data.duration_months)
+    end_date = start_date + relativedelta(months=duration_months)
     monthly_price = service["price_monthly"]
-    total_amount = monthly_price * contract_data.duration_months
+    total_amount = monthly_price * duration_months
     
     # Generate contract terms
     terms = generate_contract_terms(
         service=service,
         provider=provider,
         student=student,
-        duration_months=contract_data.duration_months,
+        duration_months=duration_months,
         start_date=start_date
     )
     
     # Generate payment schedule
     payment_schedule = generate_payment_schedule(
         start_date=start_date,
-        duration_months=contract_data.duration_months,
+        duration_months=duration_months,
         monthly_price=monthly_price
     )
     
@@ -1033,13 +1422,13 @@ async def create_contract(
     
     # Create contract document
     contract_doc = {
-        "student_id": ObjectId(current_user["user_id"]),
+        "student_id": student["_id"],
         "provider_id": service["provider_id"],
-        "service_id": ObjectId(contract_data.service_id),
+        "service_id": service["_id"],
         "start_date": datetime.combine(start_date, datetime.min.time()),
         "end_date": datetime.combine(end_date, datetime.min.time()),
         "monthly_price": monthly_price,
-        "duration_months": contract_data.duration_months,
+        "duration_months": duration_months,
         "total_amount": total_amount,
         "auto_generated_terms": terms,
         "student_signature": {
@@ -1054,132 +1443,183 @@ async def create_contract(
         "updated_at": datetime.utcnow()
     }
     
-    result = await db.contracts.insert_one(contract_doc)
-    contract_doc["_id"] = result.inserted_id
-    
-    # Note: Don't decrease slots yet - only after contract becomes ACTIVE
-    
-    return {
-        "id": str(contract_doc["_id"]),
-        "student_id": str(contract_doc["student_id"]),
-        "student_name": student["profile"]["full_name"],
-        "provider_id": str(contract_doc["provider_id"]),
-        "provider_name": provider["profile"]["full_name"],
-        "service_id": str(contract_doc["service_id"]),
-        "service_title": service["title"],
-        "start_date": contract_doc["start_date"],
-        "end_date": contract_doc["end_date"],
-        "monthly_price": contract_doc["monthly_price"],
-        "duration_months": contract_doc["duration_months"],
-        "total_amount": contract_doc["total_amount"],
-        "auto_generated_terms": contract_doc["auto_generated_terms"],
-        "student_signature": contract_doc["student_signature"],
-        "provider_signature": contract_doc["provider_signature"],
-        "payment_schedule": contract_doc["payment_schedule"],
-        "status": contract_doc["status"],
-        "created_at": contract_doc["created_at"],
-        "updated_at": contract_doc["updated_at"]
-    }
+    return contract_doc
 
 
-@api_router.get("/contracts/student/my-contracts", response_model=list[ContractResponse])
-async def get_student_contracts(
+@api_router.post("/contracts", response_model=ContractResponse, status_code=status.HTTP_201_CREATED)
+async def create_contract(
+    contract_data: ContractCreate,
     current_user: dict = Depends(get_current_user),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    """Get student's contracts"""
+    """Create a new contract (client only, must be verified)"""
+    return await run_idempotent(
+        db, idempotency_key, current_user["user_id"], "contracts", contract_data.model_dump(),
+        lambda: record_contract(contract_data, current_user)
+    )
+
+
+async def record_contract(contract_data: ContractCreate, current_user: dict):
+    """Create a contract document for a contract request"""
     if current_user["role"] != UserRole.CLIENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only students can access this endpoint"
+            detail="Only clients can create contracts"
         )
     
-    cursor = db.contracts.find(
-        {"student_id": ObjectId(current_user["user_id"])}
-    ).skip(skip).limit(limit).sort("created_at", -1)
+    # Check verification status
+    await require_verified_user(current_user["user_id"], "create contracts")
     
-    contracts = await cursor.to_list(length=limit)
-    results = []
+    # Get service
+    try:
+        service = await db.services.find_one({"_id": ObjectId(contract_data.service_id)})
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid service ID"
+        )
     
-    for contract in contracts:
-        student = await db.users.find_one({"_id": contract["student_id"]})
-        provider = await db.users.find_one({"_id": contract["provider_id"]})
-        service = await db.services.find_one({"_id": contract["service_id"]})
-        
-        results.append({
-            "id": str(contract["_id"]),
-            "student_id": str(contract["student_id"]),
-            "student_name": student["profile"]["full_name"],
-            "provider_id": str(contract["provider_id"]),
-            "provider_name": provider["profile"]["full_name"],
-            "service_id": str(contract["service_id"]),
-            "service_title": service["title"],
-            "start_date": contract["start_date"],
-            "end_date": contract["end_date"],
-            "monthly_price": contract["monthly_price"],
-            "duration_months": contract["duration_months"],
-            "total_amount": contract["total_amount"],
-            "auto_generated_terms": contract["auto_generated_terms"],
-            "student_signature": contract["student_signature"],
-            "provider_signature": contract["provider_signature"],
-            "payment_schedule": contract["payment_schedule"],
-            "status": contract["status"],
-            "created_at": contract["created_at"],
-            "updated_at": contract["updated_at"]
-        })
+    if not service:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service not found"
+        )
+    
+    # Check availability - block if no slots available
+    available_slots = service.get("available_slots", service.get("capacity", 0))
+    if available_slots <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No available slots for this service. Join the waitlist to get the next free slot."
+        )
+    
+    # Get provider and student info
+    provider = await db.users.find_one({"_id": service["provider_id"]})
+    student = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
+    
+    # Check provider verification status (safety check)
+    provider_verification = provider.get("profile", {}).get("verification_status", "unverified")
+    if provider_verification != VerificationStatus.VERIFIED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This service provider is not yet verified. Please choose a verified provider."
+        )
+    
+    contract_doc = build_contract_doc(
+        service=service,
+        provider=provider,
+        student=student,
+        start_date=contract_data.start_date,
+        duration_months=contract_data.duration_months
+    )
+    
+    result = await db.contracts.insert_one(contract_doc)
+    contract_doc["_id"] = result.inserted_id
     
+    # Note: Don't decrease slots yet - only after contract becomes ACTIVE
+    
+    return {
+        "id": str(contract_doc["_id"]),
+        "student_id": str(contract_doc["student_id"]),
+        "student_name": student["profile"]["full_name"],
+        "provider_id": str(contract_doc["provider_id"]),
+        "provider_name": provider["profile"]["full_name"],
+        "service_id": str(contract_doc["service_id"]),
+        "service_title": service["title"],
+        "start_date": contract_doc["start_date"],
+        "end_date": contract_doc["end_date"],
+        "monthly_price": contract_doc["monthly_price"],
+        "duration_months": contract_doc["duration_months"],
+        "total_amount": contract_doc["total_amount"],
+        "auto_generated_terms": contract_doc["auto_generated_terms"],
+        "student_signature": contract_doc["student_signature"],
+        "provider_signature": contract_doc["provider_signature"],
+        "payment_schedule": contract_doc["payment_schedule"],
+        "status": contract_doc["status"],
+        "created_at": contract_doc["created_at"],
+        "updated_at": contract_doc["updated_at"]
+    }
+
+
+# Projection for list views: drop the terms and everything in the payment
+# schedule except what the summary counts
+CONTRACT_SUMMARY_PROJECTION = {
+    "auto_generated_terms": 0,
+    "payment_schedule.amount": 0,
+    "payment_schedule.paid_at": 0,
+    "payment_schedule.transaction_id": 0
+}
+
+async def list_contracts(
+    query: dict,
+    skip: int,
+    limit: int,
+    page_cursor: Optional[str],
+    summary: bool
+):
+    """Shared implementation of the student/provider contract lists"""
+    projection = CONTRACT_SUMMARY_PROJECTION if summary else None
+    if page_cursor is not None:
+        cursor = db.contracts.find(
+            apply_cursor(query, "created_at", page_cursor), projection
+        ).sort(sort_spec("created_at")).limit(limit)
+    else:
+        cursor = db.contracts.find(query, projection).skip(skip).limit(limit).sort("created_at", -1)
+    
+    contracts = await cursor.to_list(length=limit)
+    results = await serialize_contracts(contracts, summary=summary)
+    
+    if page_cursor is not None:
+        return {"items": results, "next_cursor": next_cursor(contracts, "created_at", limit)}
     return results
 
 
-@api_router.get("/contracts/provider/my-contracts", response_model=list[ContractResponse])
+@api_router.get(
+    "/contracts/student/my-contracts",
+    response_model=Union[list[ContractResponse], list[ContractSummary], ContractPage, ContractSummaryPage]
+)
+async def get_student_contracts(
+    current_user: dict = Depends(get_current_user),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    summary: bool = False
+):
+    """Get student's contracts (``summary=true`` omits terms and payment schedule)"""
+    if current_user["role"] != UserRole.CLIENT:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can access this endpoint"
+        )
+    
+    return await list_contracts(
+        {"student_id": ObjectId(current_user["user_id"])},
+        skip, limit, page_cursor, summary
+    )
+
+
+@api_router.get(
+    "/contracts/provider/my-contracts",
+    response_model=Union[list[ContractResponse], list[ContractSummary], ContractPage, ContractSummaryPage]
+)
 async def get_provider_contracts(
     current_user: dict = Depends(get_current_user),
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    summary: bool = False
 ):
-    """Get provider's contracts"""
+    """Get provider's contracts (``summary=true`` omits terms and payment schedule)"""
     if current_user["role"] != UserRole.SERVICE_PROVIDER:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only providers can access this endpoint"
         )
     
-    cursor = db.contracts.find(
-        {"provider_id": ObjectId(current_user["user_id"])}
-    ).skip(skip).limit(limit).sort("created_at", -1)
-    
-    contracts = await cursor.to_list(length=limit)
-    results = []
-    
-    for contract in contracts:
-        student = await db.users.find_one({"_id": contract["student_id"]})
-        provider = await db.users.find_one({"_id": contract["provider_id"]})
-        service = await db.services.find_one({"_id": contract["service_id"]})
-        
-        results.append({
-            "id": str(contract["_id"]),
-            "student_id": str(contract["student_id"]),
-            "student_name": student["profile"]["full_name"],
-            "provider_id": str(contract["provider_id"]),
-            "provider_name": provider["profile"]["full_name"],
-            "service_id": str(contract["service_id"]),
-            "service_title": service["title"],
-            "start_date": contract["start_date"],
-            "end_date": contract["end_date"],
-            "monthly_price": contract["monthly_price"],
-            "duration_months": contract["duration_months"],
-            "total_amount": contract["total_amount"],
-            "auto_generated_terms": contract["auto_generated_terms"],
-            "student_signature": contract["student_signature"],
-            "provider_signature": contract["provider_signature"],
-            "payment_schedule": contract["payment_schedule"],
-            "status": contract["status"],
-            "created_at": contract["created_at"],
-            "updated_at": contract["updated_at"]
-        })
-    
-    return results
+    return await list_contracts(
+        {"provider_id": ObjectId(current_user["user_id"])},
+        skip, limit, page_cursor, summary
+    )
 
 
 @api_router.get("/contracts/{contract_id}", response_model=ContractResponse)
@@ -1237,6 +1677,64 @@ async def get_contract(
     }
 
 
+async def transition_contract(contract_id: str, current_user: dict, action: str, extra: Optional[dict] = None) -> dict:
+    """Apply a contract state transition as one conditional write.
+
+    The expected status and the acting party are part of the filter, so of
+    two concurrent transitions on the same contract exactly one matches;
+    the other is rejected. ``extra`` fields are set in the same write.
+    Returns the updated contract document.
+    """
+    transition = CONTRACT_TRANSITIONS[action]
+    try:
+        contract_oid = ObjectId(contract_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid contract ID")
+    
+    user_id = ObjectId(current_user["user_id"])
+    now = datetime.utcnow()
+    update_data = {"status": transition["to"], "updated_at": now}
+    if transition["signature"]:
+        update_data[transition["signature"]] = {
+            "signed": True,
+            "signed_at": now,
+            "ip_address": "0.0.0.0"
+        }
+    update_data.update(extra or {})
+    
+    contract = await db.contracts.find_one_and_update(
+        {
+            "_id": contract_oid,
+            "status": {"$in": transition["from"]},
+            "$or": [{actor: user_id} for actor in transition["actors"]]
+        },
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
+    )
+    if contract:
+        await notify(
+            [contract["student_id"], contract["provider_id"]], "contract.updated",
+            {"contract_id": contract_id, "status": contract["status"]}, topic="contracts"
+        )
+        return contract
+    
+    # Nothing matched: look once more only to report why
+    current = await db.contracts.find_one({"_id": contract_oid}, {"status": 1, "student_id": 1, "provider_id": 1})
+    if not current:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    if all(current[actor] != user_id for actor in transition["actors"]):
+        raise HTTPException(status_code=403, detail="Not your contract")
+    raise HTTPException(
+        status_code=400,
+        detail=f"{transition['error']} (status: {current['status']})"
+    )
+
+
+async def serialize_contract_doc(contract: dict) -> dict:
+    """Serialize a single contract with its parties and service"""
+    return (await serialize_contracts([contract]))[0]
+
+
 @api_router.post("/contracts/{contract_id}/provider-accept", response_model=ContractResponse)
 async def provider_accept_contract(
     contract_id: str,
@@ -1246,39 +1744,9 @@ async def provider_accept_contract(
     if current_user["role"] != UserRole.SERVICE_PROVIDER:
         raise HTTPException(status_code=403, detail="Only providers can accept contracts")
     
-    try:
-        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    except:
-        raise HTTPException(status_code=400, detail="Invalid contract ID")
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
-    
-    if contract["provider_id"] != ObjectId(current_user["user_id"]):
-        raise HTTPException(status_code=403, detail="Not your contract")
-    
-    if contract["status"] != ContractStatus.PENDING_PROVIDER_APPROVAL:
-        raise HTTPException(status_code=400, detail=f"Contract is not pending approval (status: {contract['status']})")
-    
     # Provider accepts - move to awaiting student confirmation
-    update_data = {
-        "status": ContractStatus.AWAITING_STUDENT_CONFIRMATION,
-        "provider_signature": {
-            "signed": True,
-            "signed_at": datetime.utcnow(),
-            "ip_address": "0.0.0.0"
-        },
-        "updated_at": datetime.utcnow()
-    }
-    
-    await db.contracts.update_one({"_id": ObjectId(contract_id)}, {"$set": update_data})
-    
-    updated_contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    student = await db.users.find_one({"_id": updated_contract["student_id"]})
-    provider = await db.users.find_one({"_id": updated_contract["provider_id"]})
-    service = await db.services.find_one({"_id": updated_contract["service_id"]})
-    
-    return serialize_contract(updated_contract, student, provider, service)
+    contract = await transition_contract(contract_id, current_user, "provider_accept")
+    return await serialize_contract_doc(contract)
 
 
 @api_router.post("/contracts/{contract_id}/provider-reject", response_model=ContractResponse)
@@ -1290,34 +1758,13 @@ async def provider_reject_contract(
     if current_user["role"] != UserRole.SERVICE_PROVIDER:
         raise HTTPException(status_code=403, detail="Only providers can reject contracts")
     
-    try:
-        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    except:
-        raise HTTPException(status_code=400, detail="Invalid contract ID")
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
-    
-    if contract["provider_id"] != ObjectId(current_user["user_id"]):
-        raise HTTPException(status_code=403, detail="Not your contract")
+    contract = await transition_contract(contract_id, current_user, "provider_reject")
     
-    if contract["status"] != ContractStatus.PENDING_PROVIDER_APPROVAL:
-        raise HTTPException(status_code=400, detail="Contract is not pending approval")
+    # A request promoted from the waitlist holds its slot; pass it on
+    if contract.get("slot_reserved"):
+        await hand_over_slot(contract["service_id"])
     
-    # Provider rejects
-    update_data = {
-        "status": ContractStatus.REJECTED,
-        "updated_at": datetime.utcnow()
-    }
-    
-    await db.contracts.update_one({"_id": ObjectId(contract_id)}, {"$set": update_data})
-    
-    updated_contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    student = await db.users.find_one({"_id": updated_contract["student_id"]})
-    provider = await db.users.find_one({"_id": updated_contract["provider_id"]})
-    service = await db.services.find_one({"_id": updated_contract["service_id"]})
-    
-    return serialize_contract(updated_contract, student, provider, service)
+    return await serialize_contract_doc(contract)
 
 
 @api_router.post("/contracts/{contract_id}/student-confirm", response_model=ContractResponse)
@@ -1330,44 +1777,89 @@ async def student_confirm_contract(
         raise HTTPException(status_code=403, detail="Only students can confirm contracts")
     
     try:
-        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        pending = await db.contracts.find_one(
+            {"_id": ObjectId(contract_id)},
+            {"service_id": 1, "student_id": 1, "status": 1, "slot_reserved": 1}
+        )
     except:
         raise HTTPException(status_code=400, detail="Invalid contract ID")
     
-    if not contract:
+    # Report errors from the document already read; never write from here
+    if not pending:
         raise HTTPException(status_code=404, detail="Contract not found")
-    
-    if contract["student_id"] != ObjectId(current_user["user_id"]):
+    if pending["student_id"] != ObjectId(current_user["user_id"]):
         raise HTTPException(status_code=403, detail="Not your contract")
+    if pending["status"] != ContractStatus.AWAITING_STUDENT_CONFIRMATION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{CONTRACT_TRANSITIONS['student_confirm']['error']} (status: {pending['status']})"
+        )
     
-    if contract["status"] != ContractStatus.AWAITING_STUDENT_CONFIRMATION:
-        raise HTTPException(status_code=400, detail="Contract is not awaiting your confirmation")
-    
-    # Student confirms - contract becomes ACTIVE and capacity is reserved
-    update_data = {
-        "status": ContractStatus.ACTIVE,
-        "student_signature": {
-            "signed": True,
-            "signed_at": datetime.utcnow(),
-            "ip_address": "0.0.0.0"
-        },
-        "updated_at": datetime.utcnow()
-    }
+    # Take the slot first: a full service fails here without touching the
+    # contract. A request promoted from the waitlist already holds one.
+    holds_slot = pending.get("slot_reserved", False)
+    if not holds_slot and not await reserve_slot(db, pending["service_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No available slots for this service. Please try another service or wait for availability."
+        )
     
-    await db.contracts.update_one({"_id": ObjectId(contract_id)}, {"$set": update_data})
+    # Student confirms - contract becomes ACTIVE holding the reserved slot
+    try:
+        contract = await transition_contract(
+            contract_id, current_user, "student_confirm", extra={"slot_reserved": True}
+        )
+    except HTTPException:
+        # Lost a race with another confirm or a cancel - hand the slot back
+        if not holds_slot:
+            await release_slot(db, pending["service_id"])
+        raise
     
-    # Now reserve capacity
-    await db.services.update_one(
-        {"_id": contract["service_id"]},
-        {"$inc": {"available_slots": -1}}
+    return await serialize_contract_doc(contract)
+
+
+def serialize_contract_summary(contract, student, provider, service):
+    """Helper to serialize the list view of a contract"""
+    schedule = contract.get("payment_schedule", [])
+    pending = [item for item in schedule if item.get("status") == PaymentStatus.PENDING]
+    return {
+        "id": str(contract["_id"]),
+        "student_id": str(contract["student_id"]),
+        "student_name": student["profile"]["full_name"],
+        "provider_id": str(contract["provider_id"]),
+        "provider_name": provider["profile"]["full_name"],
+        "service_id": str(contract["service_id"]),
+        "service_title": service["title"],
+        "start_date": contract["start_date"],
+        "end_date": contract["end_date"],
+        "monthly_price": contract["monthly_price"],
+        "duration_months": contract["duration_months"],
+        "total_amount": contract["total_amount"],
+        "payments_paid": sum(1 for item in schedule if item.get("status") == PaymentStatus.PAID),
+        "payments_total": len(schedule),
+        "next_payment_due": pending[0].get("due_date") if pending else None,
+        "status": contract["status"],
+        "created_at": contract["created_at"],
+        "updated_at": contract["updated_at"]
+    }
+
+
+async def serialize_contracts(contracts: list, summary: bool = False) -> list:
+    """Serialize a page of contracts with batched user and service lookups"""
+    users = await fetch_users_by_id(
+        [c["student_id"] for c in contracts] + [c["provider_id"] for c in contracts]
     )
-    
-    updated_contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    student = await db.users.find_one({"_id": updated_contract["student_id"]})
-    provider = await db.users.find_one({"_id": updated_contract["provider_id"]})
-    service = await db.services.find_one({"_id": updated_contract["service_id"]})
-    
-    return serialize_contract(updated_contract, student, provider, service)
+    services = await fetch_by_id(db.services, (c["service_id"] for c in contracts), {"title": 1})
+    serialize = serialize_contract_summary if summary else serialize_contract
+    return [
+        serialize(
+            contract,
+            users.get(contract["student_id"], UNKNOWN_USER),
+            users.get(contract["provider_id"], UNKNOWN_USER),
+            services.get(contract["service_id"], UNKNOWN_SERVICE)
+        )
+        for contract in contracts
+    ]
 
 
 def serialize_contract(contract, student, provider, service):
@@ -1441,110 +1933,285 @@ async def cancel_contract(
     current_user: dict = Depends(get_current_user)
 ):
     """Cancel a contract"""
-    try:
-        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid contract ID"
-        )
+    contract = await transition_contract(contract_id, current_user, "cancel")
     
-    if not contract:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Contract not found"
-        )
+    # Only an ACTIVE contract or a promoted request holds a slot; CANCELLED
+    # is terminal so this runs at most once per contract
+    if contract.get("slot_reserved"):
+        await hand_over_slot(contract["service_id"])
     
-    # Check access
-    user_id = ObjectId(current_user["user_id"])
-    if contract["student_id"] != user_id and contract["provider_id"] != user_id:
+    return await serialize_contract_doc(contract)
+
+
+@api_router.put("/contracts/{contract_id}/complete", response_model=ContractResponse)
+async def complete_contract(
+    contract_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Mark an ACTIVE contract as COMPLETED (student only)"""
+    if current_user["role"] != UserRole.CLIENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have access to this contract"
+            detail="Only students can mark contracts as completed"
         )
     
-    # Update status
-    await db.contracts.update_one(
-        {"_id": ObjectId(contract_id)},
-        {"$set": {
-            "status": ContractStatus.CANCELLED,
-            "updated_at": datetime.utcnow()
-        }}
-    )
-    
-    # Restore available slots
-    await db.services.update_one(
-        {"_id": contract["service_id"]},
-        {"$inc": {"available_slots": 1}}
-    )
+    contract = await transition_contract(contract_id, current_user, "complete")
     
-    # Get updated contract
-    updated_contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    student = await db.users.find_one({"_id": updated_contract["student_id"]})
-    provider = await db.users.find_one({"_id": updated_contract["provider_id"]})
-    service = await db.services.find_one({"_id": updated_contract["service_id"]})
+    # The finished contract frees its slot for the next student in line
+    if contract.get("slot_reserved"):
+        await hand_over_slot(contract["service_id"])
     
+    return await serialize_contract_doc(contract)
+
+
+# ============================================================
+# WAITLIST ENDPOINTS
+# ============================================================
+
+def serialize_waitlist_entry(entry: dict, service: dict, position: Optional[int] = None) -> dict:
+    """Helper to serialize a waitlist entry"""
     return {
-        "id": str(updated_contract["_id"]),
-        "student_id": str(updated_contract["student_id"]),
-        "student_name": student["profile"]["full_name"],
-        "provider_id": str(updated_contract["provider_id"]),
-        "provider_name": provider["profile"]["full_name"],
-        "service_id": str(updated_contract["service_id"]),
+        "id": str(entry["_id"]),
+        "service_id": str(entry["service_id"]),
         "service_title": service["title"],
-        "start_date": updated_contract["start_date"],
-        "end_date": updated_contract["end_date"],
-        "monthly_price": updated_contract["monthly_price"],
-        "duration_months": updated_contract["duration_months"],
-        "total_amount": updated_contract["total_amount"],
-        "auto_generated_terms": updated_contract["auto_generated_terms"],
-        "student_signature": updated_contract["student_signature"],
-        "provider_signature": updated_contract["provider_signature"],
-        "payment_schedule": updated_contract["payment_schedule"],
-        "status": updated_contract["status"],
-        "created_at": updated_contract["created_at"],
-        "updated_at": updated_contract["updated_at"]
+        "student_id": str(entry["student_id"]),
+        "start_date": entry["start_date"],
+        "duration_months": entry["duration_months"],
+        "status": entry["status"],
+        "position": position,
+        "contract_id": str(entry["contract_id"]) if entry.get("contract_id") else None,
+        "created_at": entry["created_at"],
+        "promoted_at": entry.get("promoted_at")
     }
 
 
-@api_router.put("/contracts/{contract_id}/complete", response_model=ContractResponse)
-async def complete_contract(
-    contract_id: str,
+async def hand_over_slot(service_id: ObjectId):
+    """Give a freed slot to the head of the waitlist, or back to the service"""
+    if not await promote_from_waitlist(service_id):
+        await release_slot(db, service_id)
+
+
+async def promote_from_waitlist(service_id: ObjectId) -> Optional[dict]:
+    """Turn the head of a service's waitlist into a new contract request.
+
+    Called once for every slot that is freed. The new request keeps holding
+    that slot (``slot_reserved``), so a newcomer cannot book it ahead of the
+    line. Returns the created contract, or None when nobody can be promoted.
+    """
+    service = await db.services.find_one({"_id": service_id})
+    if not service or service.get("status") != ServiceStatus.ACTIVE:
+        # Gone, inactive or suspended: leave the line as it is
+        return None
+    provider = await db.users.find_one({"_id": service.get("provider_id")})
+    if not provider:
+        return None
+    
+    while True:
+        entry = await pop_next_waiting(db, service_id)
+        if not entry:
+            return None
+        student = await db.users.find_one({"_id": entry["student_id"]})
+        if student:
+            break
+        # The student's account is gone: drop the entry and try the next one
+        await db.waitlist.update_one({"_id": entry["_id"]}, {"$set": {"status": WaitlistStatus.LEFT}})
+    
+    # A start date that passed while waiting moves to today
+    start_date = max(entry["start_date"].date(), date.today())
+    contract_doc = build_contract_doc(
+        service=service,
+        provider=provider,
+        student=student,
+        start_date=start_date,
+        duration_months=entry["duration_months"]
+    )
+    contract_doc["waitlist_entry_id"] = entry["_id"]
+    contract_doc["slot_reserved"] = True
+    try:
+        result = await db.contracts.insert_one(contract_doc)
+    except Exception:
+        # Put the student back at the head of the line; the slot goes back to the service
+        await db.waitlist.update_one(
+            {"_id": entry["_id"]},
+            {"$set": {"status": WaitlistStatus.WAITING}, "$unset": {"promoted_at": ""}}
+        )
+        logger.exception(f"Could not promote waitlist entry {entry['_id']}")
+        return None
+    contract_doc["_id"] = result.inserted_id
+    
+    await db.waitlist.update_one({"_id": entry["_id"]}, {"$set": {"contract_id": result.inserted_id}})
+    logger.info(f"Promoted waitlist entry {entry['_id']} to contract {result.inserted_id}")
+    await notify(
+        [student["_id"]], "waitlist.promoted",
+        {"entry_id": str(entry["_id"]), "contract_id": str(result.inserted_id), "service_id": str(service_id)},
+        topic="contracts"
+    )
+    return contract_doc
+
+
+async def fill_from_waitlist(service_id: ObjectId):
+    """Hand the free slots of a service that is active again to its waitlist"""
+    while await reserve_slot(db, service_id):
+        if not await promote_from_waitlist(service_id):
+            await release_slot(db, service_id)
+            return
+
+
+async def expire_stale_promotions() -> int:
+    """Cancel promoted requests left unanswered past PROMOTION_TTL and pass
+    their slots on. Returns how many were expired."""
+    now = datetime.utcnow()
+    expired = 0
+    async for stale in db.contracts.find(stale_promotion_filter(now), {"_id": 1}):
+        # Conditional again: an answer that lands meanwhile wins
+        contract = await db.contracts.find_one_and_update(
+            {"_id": stale["_id"], **stale_promotion_filter(now)},
+            {"$set": {"status": ContractStatus.CANCELLED, "expired": True, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not contract:
+            continue
+        await db.waitlist.update_one(
+            {"_id": contract["waitlist_entry_id"]}, {"$set": {"status": WaitlistStatus.LEFT}}
+        )
+        await notify(
+            [contract["student_id"], contract["provider_id"]], "contract.updated",
+            {"contract_id": str(contract["_id"]), "status": contract["status"]}, topic="contracts"
+        )
+        await hand_over_slot(contract["service_id"])
+        expired += 1
+    if expired:
+        logger.info(f"Expired {expired} unanswered waitlist promotions")
+    return expired
+
+
+async def sweep_stale_promotions():
+    while True:
+        try:
+            await expire_stale_promotions()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Waitlist promotion sweep failed")
+        await asyncio.sleep(PROMOTION_SWEEP_SECONDS)
+
+
+@api_router.post("/services/{service_id}/waitlist", response_model=WaitlistEntryResponse, status_code=status.HTTP_201_CREATED)
+async def join_waitlist(
+    service_id: str,
+    entry_data: WaitlistJoin,
     current_user: dict = Depends(get_current_user)
 ):
-    """Mark an ACTIVE contract as COMPLETED (student only)"""
+    """Join the waitlist of a full service (client only, must be verified)"""
     if current_user["role"] != UserRole.CLIENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only students can mark contracts as completed"
+            detail="Only clients can join waitlists"
         )
     
+    await require_verified_user(current_user["user_id"], "join waitlists")
+    
     try:
-        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        service = await db.services.find_one({"_id": ObjectId(service_id)}, {"title": 1, "capacity": 1, "available_slots": 1})
     except:
-        raise HTTPException(status_code=400, detail="Invalid contract ID")
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid service ID"
+        )
     
-    if contract["student_id"] != ObjectId(current_user["user_id"]):
-        raise HTTPException(status_code=403, detail="Not your contract")
+    if not service:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service not found"
+        )
     
-    if contract["status"] != ContractStatus.ACTIVE:
-        raise HTTPException(status_code=400, detail="Only ACTIVE contracts can be marked as completed")
+    if service.get("available_slots", service.get("capacity", 0)) > 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This service still has free slots. Request a contract instead."
+        )
     
-    # Mark as completed
-    await db.contracts.update_one(
-        {"_id": ObjectId(contract_id)},
-        {"$set": {"status": ContractStatus.COMPLETED, "updated_at": datetime.utcnow()}}
+    student_id = ObjectId(current_user["user_id"])
+    already_waiting = await db.waitlist.find_one(
+        {"service_id": service["_id"], "student_id": student_id, "status": WaitlistStatus.WAITING},
+        {"_id": 1}
     )
+    if already_waiting:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You are already on the waitlist for this service"
+        )
+    
+    entry = {
+        "service_id": service["_id"],
+        "student_id": student_id,
+        "start_date": datetime.combine(entry_data.start_date, datetime.min.time()),
+        "duration_months": entry_data.duration_months,
+        "status": WaitlistStatus.WAITING,
+        "contract_id": None,
+        "created_at": datetime.utcnow(),
+        "promoted_at": None
+    }
     
-    updated_contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
-    student = await db.users.find_one({"_id": updated_contract["student_id"]})
-    provider = await db.users.find_one({"_id": updated_contract["provider_id"]})
-    service = await db.services.find_one({"_id": updated_contract["service_id"]})
+    try:
+        result = await db.waitlist.insert_one(entry)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent join from the same student
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You are already on the waitlist for this service"
+        )
+    entry["_id"] = result.inserted_id
     
-    return serialize_contract(updated_contract, student, provider, service)
+    return serialize_waitlist_entry(entry, service, await waitlist_position(db, entry))
+
+
+@api_router.get("/waitlist/my", response_model=list[WaitlistEntryResponse])
+async def get_my_waitlist(current_user: dict = Depends(get_current_user)):
+    """Get the current student's waitlist entries, newest first"""
+    entries = await db.waitlist.find(
+        {"student_id": ObjectId(current_user["user_id"])}
+    ).sort("created_at", -1).to_list(length=100)
+    
+    services = await fetch_by_id(db.services, (e["service_id"] for e in entries), {"title": 1})
+    result = []
+    for entry in entries:
+        position = None
+        if entry["status"] == WaitlistStatus.WAITING:
+            position = await waitlist_position(db, entry)
+        result.append(serialize_waitlist_entry(entry, services.get(entry["service_id"], UNKNOWN_SERVICE), position))
+    
+    return result
+
+
+@api_router.delete("/waitlist/{entry_id}")
+async def leave_waitlist(
+    entry_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Leave a waitlist"""
+    try:
+        result = await db.waitlist.update_one(
+            {
+                "_id": ObjectId(entry_id),
+                "student_id": ObjectId(current_user["user_id"]),
+                "status": WaitlistStatus.WAITING
+            },
+            {"$set": {"status": WaitlistStatus.LEFT}}
+        )
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid waitlist entry ID"
+        )
+    
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Waitlist entry not found"
+        )
+    
+    return {"message": "Left the waitlist"}
 
 
 # ============================================================
@@ -1554,46 +2221,76 @@ async def complete_contract(
 @api_router.post("/payments", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
 async def make_payment(
     payment_data: PaymentCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Process a payment (student only)"""
+    return await run_idempotent(
+        db, idempotency_key, current_user["user_id"], "payments", payment_data.model_dump(),
+        lambda: record_payment(payment_data, current_user)
+    )
+
+
+async def record_payment(payment_data: PaymentCreate, current_user: dict):
+    """Settle the next installment and insert its payment record"""
     if current_user["role"] != UserRole.CLIENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only students can make payments"
         )
     
-    # Get contract
     try:
-        contract = await db.contracts.find_one({"_id": ObjectId(payment_data.contract_id)})
+        contract_oid = ObjectId(payment_data.contract_id)
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid contract ID"
         )
     
-    if not contract:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Contract not found"
-        )
-    
-    # Verify student owns contract
-    if str(contract["student_id"]) != current_user["user_id"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only pay for your own contracts"
-        )
+    student_id = ObjectId(current_user["user_id"])
     
     # Calculate revenue split
     split = calculate_revenue_split(payment_data.amount)
     
     # Generate transaction ID
     transaction_id = generate_transaction_id()
+    now = datetime.utcnow()
     
-    # Create payment record
+    # Settle the first pending installment in place. The positional $ targets
+    # the first array element matched by the filter, so two concurrent
+    # payments always settle two different installments.
+    contract = await db.contracts.find_one_and_update(
+        {"_id": contract_oid, "student_id": student_id, "payment_schedule.status": PaymentStatus.PENDING},
+        {"$set": {
+            "payment_schedule.$.status": PaymentStatus.PAID,
+            "payment_schedule.$.paid_at": now,
+            "payment_schedule.$.transaction_id": transaction_id,
+            "updated_at": now
+        }},
+        projection={"student_id": 1, "provider_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not contract:
+        # Nothing matched: look once more only to report why
+        current = await db.contracts.find_one({"_id": contract_oid}, {"student_id": 1})
+        if not current:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Contract not found"
+            )
+        if current["student_id"] != student_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only pay for your own contracts"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This contract has no pending installments"
+        )
+    
+    # Create payment record, linked to the installment by transaction_id
     payment_doc = {
-        "contract_id": ObjectId(payment_data.contract_id),
+        "contract_id": contract_oid,
         "student_id": contract["student_id"],
         "provider_id": contract["provider_id"],
         "amount": payment_data.amount,
@@ -1602,26 +2299,32 @@ async def make_payment(
         "payment_method": payment_data.payment_method,
         "transaction_id": transaction_id,
         "status": PaymentStatus.PAID,
-        "paid_at": datetime.utcnow(),
-        "created_at": datetime.utcnow()
+        "paid_at": now,
+        "created_at": now
     }
     
-    result = await db.payments.insert_one(payment_doc)
+    try:
+        result = await db.payments.insert_one(payment_doc)
+    except Exception:
+        # Without a payment record the installment must not stay settled
+        await db.contracts.update_one(
+            {"_id": contract_oid, "payment_schedule.transaction_id": transaction_id},
+            {"$set": {
+                "payment_schedule.$.status": PaymentStatus.PENDING,
+                "payment_schedule.$.paid_at": None,
+                "payment_schedule.$.transaction_id": None
+            }}
+        )
+        raise
     payment_doc["_id"] = result.inserted_id
     
-    # Update payment schedule (mark first pending as paid)
-    payment_schedule = contract["payment_schedule"]
-    for item in payment_schedule:
-        if item["status"] == "pending":
-            item["status"] = "paid"
-            item["paid_at"] = datetime.utcnow()
-            item["transaction_id"] = transaction_id
-            break
-    
-    await db.contracts.update_one(
-        {"_id": ObjectId(payment_data.contract_id)},
-        {"$set": {"payment_schedule": payment_schedule, "updated_at": datetime.utcnow()}}
-    )
+    # Keep the provider's earnings rollups current. The payment is already
+    # committed, so a failed rollup must not fail the request (a retry would
+    # settle the next installment); `python earnings.py` rebuilds the rollups.
+    try:
+        await record_earnings(db, payment_doc)
+    except Exception:
+        logger.exception(f"Earnings rollup failed for payment {payment_doc['_id']}")
     
     return {
         "id": str(payment_doc["_id"]),
@@ -1691,6 +2394,8 @@ async def get_contract_payments(
 
 @api_router.get("/payments/provider/earnings")
 async def get_provider_earnings(
+    days: int = Query(30, ge=1, le=366),
+    months: int = Query(12, ge=1, le=60),
     current_user: dict = Depends(get_current_user)
 ):
     """Get provider's earnings dashboard"""
@@ -1700,24 +2405,35 @@ async def get_provider_earnings(
             detail="Only providers can access earnings"
         )
     
-    # Get all payments for this provider
-    cursor = db.payments.find(
-        {"provider_id": ObjectId(current_user["user_id"])}
-    )
-    
-    payments = await cursor.to_list(length=10000)
-    
-    # Calculate totals
-    total_earnings = sum(p["provider_amount"] for p in payments)
-    total_transactions = len(payments)
-    total_gross = sum(p["amount"] for p in payments)
-    total_platform_fees = sum(p["platform_fee"] for p in payments)
+    provider_id = ObjectId(current_user["user_id"])
+    
+    # Totals and chart buckets come from the rollups kept by record_earnings,
+    # so this costs the same whatever the provider's payment volume
+    today = bucket_start("day", datetime.utcnow())
+    totals = await db.provider_earnings.find_one({"_id": rollup_id(provider_id, "all")}) or {}
+    daily = await db.provider_earnings.find({
+        "provider_id": provider_id,
+        "period": "day",
+        "start": {"$gte": today - relativedelta(days=days - 1)}
+    }).sort("start", 1).to_list(length=days)
+    monthly = await db.provider_earnings.find({
+        "provider_id": provider_id,
+        "period": "month",
+        "start": {"$gte": bucket_start("month", today) - relativedelta(months=months - 1)}
+    }).sort("start", 1).to_list(length=months)
+    
+    # Latest payments first
+    recent = await db.payments.find(
+        {"provider_id": provider_id},
+        {"amount": 1, "provider_amount": 1, "platform_fee": 1, "transaction_id": 1, "paid_at": 1}
+    ).sort([("paid_at", -1), ("_id", -1)]).to_list(length=10)
     
     return {
-        "total_earnings": round(total_earnings, 2),
-        "total_transactions": total_transactions,
-        "total_gross": round(total_gross, 2),
-        "total_platform_fees": round(total_platform_fees, 2),
+        "total_earnings": round(totals.get("earnings", 0), 2),
+        "total_transactions": totals.get("transactions", 0),
+        "total_gross": round(totals.get("gross", 0), 2),
+        "total_platform_fees": round(totals.get("platform_fees", 0), 2),
+        "last_payment_at": totals.get("last_payment_at"),
         "recent_payments": [{
             "id": str(p["_id"]),
             "amount": p["amount"],
@@ -1725,15 +2441,29 @@ async def get_provider_earnings(
             "platform_fee": p["platform_fee"],
             "transaction_id": p["transaction_id"],
             "paid_at": p["paid_at"]
-        } for p in payments[:10]]
+        } for p in recent],
+        "daily": [serialize_bucket(doc) for doc in daily],
+        "monthly": [serialize_bucket(doc) for doc in monthly]
     }
 
-# Include router in app
-app.include_router(api_router)
-
-
 # ==================== CHAT ENDPOINTS ====================
 
+@api_router.websocket("/ws")
+async def chat_socket(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """Push channel for new messages, read receipts and unread counts (``?token=<JWT>``)"""
+    try:
+        current_user = verify_token(token or "")
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    subscriber = registry.subscribe(current_user["user_id"])
+    try:
+        await serve_subscriber(websocket, subscriber)
+    finally:
+        registry.unsubscribe(subscriber)
+
 @api_router.post("/conversations", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     data: ConversationCreate,
@@ -1762,6 +2492,7 @@ async def create_conversation(
         "contract_id": data.contract_id,
         "last_message": None,
         "last_message_time": None,
+        "unread": {p_id: 0 for p_id in participants},
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
@@ -1776,16 +2507,23 @@ async def get_conversations(current_user: dict = Depends(get_current_user)):
     user_id = current_user["user_id"]
     cursor = db.conversations.find({"participants": user_id}).sort("updated_at", -1)
     conversations = await cursor.to_list(length=100)
-    return [await serialize_conversation(conv, user_id) for conv in conversations]
+    return await serialize_conversations(conversations, user_id)
 
-@api_router.get("/conversations/{conversation_id}/messages", response_model=list[MessageResponse])
+@api_router.get("/conversations/{conversation_id}/messages", response_model=Union[list[MessageResponse], MessagePage])
 async def get_messages(
     conversation_id: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    latest: bool = Query(False),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get messages from a conversation"""
+    """Get messages from a conversation, oldest first.
+
+    With ``cursor`` the page continues after the last message already seen
+    and the response is ``{items, next_cursor}``. With ``latest`` it is the
+    newest ``limit`` messages, which is what the chat screen opens on.
+    """
     try:
         conv = await db.conversations.find_one({"_id": ObjectId(conversation_id)})
     except:
@@ -1794,24 +2532,70 @@ async def get_messages(
     if not conv or current_user["user_id"] not in conv["participants"]:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    cursor = db.messages.find({"conversation_id": conversation_id}).sort("timestamp", 1).skip(skip).limit(limit)
-    messages = await cursor.to_list(length=limit)
+    if page_cursor is not None:
+        messages = await message_store.page_after(db, conversation_id, page_cursor, limit)
+    elif latest:
+        messages = await message_store.latest(db, conversation_id, limit)
+    else:
+        messages = await message_store.page(db, conversation_id, skip, limit)
+    
+    # Mark the conversation read: move the reader's watermark, no per-message writes
+    if await mark_conversation_read(conv, current_user["user_id"]):
+        await notify([current_user["user_id"]], "unread.changed", {"conversation_id": conversation_id, "unread_count": 0})
+        await notify(
+            [p_id for p_id in conv["participants"] if p_id != current_user["user_id"]],
+            "conversation.read",
+            {
+                "conversation_id": conversation_id,
+                "reader_id": current_user["user_id"],
+                "read_up_to": conv["last_message_time"],
+                "read_at": datetime.utcnow()
+            }
+        )
     
-    # Mark messages as read
-    await db.messages.update_many(
-        {"conversation_id": conversation_id, "sender_id": {"$ne": current_user["user_id"]}, "is_read": False},
-        {"$set": {"is_read": True}}
+    if page_cursor is not None:
+        return {
+            "items": [serialize_message(msg, conv) for msg in messages],
+            "next_cursor": next_cursor(messages, "timestamp", limit)
+        }
+    return [serialize_message(msg, conv) for msg in messages]
+
+async def mark_conversation_read(conv: dict, user_id: str) -> bool:
+    """Move ``user_id``'s read watermark up to the conversation's latest message.
+    
+    One small write on the conversation, and none when nothing is unread. If
+    a message arrived after ``conv`` was loaded the write does not match and
+    that message stays unread. Returns whether anything was marked read.
+    """
+    latest = conv.get("last_message_time")
+    watermark = conv.get("read_up_to", {}).get(user_id)
+    if latest is None or (watermark is not None and watermark >= latest):
+        return False
+    result = await db.conversations.update_one(
+        {"_id": conv["_id"], "last_message_time": latest},
+        {
+            "$max": {f"read_up_to.{user_id}": latest},
+            "$set": {f"unread.{user_id}": 0}
+        }
     )
-    
-    return [serialize_message(msg) for msg in messages]
+    return result.modified_count > 0
 
 @api_router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
     conversation_id: str,
     data: MessageCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Send a message in a conversation"""
+    return await run_idempotent(
+        db, idempotency_key, current_user["user_id"], f"messages:{conversation_id}", data.model_dump(),
+        lambda: record_message(conversation_id, data, current_user)
+    )
+
+
+async def record_message(conversation_id: str, data: MessageCreate, current_user: dict):
+    """Insert a message and bump its conversation"""
     try:
         conv = await db.conversations.find_one({"_id": ObjectId(conversation_id)})
     except:
@@ -1824,55 +2608,93 @@ async def send_message(
     sender_name = user.get("profile", {}).get("full_name", "Unknown")
     
     msg_doc = {
+        "_id": ObjectId(),
         "conversation_id": conversation_id,
         "sender_id": current_user["user_id"],
         "sender_name": sender_name,
         "content": data.content,
-        "timestamp": datetime.utcnow(),
-        "is_read": False
+        "timestamp": datetime.utcnow()
     }
-    result = await db.messages.insert_one(msg_doc)
-    msg_doc["_id"] = result.inserted_id
-    
-    # Update conversation
-    await db.conversations.update_one(
-        {"_id": ObjectId(conversation_id)},
-        {"$set": {"last_message": data.content[:50], "last_message_time": msg_doc["timestamp"], "updated_at": datetime.utcnow()}}
+    await message_store.append(db, msg_doc)
+    
+    # Update conversation and bump the other participants' unread counters.
+    # The sender has read everything up to their own message. Both times only
+    # move forward, so a slower concurrent send cannot turn them back.
+    update = {
+        "$set": {"last_message": data.content[:50], "updated_at": datetime.utcnow()},
+        "$max": {
+            "last_message_time": msg_doc["timestamp"],
+            f"read_up_to.{current_user['user_id']}": msg_doc["timestamp"]
+        }
+    }
+    unread_inc = {f"unread.{p_id}": 1 for p_id in conv["participants"] if p_id != current_user["user_id"]}
+    if unread_inc:
+        update["$inc"] = unread_inc
+    conv = await db.conversations.find_one_and_update(
+        {"_id": ObjectId(conversation_id)}, update,
+        projection={"participants": 1, "unread": 1, "read_up_to": 1},
+        return_document=ReturnDocument.AFTER
     )
     
-    return serialize_message(msg_doc)
+    message = serialize_message(msg_doc, conv)
+    await notify(conv["participants"], "message.created", message)
+    for p_id in conv["participants"]:
+        if p_id != current_user["user_id"]:
+            await notify([p_id], "unread.changed", {
+                "conversation_id": conversation_id,
+                "unread_count": conv.get("unread", {}).get(p_id, 0)
+            })
+    return message
+
+async def serialize_conversations(conversations: list, current_user_id: str) -> list:
+    """Serialize conversations with one batched participant lookup.
+    
+    Unread counts come from the per-participant counters kept on each
+    conversation, so no messages are counted here.
+    """
+    users = await fetch_users_by_id(
+        ObjectId(p_id) for conv in conversations for p_id in conv["participants"]
+    )
+    results = []
+    for conv_doc in conversations:
+        participants = []
+        for p_id in conv_doc["participants"]:
+            user = users.get(ObjectId(p_id))
+            if user:
+                participants.append({
+                    "id": str(user["_id"]),
+                    "name": user.get("profile", {}).get("full_name", "Unknown"),
+                    "role": user.get("role", "unknown")
+                })
+        
+        results.append({
+            "id": str(conv_doc["_id"]),
+            "participants": participants,
+            "contract_id": conv_doc.get("contract_id"),
+            "last_message": conv_doc.get("last_message"),
+            "last_message_time": conv_doc.get("last_message_time"),
+            "unread_count": conv_doc.get("unread", {}).get(current_user_id, 0),
+            "created_at": conv_doc["created_at"],
+            "updated_at": conv_doc["updated_at"]
+        })
+    return results
 
 async def serialize_conversation(conv_doc: dict, current_user_id: str) -> dict:
     """Serialize conversation with participant details"""
-    participants = []
-    for p_id in conv_doc["participants"]:
-        user = await db.users.find_one({"_id": ObjectId(p_id)})
-        if user:
-            participants.append({
-                "id": str(user["_id"]),
-                "name": user.get("profile", {}).get("full_name", "Unknown"),
-                "role": user.get("role", "unknown")
-            })
-    
-    # Count unread messages
-    unread = await db.messages.count_documents({
-        "conversation_id": str(conv_doc["_id"]),
-        "sender_id": {"$ne": current_user_id},
-        "is_read": False
-    })
-    
-    return {
-        "id": str(conv_doc["_id"]),
-        "participants": participants,
-        "contract_id": conv_doc.get("contract_id"),
-        "last_message": conv_doc.get("last_message"),
-        "last_message_time": conv_doc.get("last_message_time"),
-        "unread_count": unread,
-        "created_at": conv_doc["created_at"],
-        "updated_at": conv_doc["updated_at"]
-    }
+    return (await serialize_conversations([conv_doc], current_user_id))[0]
+
+def message_is_read(msg_doc: dict, conv_doc: Optional[dict]) -> bool:
+    """A message is read once another participant's watermark has passed it"""
+    if msg_doc.get("is_read"):
+        return True  # flagged before read watermarks existed
+    read_up_to = (conv_doc or {}).get("read_up_to", {})
+    return any(
+        watermark >= msg_doc["timestamp"]
+        for p_id, watermark in read_up_to.items()
+        if p_id != msg_doc["sender_id"] and watermark is not None
+    )
 
-def serialize_message(msg_doc: dict) -> dict:
+def serialize_message(msg_doc: dict, conv_doc: Optional[dict] = None) -> dict:
     return {
         "id": str(msg_doc["_id"]),
         "conversation_id": msg_doc["conversation_id"],
@@ -1880,19 +2702,29 @@ def serialize_message(msg_doc: dict) -> dict:
         "sender_name": msg_doc["sender_name"],
         "content": msg_doc["content"],
         "timestamp": msg_doc["timestamp"],
-        "is_read": msg_doc.get("is_read", False)
+        "is_read": message_is_read(msg_doc, conv_doc)
     }
 
 
+# Include router in app (after every endpoint is registered on it)
+app.include_router(api_router)
+
+
 @app.on_event("startup")
 async def startup_event():
     await create_indexes()
+    await event_bus.start()
+    app.state.promotion_sweep = asyncio.create_task(sweep_stale_promotions())
     # Chat indexes
     await db.conversations.create_index("participants")
-    await db.messages.create_index([("conversation_id", 1), ("timestamp", 1)])
+    await message_store.create_indexes(db)
     logger.info("Muyassir API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.promotion_sweep.cancel()
+    await event_bus.stop()
+    password_hasher.shutdown()
+    image_processor.shutdown()
     client.close()
     logger.info("Database connection closed")
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from blobs import BlobWriter, files_collection, delete_blob
+
+load_dotenv()
+
+# Streaming multipart uploads.
+#
+# The request body is fed to the multipart parser as it arrives and the file
+# part is written straight into the blob store, so an upload never sits in
+# memory or on local disk. Size and type limits are checked while streaming.
+# An upload starts unattached; claim_upload() attaches it to the user or
+# service that references it, and purge_unattached_uploads() removes the
+# ones nobody claimed.
+#
+# Anonymous uploads (verification documents sent before registering) get a
+# random claim token that is returned once and stored only as a hash; the
+# id alone is guessable, so claiming one needs the token. Unattached
+# anonymous bytes are capped per client address until they are claimed or
+# purged.
+
+UPLOAD_KINDS = {
+    "verification_document": {
+        "max_bytes": 10 * 1024 * 1024,
+        "types": ("image/jpeg", "image/png", "application/pdf")
+    },
+    "service_image": {
+        "max_bytes": 5 * 1024 * 1024,
+        "types": ("image/jpeg", "image/png", "image/webp")
+    },
+}
+UPLOAD_FIELD = "file"
+UNATTACHED_UPLOAD_HOURS = 24
+ANONYMOUS_UPLOAD_BYTES_PER_IP = int(os.getenv("ANONYMOUS_UPLOAD_BYTES_PER_IP", str(30 * 1024 * 1024)))
+
+# Bytes each accepted type must have at the given offsets
+FILE_SIGNATURES = {
+    "image/jpeg": {0: b"\xff\xd8\xff"},
+    "image/png": {0: b"\x89PNG\r\n\x1a\n"},
+    "image/webp": {0: b"RIFF", 8: b"WEBP"},
+    "application/pdf": {0: b"%PDF-"},
+}
+SIGNATURE_BYTES = 12
+
+def upload_error(code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=code, detail=detail)
+
+def matches_signature(content_type: str, head: bytes) -> bool:
+    signature = FILE_SIGNATURES.get(content_type)
+    return bool(signature) and all(
+        head[offset:offset + len(part)] == part for offset, part in signature.items()
+    )
+
+def hash_claim_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def new_claim_token() -> tuple:
+    """A random claim token and the hash stored in its place"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_claim_token(token)
+
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+async def check_anonymous_budget(db, client_ip: str, kind: str):
+    """429 when this address already has too many unclaimed anonymous bytes"""
+    pending = 0
+    async for row in files_collection(db).aggregate([
+        {"$match": {"metadata.client_ip": client_ip, "metadata.attached": False, "metadata.owner_id": None}},
+        {"$group": {"_id": None, "bytes": {"$sum": "$length"}}}
+    ]):
+        pending = row["bytes"]
+    if pending + UPLOAD_KINDS[kind]["max_bytes"] > ANONYMOUS_UPLOAD_BYTES_PER_IP:
+        raise upload_error(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "Too many unclaimed uploads from this address. Register with one of them or try again later."
+        )
+
+class MultipartEvents:
+    """Collects the parser's synchronous callbacks so they can be handled with awaits"""
+
+    def __init__(self):
+        self.events = []
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._add_header_bytes("header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._add_header_bytes("header_value", data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": lambda: self.events.append(("headers", self.headers)),
+            "on_part_data": lambda data, start, end: self.events.append(("data", bytes(data[start:end]))),
+            "on_part_end": lambda: self.events.append(("end", None)),
+        }
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def _add_header_bytes(self, name: str, data: bytes):
+        setattr(self, name, getattr(self, name) + data)
+
+    def on_header_end(self):
+        self.headers[self.header_field.decode("latin-1").lower()] = self.header_value.decode("latin-1")
+        self.header_field = b""
+        self.header_value = b""
+
+    def drain(self) -> list:
+        events, self.events = self.events, []
+        return events
+
+async def stream_upload(
+    db, request: Request, kind: str, owner_id: Optional[ObjectId], claim_token_hash: Optional[str] = None
+) -> dict:
+    """Stream the ``file`` part of a multipart request into the blob store.
+
+    Returns the stored files document. Raises 413 past the size limit and
+    415 for a type that is not allowed or content that does not match it.
+    Anonymous uploads (no ``owner_id``) pass the hash of their claim token
+    and count against their address's budget.
+    """
+    limits = UPLOAD_KINDS[kind]
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise upload_error(status.HTTP_400_BAD_REQUEST, "Expected a multipart/form-data upload")
+
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and int(declared_length) > limits["max_bytes"] + 64 * 1024:
+        raise upload_error(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"Files are limited to {limits['max_bytes'] // (1024 * 1024)} MB")
+
+    metadata = {"owner_id": owner_id, "kind": kind, "attached": False}
+    if owner_id is None:
+        metadata["client_ip"] = client_address(request)
+        metadata["claim_token_hash"] = claim_token_hash
+        await check_anonymous_budget(db, metadata["client_ip"], kind)
+
+    events = MultipartEvents()
+    parser = MultipartParser(options[b"boundary"], events.callbacks())
+    writer = None
+    head = b""
+    done = False
+    try:
+        async for body_chunk in request.stream():
+            parser.write(body_chunk)
+            for event, value in events.drain():
+                if done:
+                    continue
+                if event == "headers":
+                    _, disposition = parse_options_header(value.get("content-disposition", ""))
+                    if disposition.get(b"name") != UPLOAD_FIELD.encode() or b"filename" not in disposition:
+                        continue
+                    file_type = value.get("content-type", "").split(";")[0].strip().lower()
+                    if file_type not in limits["types"]:
+                        raise upload_error(
+                            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            f"Allowed file types: {', '.join(limits['types'])}"
+                        )
+                    writer = BlobWriter(
+                        db,
+                        disposition[b"filename"].decode("utf-8", "replace"),
+                        file_type,
+                        metadata=metadata
+                    )
+                elif event == "data" and writer:
+                    if writer.length + len(value) > limits["max_bytes"]:
+                        raise upload_error(
+                            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            f"Files are limited to {limits['max_bytes'] // (1024 * 1024)} MB"
+                        )
+                    if len(head) < SIGNATURE_BYTES:
+                        head += value[:SIGNATURE_BYTES - len(head)]
+                        if len(head) >= SIGNATURE_BYTES and not matches_signature(writer.content_type, head):
+                            raise upload_error(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "File content does not match its type")
+                    await writer.write(value)
+                elif event == "end" and writer:
+                    done = True
+        parser.finalize()
+
+        if not writer or not done:
+            raise upload_error(status.HTTP_400_BAD_REQUEST, f"Upload must include a '{UPLOAD_FIELD}' file field")
+        if not matches_signature(writer.content_type, head):
+            raise upload_error(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "File content does not match its type")
+        return await writer.close()
+    except BaseException:
+        if writer:
+            await writer.abort()
+        raise
+
+async def claim_upload(db, upload_id: str, kind: str, owner_id: ObjectId, claim_token: Optional[str] = None) -> dict:
+    """Attach an upload to ``owner_id``. Anonymous uploads need the claim token
+    returned when they were made, others can only be claimed by their uploader."""
+    try:
+        file_id = ObjectId(upload_id)
+    except (InvalidId, TypeError):
+        raise upload_error(status.HTTP_400_BAD_REQUEST, "Invalid upload ID")
+
+    owners = [{"metadata.owner_id": owner_id}]
+    if claim_token:
+        owners.append({"metadata.owner_id": None, "metadata.claim_token_hash": hash_claim_token(claim_token)})
+    info = await files_collection(db).find_one_and_update(
+        {
+            "_id": file_id,
+            "metadata.kind": kind,
+            "metadata.attached": False,
+            "$or": owners
+        },
+        {
+            "$set": {"metadata.owner_id": owner_id, "metadata.attached": True},
+            "$unset": {"metadata.claim_token_hash": "", "metadata.client_ip": ""}
+        }
+    )
+    if not info:
+        raise upload_error(status.HTTP_400_BAD_REQUEST, f"Upload {upload_id} not found or already used")
+    return info
+
+async def purge_unattached_uploads(db, apply: bool = True, older_than_hours: int = UNATTACHED_UPLOAD_HOURS) -> dict:
+    """Find (and unless apply=False, delete) uploads never attached to anything"""
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    stale_ids = []
+    async for info in files_collection(db).find(
+        {"metadata.attached": False, "uploadDate": {"$lt": cutoff}}, {"_id": 1}
+    ):
+        stale_ids.append(info["_id"])
+        if apply:
+            await delete_blob(db, info["_id"])
+    return {"unattached": len(stale_ids), "stale_ids": [str(file_id) for file_id in stale_ids]}
+
+async def main():
+    apply = "--check" not in sys.argv
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    result = await purge_unattached_uploads(db, apply=apply)
+    action = "Deleted" if apply else "Found"
+    print(f"🗑️  {action} {result['unattached']} uploads unattached for over {UNATTACHED_UPLOAD_HOURS}h.")
+    for file_id in result["stale_ids"]:
+        print(f"   - {file_id}")
+
+    client.close()
+
+if __name__ == "__main__":
+    # python uploads.py          -> delete stale unattached uploads
+    # python uploads.py --check  -> report them only
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+import os
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from models import ContractStatus, WaitlistStatus
+
+# Per-service FIFO waitlist.
+#
+# Entries live in the ``waitlist`` collection and stay there after they leave
+# the line (status promoted/left) so students can see what happened. The
+# (service_id, status, created_at, _id) index makes both taking the head of
+# the line and computing a position a single index seek.
+#
+# A promoted request holds its slot until it is answered; one left pending
+# (or unconfirmed) for PROMOTION_TTL is cancelled and the slot moves on down
+# the line, so an unresponsive provider cannot park it forever.
+
+WAITLIST_ORDER = [("created_at", 1), ("_id", 1)]
+PROMOTION_TTL = timedelta(hours=int(os.getenv("WAITLIST_PROMOTION_TTL_HOURS", "48")))
+PROMOTION_SWEEP_SECONDS = 600
+UNANSWERED_STATUSES = [
+    ContractStatus.PENDING_PROVIDER_APPROVAL,
+    ContractStatus.AWAITING_STUDENT_CONFIRMATION
+]
+
+async def pop_next_waiting(db, service_id):
+    """Atomically take the oldest waiting entry for a service, or None.
+
+    The entry is marked promoted in the same write, so two slots freed at
+    the same time never promote the same student twice.
+    """
+    return await db.waitlist.find_one_and_update(
+        {"service_id": service_id, "status": WaitlistStatus.WAITING},
+        {"$set": {"status": WaitlistStatus.PROMOTED, "promoted_at": datetime.utcnow()}},
+        sort=WAITLIST_ORDER,
+        return_document=ReturnDocument.AFTER
+    )
+
+async def waitlist_position(db, entry: dict) -> int:
+    """1-based place in line of a waiting entry"""
+    ahead = await db.waitlist.count_documents({
+        "service_id": entry["service_id"],
+        "status": WaitlistStatus.WAITING,
+        "$or": [
+            {"created_at": {"$lt": entry["created_at"]}},
+            {"created_at": entry["created_at"], "_id": {"$lt": entry["_id"]}}
+        ]
+    })
+    return ahead + 1
+
+def stale_promotion_filter(now: datetime) -> dict:
+    """Promoted requests nobody has answered within PROMOTION_TTL"""
+    return {
+        "waitlist_entry_id": {"$exists": True},
+        "slot_reserved": True,
+        "status": {"$in": UNANSWERED_STATUSES},
+        "updated_at": {"$lt": now - PROMOTION_TTL}
+    }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Event Bus Benchmark
+Publishes a burst of events on a few topics from concurrent publishers and
+measures delivered events/sec and publish-to-handler latency for each bus
+backend. Several buses on the same database stand in for uvicorn workers;
+every one must see every event, in publish order per topic.
+
+Usage (the mongo backend needs a MongoDB you can write a scratch database to):
+    python benchmarks/bench_event_bus.py
+    MONGO_URL=mongodb://localhost:27017 BENCH_BACKENDS=memory,mongo python benchmarks/bench_event_bus.py
+"""
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from events import InMemoryEventBus, MongoEventBus  # noqa: E402
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_DB", "muyassir_bench")
+BACKENDS = os.getenv("BENCH_BACKENDS", "memory").split(",")
+EVENTS = int(os.getenv("BENCH_EVENTS", "20000"))
+TOPICS = int(os.getenv("BENCH_TOPICS", "4"))
+WORKERS = int(os.getenv("BENCH_WORKERS", "3"))
+TIMEOUT_SECONDS = 120
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Receiver:
+    """Counts what one worker's bus delivers and checks per-topic order"""
+
+    def __init__(self):
+        self.count = 0
+        self.out_of_order = 0
+        self.last_seq = {}
+        self.latencies_ms = []
+
+    async def handle(self, topic, payload):
+        now = time.perf_counter()
+        if payload["seq"] <= self.last_seq.get(topic, -1):
+            self.out_of_order += 1
+        self.last_seq[topic] = payload["seq"]
+        self.latencies_ms.append((now - payload["sent"]) * 1000)
+        self.count += 1
+
+
+async def make_buses(backend, db):
+    if backend == "memory":
+        # One process: a single bus delivers to its own handlers
+        return [InMemoryEventBus()]
+    await db.drop_collection("bench_events")
+    return [MongoEventBus(db, collection="bench_events") for _ in range(WORKERS)]
+
+
+async def run_backend(backend, db):
+    buses = await make_buses(backend, db)
+    receivers = [Receiver() for _ in buses]
+    for bus, receiver in zip(buses, receivers):
+        for topic in range(TOPICS):
+            bus.subscribe(f"topic-{topic}", receiver.handle)
+        await bus.start()
+
+    per_topic = EVENTS // TOPICS
+
+    async def publisher(topic):
+        # Publishers use different buses, like requests landing on different workers
+        bus = buses[topic % len(buses)]
+        for seq in range(per_topic):
+            await bus.publish(f"topic-{topic}", {"seq": seq, "sent": time.perf_counter()})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(publisher(topic) for topic in range(TOPICS)))
+    published_at = time.perf_counter()
+
+    expected = per_topic * TOPICS
+    deadline = start + TIMEOUT_SECONDS
+    while any(r.count < expected for r in receivers) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    for bus in buses:
+        await bus.stop()
+
+    latencies = [ms for r in receivers for ms in r.latencies_ms]
+    delivered = sum(r.count for r in receivers)
+    print(f"\n{backend} backend ({len(buses)} worker bus{'es' if len(buses) > 1 else ''}, {TOPICS} topics)")
+    print(f"  published   {expected} events in {published_at - start:.2f}s ({expected / (published_at - start):,.0f}/s)")
+    print(f"  delivered   {delivered}/{expected * len(buses)} in {elapsed:.2f}s ({delivered / elapsed:,.0f}/s)")
+    print(f"  latency     p50 {percentile(latencies, 50):.2f} ms   p99 {percentile(latencies, 99):.2f} ms")
+    print(f"  out of order {sum(r.out_of_order for r in receivers)}")
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL) if "mongo" in BACKENDS else None
+    db = client[BENCH_DB] if client else None
+    for backend in BACKENDS:
+        await run_backend(backend.strip(), db)
+    if client:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
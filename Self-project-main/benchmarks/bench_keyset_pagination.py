@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Keyset Pagination Benchmark
+Seeds a scratch collection with 1M service-shaped documents and compares the
+latency of fetching page N with skip/limit against the cursor (keyset) query
+used by the listing endpoints. Skip latency grows with N; keyset should stay
+flat.
+
+Usage (needs a MongoDB you can write a scratch database to):
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_keyset_pagination.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from pagination import apply_cursor, encode_cursor, sort_spec  # noqa: E402
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_DB", "muyassir_bench")
+TOTAL_DOCS = int(os.getenv("BENCH_DOCS", "1000000"))
+PAGE_SIZE = 20
+PAGES = [1, 100, 1000, 10000, 25000, 49999]
+REPEATS = 5
+BATCH = 10000
+
+
+async def seed(collection):
+    existing = await collection.estimated_document_count()
+    if existing >= TOTAL_DOCS:
+        print(f"Reusing {existing} existing documents")
+        return
+
+    await collection.drop()
+    print(f"Seeding {TOTAL_DOCS} documents...")
+    start = datetime(2024, 1, 1)
+    provider_ids = [ObjectId() for _ in range(500)]
+    for offset in range(0, TOTAL_DOCS, BATCH):
+        await collection.insert_many([{
+            "provider_id": random.choice(provider_ids),
+            "service_type": random.choice(["transportation", "residence"]),
+            "title": f"Service {i}",
+            "price_monthly": random.randint(20, 300),
+            "status": "active",
+            # Coarse timestamps so plenty of documents tie on created_at
+            "created_at": start + timedelta(seconds=i // 3)
+        } for i in range(offset, min(offset + BATCH, TOTAL_DOCS))], ordered=False)
+    await collection.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+
+
+async def time_query(make_cursor):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        await make_cursor().to_list(length=PAGE_SIZE)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    collection = client[BENCH_DB]["services_pagination"]
+    await seed(collection)
+
+    query = {"status": "active"}
+    print(f"\n{'page':>8} {'skip/limit (ms)':>16} {'keyset (ms)':>12}")
+    for page in PAGES:
+        skip = (page - 1) * PAGE_SIZE
+        if skip >= TOTAL_DOCS:
+            continue
+
+        skip_ms = await time_query(
+            lambda: collection.find(query).sort(sort_spec("created_at")).skip(skip).limit(PAGE_SIZE)
+        )
+
+        # Position the cursor on the last document of the previous page (untimed)
+        token = ""
+        if skip:
+            previous = await collection.find(query, {"created_at": 1}).sort(
+                sort_spec("created_at")
+            ).skip(skip - 1).limit(1).to_list(length=1)
+            token = encode_cursor(previous[0]["created_at"], previous[0]["_id"])
+        keyset_query = apply_cursor(query, "created_at", token)
+        keyset_ms = await time_query(
+            lambda: collection.find(keyset_query).sort(sort_spec("created_at")).limit(PAGE_SIZE)
+        )
+
+        print(f"{page:>8} {skip_ms:>16.2f} {keyset_ms:>12.2f}")
+
+    if os.getenv("BENCH_KEEP") != "1":
+        await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
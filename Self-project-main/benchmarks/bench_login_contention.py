@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Login Contention Benchmark
+Measures login p99 and the p99 of other endpoints while a burst of logins
+runs concurrently. Before bcrypt moved off the event loop every request
+queued behind the logins; now only the logins should slow down.
+
+Usage (server must be running and seeded):
+    BACKEND_URL=http://localhost:8001/api python benchmarks/bench_login_contention.py
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001/api")
+LOGIN_EMAIL = os.getenv("BENCH_EMAIL", "sarah@example.com")
+LOGIN_PASSWORD = os.getenv("BENCH_PASSWORD", "password123")
+LOGIN_WORKERS = int(os.getenv("BENCH_LOGIN_WORKERS", "16"))
+DURATION_SECONDS = float(os.getenv("BENCH_DURATION", "20"))
+PROBE_INTERVAL = 0.05
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(session, method, url, **kwargs):
+    start = time.perf_counter()
+    response = session.request(method, url, timeout=30, **kwargs)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return response.status_code, elapsed_ms
+
+
+def login_worker(stop, samples, errors):
+    session = requests.Session()
+    while not stop.is_set():
+        code, elapsed = timed(session, "POST", f"{BACKEND_URL}/auth/login", json={
+            "email": LOGIN_EMAIL,
+            "password": LOGIN_PASSWORD
+        })
+        if code == 200:
+            samples.append(elapsed)
+        else:
+            errors.append(code)
+
+
+def probe_worker(stop, path, samples, errors):
+    session = requests.Session()
+    while not stop.is_set():
+        code, elapsed = timed(session, "GET", f"{BACKEND_URL}{path}")
+        if code == 200:
+            samples.append(elapsed)
+        else:
+            errors.append(code)
+        time.sleep(PROBE_INTERVAL)
+
+
+def report(name, samples, errors):
+    print(f"{name:<24} n={len(samples):<6} "
+          f"p50={percentile(samples, 50):8.1f}ms "
+          f"p99={percentile(samples, 99):8.1f}ms "
+          f"errors={len(errors)}")
+
+
+def main():
+    print(f"Benchmarking {BACKEND_URL} with {LOGIN_WORKERS} concurrent login workers "
+          f"for {DURATION_SECONDS:.0f}s\n")
+
+    stop = threading.Event()
+    login_samples, login_errors = [], []
+    probes = {
+        "/health": ([], []),
+        "/services?limit=20": ([], [])
+    }
+
+    with ThreadPoolExecutor(max_workers=LOGIN_WORKERS + len(probes)) as pool:
+        for _ in range(LOGIN_WORKERS):
+            pool.submit(login_worker, stop, login_samples, login_errors)
+        for path, (samples, errors) in probes.items():
+            pool.submit(probe_worker, stop, path, samples, errors)
+        time.sleep(DURATION_SECONDS)
+        stop.set()
+
+    report("POST /auth/login", login_samples, login_errors)
+    for path, (samples, errors) in probes.items():
+        report(f"GET {path}", samples, errors)
+    print(f"\nLogin throughput: {len(login_samples) / DURATION_SECONDS:.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
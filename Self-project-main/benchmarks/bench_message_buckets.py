@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Message Bucket Benchmark
+Seeds long conversations in both message layouts (one document per message
+vs. BUCKET_SIZE messages per bucket document) and compares index and storage
+size, plus the latency of loading chat history: the newest page, which the
+chat screen opens on, and a deep offset page further back.
+
+Usage (needs a MongoDB you can write a scratch database to):
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_message_buckets.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from message_store import (  # noqa: E402
+    BucketMessageStore, DocumentMessageStore, pack_messages_into_buckets, BUCKET_SIZE
+)
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_DB", "muyassir_bench_messages")
+CONVERSATIONS = int(os.getenv("BENCH_CONVERSATIONS", "200"))
+MESSAGES_PER_CONVERSATION = int(os.getenv("BENCH_MESSAGES", "5000"))
+PAGE_SIZE = 50
+SAMPLES = 200
+BATCH = 10000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed(db):
+    expected = CONVERSATIONS * MESSAGES_PER_CONVERSATION
+    if await db.messages.estimated_document_count() >= expected:
+        print(f"Reusing {expected} existing messages")
+        return await db.messages.distinct("conversation_id")
+
+    await db.messages.drop()
+    await db.message_buckets.drop()
+    print(f"Seeding {CONVERSATIONS} conversations x {MESSAGES_PER_CONVERSATION} messages...")
+    conversation_ids = [str(ObjectId()) for _ in range(CONVERSATIONS)]
+    start = datetime(2024, 9, 1)
+    text = "Rent for this month has been transferred, please confirm."
+    batch = []
+    for conversation_id in conversation_ids:
+        for i in range(MESSAGES_PER_CONVERSATION):
+            batch.append({
+                "conversation_id": conversation_id,
+                "sender_id": random.choice(["tenant", "landlord"]),
+                "sender_name": "Someone",
+                "content": text[:random.randint(10, len(text))],
+                "timestamp": start + timedelta(minutes=17 * i)
+            })
+            if len(batch) >= BATCH:
+                await db.messages.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        await db.messages.insert_many(batch, ordered=False)
+
+    await DocumentMessageStore().create_indexes(db)
+    store = BucketMessageStore()
+    await store.create_indexes(db)
+    await pack_messages_into_buckets(db, store=store)
+    return conversation_ids
+
+
+async def time_load(load, conversation_ids):
+    samples = []
+    for _ in range(SAMPLES):
+        conversation_id = random.choice(conversation_ids)
+        start = time.perf_counter()
+        await load(conversation_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[BENCH_DB]
+    conversation_ids = await seed(db)
+
+    print(f"\nBucket size: {BUCKET_SIZE} messages")
+    print(f"{'layout':<12}{'documents':>12}{'index MB':>12}{'storage MB':>12}")
+    for name, collection in (("documents", "messages"), ("buckets", "message_buckets")):
+        stats = await db.command("collStats", collection)
+        print(f"{name:<12}{stats['count']:>12}{stats['totalIndexSize'] / 1e6:>12.2f}{stats['storageSize'] / 1e6:>12.2f}")
+
+    deep_skip = MESSAGES_PER_CONVERSATION // 2
+    print(f"\n{'layout':<12}{'newest page p50/p99 ms':>26}{f'skip={deep_skip} p50/p99 ms':>28}")
+    for store in (DocumentMessageStore(), BucketMessageStore()):
+        newest = await time_load(lambda c: store.latest(db, c, PAGE_SIZE), conversation_ids)
+        deep = await time_load(lambda c: store.page(db, c, deep_skip, PAGE_SIZE), conversation_ids)
+        print(f"{store.layout:<12}{newest[0]:>14.2f} / {newest[1]:<9.2f}{deep[0]:>16.2f} / {deep[1]:<9.2f}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Keyword Search Benchmark
+Compares the indexed $text search used by POST /services/search (q=...) with
+the equivalent case-insensitive $regex scan over title/description, at
+catalog sizes of 10k, 100k and 1M services with mixed Arabic and English
+listings.
+
+Usage (needs a MongoDB you can write a scratch database to):
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_text_search.py
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from search import search_fields, text_query  # noqa: E402
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_DB", "muyassir_bench")
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "10000,100000,1000000").split(",")]
+QUERIES = ["furnished apartment", "Sultan Qaboos", "سكن الطالبات", "مكيف", "shuttle wifi"]
+REPEATS = 5
+BATCH = 5000
+
+ENGLISH = ["furnished", "apartment", "room", "shared", "shuttle", "bus", "daily", "route",
+           "near", "campus", "quiet", "spacious", "Sultan", "Qaboos", "university", "wifi",
+           "parking", "kitchen", "female", "students", "modern", "affordable", "Muscat"]
+ARABIC = ["سكن", "الطالبات", "شقة", "مفروشة", "غرفة", "مشتركة", "حافلة", "يومية", "قريب",
+          "الجامعة", "هادئ", "واسع", "مكيف", "موقف", "مطبخ", "حديث", "مسقط", "النقل"]
+
+
+def random_text(words):
+    vocabulary = ARABIC if random.random() < 0.4 else ENGLISH
+    return " ".join(random.choice(vocabulary) for _ in range(words))
+
+
+def make_service(i):
+    service = {
+        "title": random_text(4),
+        "description": random_text(40),
+        "category": random.choice(["residence", "transportation"]),
+        "residence": {"amenities": random.sample(ENGLISH + ARABIC, 3)},
+        "status": "active",
+        "n": i
+    }
+    service.update(search_fields(service))
+    return service
+
+
+def regex_query(q):
+    pattern = {"$regex": re.escape(q), "$options": "i"}
+    return {"status": "active", "$or": [{"title": pattern}, {"description": pattern}]}
+
+
+async def median_ms(run):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        await run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+async def bench_size(db, size):
+    collection = db[f"services_text_{size}"]
+    await collection.drop()
+    for offset in range(0, size, BATCH):
+        await collection.insert_many(
+            [make_service(i) for i in range(offset, min(offset + BATCH, size))],
+            ordered=False
+        )
+    await collection.create_index(
+        [("search_title", "text"), ("search_tags", "text"), ("search_body", "text")],
+        weights={"search_title": 10, "search_tags": 5, "search_body": 1},
+        default_language="english"
+    )
+
+    print(f"\n{size:,} services")
+    print(f"  {'query':<22} {'regex (ms)':>12} {'text (ms)':>12}")
+    for q in QUERIES:
+        regex_ms = await median_ms(
+            lambda: collection.find(regex_query(q)).limit(20).to_list(length=20)
+        )
+        text_filter = {"status": "active", "$text": {"$search": text_query(q)}}
+        text_ms = await median_ms(
+            lambda: collection.find(text_filter, {"score": {"$meta": "textScore"}}).sort(
+                [("score", {"$meta": "textScore"})]
+            ).limit(20).to_list(length=20)
+        )
+        print(f"  {q:<22} {regex_ms:>12.2f} {text_ms:>12.2f}")
+    await collection.drop()
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[BENCH_DB]
+    for size in SIZES:
+        await bench_size(db, size)
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -63,9 +63,18 @@ export default function AdminVerifications() {
     verifyMutation.mutate({ userId: selectedUser.id, decision: 'rejected', reason: rejectReason });
   };
 
-  const viewDocument = (doc: any) => {
-    setDocToView(doc);
-    setShowDocModal(true);
+  const viewDocument = async (doc: any) => {
+    if (!doc.url) {
+      Platform.OS === 'web' ? alert('Document is not available yet') : Alert.alert('Error', 'Document is not available yet');
+      return;
+    }
+    try {
+      const dataUri = await adminService.getDocumentUri(doc.url);
+      setDocToView({ ...doc, data_uri: dataUri });
+      setShowDocModal(true);
+    } catch (error) {
+      Platform.OS === 'web' ? alert('Could not load document') : Alert.alert('Error', 'Could not load document');
+    }
   };
 
   if (isLoading) {
@@ -112,7 +121,7 @@ export default function AdminVerifications() {
                   
                     <TouchableOpacity key={idx} style={styles.docBtn} onPress={() => viewDocument(doc)}>
                       <MaterialCommunityIcons name="file-document" size={16} color="#2563EB" />
-                      <Text style={styles.docBtnText}>View Document {idx + 1}</Text>
+                      <Text style={styles.docBtnText}>{doc.file_name || `View Document ${idx + 1}`}</Text>
                     </TouchableOpacity>
                   ))}
                 </View>
@@ -15,6 +15,7 @@ import { useLocalSearchParams, Stack, useRouter } from 'expo-router';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { chatService, Message } from '../../../services/chat';
+import { subscribeToChatEvents } from '../../../services/realtime';
 import { useAuth } from '../../../contexts/AuthContext';
 
 export default function ChatScreen() {
@@ -29,9 +30,18 @@ export default function ChatScreen() {
     queryKey: ['messages', id],
     queryFn: () => chatService.getMessages(id!),
     enabled: !!id,
-    refetchInterval: 3000, // Poll every 3 seconds for new messages
   });
 
+  // New messages and read receipts arrive over the push channel instead of polling
+  useEffect(() => {
+    if (!id) return;
+    const refresh = () => queryClient.invalidateQueries({ queryKey: ['messages', id] });
+    return subscribeToChatEvents((event) => {
+      if (event.data.conversation_id === id) refresh();
+      if (event.type !== 'conversation.read') queryClient.invalidateQueries({ queryKey: ['conversations'] });
+    }, refresh);
+  }, [id]);
+
   const sendMutation = useMutation({
     mutationFn: (content: string) => chatService.sendMessage(id!, content),
     onSuccess: () => {
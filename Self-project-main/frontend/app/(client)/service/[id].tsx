@@ -21,6 +21,7 @@ import { servicesService } from '../../../services/services';
 import { contractsService } from '../../../services/contracts';
 import { reviewsService, Review } from '../../../services/reviews';
 import { StaticMap } from '../../../components/StaticMap';
+import { resolveImageUrl } from '../../../services/api';
 import { PrimaryButton } from '../../../components/PrimaryButton';
 import { Service, ServiceType, VerificationStatus } from '../../../types';
 import { useAuth } from '../../../contexts/AuthContext';
@@ -132,7 +133,7 @@ export default function ServiceDetail() {
               {service.images.map((img, index) => (
                 <Image
                   key={index}
-                  source={{ uri: img }}
+                  source={{ uri: resolveImageUrl(img) }}
                   style={styles.bannerImage}
                   resizeMode="cover"
                 />
@@ -2,6 +2,7 @@ import React from 'react';
 import { View, Text, Image, StyleSheet, TouchableOpacity } from 'react-native';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import { colors, spacing, borderRadius, typography, shadows } from '../theme';
+import { resolveImageUrl } from '../services/api';
 
 interface AppCardProps {
   title: string;
@@ -41,7 +42,7 @@ export const AppCard: React.FC<AppCardProps> = ({
       {/* Image */}
       <View style={[styles.imageContainer, isHorizontal && styles.imageContainerHorizontal]}>
         {image ? (
-          <Image source={{ uri: image }} style={styles.image} resizeMode="cover" />
+          <Image source={{ uri: resolveImageUrl(image) }} style={styles.image} resizeMode="cover" />
         ) : (
           <View style={[styles.imagePlaceholder, { backgroundColor: type === 'transportation' ? colors.primary.light : colors.secondary.purple }]}>
             <MaterialCommunityIcons
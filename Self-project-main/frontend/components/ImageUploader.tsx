@@ -12,6 +12,7 @@ import {
 import * as DocumentPicker from 'expo-document-picker';
 import * as FileSystem from 'expo-file-system/legacy';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
+import { resolveImageUrl } from '../services/api';
 
 interface ImageUploaderProps {
   images: string[]; // Base64 strings
@@ -108,7 +109,7 @@ export const ImageUploader: React.FC<ImageUploaderProps> = ({
       <View style={styles.grid}>
         {images.map((img, index) => (
           <View key={index} style={styles.imageWrapper}>
-            <Image source={{ uri: img }} style={styles.image} resizeMode="cover" />
+            <Image source={{ uri: resolveImageUrl(img) }} style={styles.image} resizeMode="cover" />
             {index === 0 && (
               <View style={styles.coverBadge}>
                 <Text style={styles.coverText}>Cover</Text>
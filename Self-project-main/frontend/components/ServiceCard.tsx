@@ -2,6 +2,7 @@ import React from 'react';
 import { View, Text, StyleSheet, Image, TouchableOpacity } from 'react-native';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import { Service } from '../types';
+import { resolveImageUrl } from '../services/api';
 
 interface ServiceCardProps {
   service: Service;
@@ -16,7 +17,7 @@ export const ServiceCard: React.FC<ServiceCardProps> = ({ service, onPress }) =>
       <View style={styles.imageContainer}>
         {firstImage ? (
           <Image
-            source={{ uri: firstImage }}
+            source={{ uri: resolveImageUrl(firstImage) }}
             style={styles.image}
             resizeMode="cover"
           />
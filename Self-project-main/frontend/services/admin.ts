@@ -7,6 +7,17 @@ export const adminService = {
     return response.data;
   },
 
+  // Fetch one verification document (metadata comes with the pending list)
+  getDocumentUri: async (url: string): Promise<string> => {
+    const response = await api.get(url.replace(/^\/api/, ''), { responseType: 'blob' });
+    return new Promise((resolve, reject) => {
+      const reader = new FileReader();
+      reader.onloadend = () => resolve(reader.result as string);
+      reader.onerror = reject;
+      reader.readAsDataURL(response.data);
+    });
+  },
+
   // Verify or reject user
   verifyUser: async (userId: string, decision: 'verified' | 'rejected', rejectionReason?: string) => {
     const response = await api.post('/admin/verify-user', {
@@ -36,7 +36,7 @@ const getDefaultApiUrl = () => {
 
 //const API_URL = process.env.EXPO_PUBLIC_BACKEND_URL || getDefaultApiUrl();
 
-const API_URL = "https://muyassir-backend.onrender.com";
+export const API_URL = "https://muyassir-backend.onrender.com";
 
 const api = axios.create({
   baseURL: `${API_URL}/api`,
@@ -53,19 +53,18 @@ const getWebStorage = () => {
   return null;
 };
 
+export const getAuthToken = async (): Promise<string | null> => {
+  if (Platform.OS === 'web') {
+    const storage = getWebStorage();
+    return storage ? storage.getItem('auth_token') : null;
+  }
+  return SecureStore.getItemAsync('auth_token');
+};
+
 // Request interceptor to add auth token
 api.interceptors.request.use(
   async (config) => {
-    let token = null;
-    
-    if (Platform.OS === 'web') {
-      const storage = getWebStorage();
-      if (storage) {
-        token = storage.getItem('auth_token');
-      }
-    } else {
-      token = await SecureStore.getItemAsync('auth_token');
-    }
+    const token = await getAuthToken();
     
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
@@ -94,4 +93,8 @@ api.interceptors.response.use(
   }
 );
 
+// Images stored by the backend come back as /api/... paths
+export const resolveImageUrl = (uri: string) =>
+  uri && uri.startsWith('/api/') ? `${API_URL}${uri}` : uri;
+
 export default api;
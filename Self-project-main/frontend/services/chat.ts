@@ -41,9 +41,10 @@ export const chatService = {
     return response.data;
   },
 
-  getMessages: async (conversationId: string, skip = 0, limit = 50): Promise<Message[]> => {
+  // The newest `limit` messages, oldest first
+  getMessages: async (conversationId: string, limit = 50): Promise<Message[]> => {
     const response = await api.get(`/conversations/${conversationId}/messages`, {
-      params: { skip, limit },
+      params: { limit, latest: true },
     });
     return response.data;
   },
@@ -0,0 +1,55 @@
+import { API_URL, getAuthToken } from './api';
+
+// Push channel for chat: new messages, read receipts and unread counts.
+// Reconnects with backoff; after a reconnect the caller should refetch,
+// since events sent while disconnected are not replayed.
+
+export type ChatEvent =
+  | { type: 'message.created'; data: { id: string; conversation_id: string; sender_id: string } }
+  | { type: 'conversation.read'; data: { conversation_id: string; reader_id: string; read_at: string } }
+  | { type: 'unread.changed'; data: { conversation_id: string; unread_count: number } };
+
+const PING_INTERVAL_MS = 25000;
+const MAX_BACKOFF_MS = 30000;
+
+export const subscribeToChatEvents = (
+  onEvent: (event: ChatEvent) => void,
+  onReconnect?: () => void
+): (() => void) => {
+  let socket: WebSocket | null = null;
+  let ping: ReturnType<typeof setInterval> | null = null;
+  let retry: ReturnType<typeof setTimeout> | null = null;
+  let attempts = 0;
+  let closed = false;
+
+  const connect = async () => {
+    const token = await getAuthToken();
+    if (closed || !token) return;
+
+    socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/api/ws?token=${encodeURIComponent(token)}`);
+    socket.onopen = () => {
+      if (attempts > 0) onReconnect?.();
+      attempts = 0;
+      ping = setInterval(() => socket?.send('ping'), PING_INTERVAL_MS);
+    };
+    socket.onmessage = (message) => {
+      if (message.data === 'pong') return;
+      onEvent(JSON.parse(message.data));
+    };
+    socket.onclose = () => {
+      if (ping) clearInterval(ping);
+      if (closed) return;
+      attempts += 1;
+      retry = setTimeout(connect, Math.min(1000 * 2 ** attempts, MAX_BACKOFF_MS));
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    if (retry) clearTimeout(retry);
+    if (ping) clearInterval(ping);
+    socket?.close();
+  };
+};
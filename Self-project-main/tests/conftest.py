@@ -0,0 +1,79 @@
+"""
+Shared fixtures for backend tests.
+
+Tests run the endpoint coroutines directly against a throwaway database on
+the MongoDB at MONGO_URL (default: local instance) and are skipped when no
+server is reachable.
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from pymongo import monitoring
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "muyassir_test")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import server  # noqa: E402
+
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "endSessions",
+    "saslStart", "saslContinue", "buildInfo", "dropDatabase"
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts database round trips issued by application code"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self.commands.append((event.command_name, event.command.get(event.command_name)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.commands.clear()
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Point server.db at an empty database and count the commands it receives"""
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(
+        os.environ["MONGO_URL"],
+        serverSelectionTimeoutMS=1000,
+        event_listeners=[counter]
+    )
+    db = client[f"muyassir_test_{uuid.uuid4().hex[:8]}"]
+    try:
+        asyncio.run(client.admin.command("ping"))
+    except Exception:
+        client.close()
+        pytest.skip("MongoDB is not reachable")
+
+    monkeypatch.setattr(server, "db", db)
+    counter.reset()
+    yield db, counter
+
+    asyncio.run(client.drop_database(db.name))
+    client.close()
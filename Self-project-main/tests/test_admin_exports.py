@@ -0,0 +1,116 @@
+"""
+Admin export tests: NDJSON/CSV exports stream every document with joins done
+once per batch, and the JSON mode pages.
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+import server
+from exports import EXPORT_BATCH_SIZE
+
+ADMIN = {"user_id": str(ObjectId()), "role": "admin"}
+CONTRACTS = EXPORT_BATCH_SIZE * 2 + 37
+
+
+async def seed(db):
+    users = [ObjectId() for _ in range(20)]
+    await db.users.insert_many([
+        {"_id": uid, "email": f"u{i}@example.com", "role": "client", "password_hash": "x",
+         "profile": {"full_name": f"User {i}", "verification_documents": [
+             {"file_name": "id.png", "file_type": "image/png", "file_data": "A" * 100, "uploaded_at": None}
+         ]}}
+        for i, uid in enumerate(users)
+    ])
+    services = [ObjectId() for _ in range(5)]
+    await db.services.insert_many([{"_id": sid, "title": f"Service {i}"} for i, sid in enumerate(services)])
+    await db.contracts.insert_many([{
+        "student_id": users[i % 20],
+        "provider_id": users[(i + 1) % 20],
+        "service_id": services[i % 5],
+        "status": "active",
+        "total_amount": 120.0,
+        "auto_generated_terms": "T" * 1000,
+        "created_at": datetime.utcnow()
+    } for i in range(CONTRACTS)])
+
+
+async def read_body(response):
+    return "".join([chunk async for chunk in response.body_iterator])
+
+
+def export(endpoint, fmt, skip=0, limit=500):
+    return endpoint(export_format=fmt, skip=skip, limit=limit, current_user=ADMIN)
+
+
+def test_ndjson_contract_export_streams_everything_with_batched_joins(mongo):
+    db, counter = mongo
+
+    async def scenario():
+        await seed(db)
+        counter.reset()
+        response = await export(server.admin_list_contracts, "ndjson")
+        body = await read_body(response)
+        return response, body, counter.commands
+
+    response, body, commands = asyncio.run(scenario())
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert response.media_type == "application/x-ndjson"
+    assert len(rows) == CONTRACTS
+    assert all(row["student_name"].startswith("User ") for row in rows)
+    assert all(row["service_title"].startswith("Service ") for row in rows)
+    assert "auto_generated_terms" not in rows[0]
+
+    batches = -(-CONTRACTS // EXPORT_BATCH_SIZE)
+    lookups = [c for c in commands if c[0] == "find" and c[1] in ("users", "services")]
+    assert len(lookups) == 2 * batches
+
+
+def test_user_export_leaves_out_document_data(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        await seed(db)
+        return await read_body(await export(server.admin_list_users, "ndjson"))
+
+    rows = [json.loads(line) for line in asyncio.run(scenario()).splitlines()]
+    assert len(rows) == 20
+    assert all("password_hash" not in row for row in rows)
+    document = rows[0]["profile"]["verification_documents"][0]
+    assert document["file_name"] == "id.png"
+    assert "file_data" not in document
+
+
+def test_csv_contract_export(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        await seed(db)
+        response = await export(server.admin_list_contracts, "csv")
+        return response, await read_body(response)
+
+    response, body = asyncio.run(scenario())
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert response.media_type == "text/csv"
+    assert "attachment" in response.headers["content-disposition"]
+    assert len(rows) == CONTRACTS
+    assert rows[0]["student_name"].startswith("User ")
+    assert rows[0]["total_amount"] == "120.0"
+
+
+def test_json_mode_pages(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        await seed(db)
+        first = await export(server.admin_list_contracts, "json", skip=0, limit=100)
+        second = await export(server.admin_list_contracts, "json", skip=100, limit=100)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(first) == len(second) == 100
+    assert not {row["id"] for row in first} & {row["id"] for row in second}
@@ -0,0 +1,152 @@
+"""
+Blob store tests: verification documents live in chunked storage, users keep
+only a reference, and downloads stream the chunks back.
+"""
+import asyncio
+import base64
+import os
+
+import bson
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+from blobs import CHUNK_SIZE, chunks_collection, put_blob, read_blob
+from migrations import move_verification_documents_to_blobs
+
+PAYLOAD = os.urandom(CHUNK_SIZE * 2 + 1234)
+
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_put_blob_round_trips_across_chunks(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        info = await put_blob(db, PAYLOAD, "id.pdf", "application/pdf")
+        chunks = await chunks_collection(db).count_documents({"files_id": info["_id"]})
+        return info, chunks, await read_blob(db, info["_id"])
+
+    info, chunks, data = asyncio.run(scenario())
+    assert info["length"] == len(PAYLOAD)
+    assert chunks == 3
+    assert data == PAYLOAD
+
+
+def test_uploaded_document_is_referenced_and_streamed(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        user_id = ObjectId()
+        await db.users.insert_one({
+            "_id": user_id, "email": "s@example.com", "role": "client",
+            "profile": {"full_name": "Student", "verification_status": "unverified", "verification_documents": []}
+        })
+        owner = {"user_id": str(user_id), "role": "client"}
+        result = await server.upload_verification_document(
+            server.DocumentUpload(
+                document="data:image/png;base64," + base64.b64encode(PAYLOAD).decode(),
+                file_name="civil-id.png"
+            ),
+            current_user=owner
+        )
+        user = await db.users.find_one({"_id": user_id})
+        response = await server.download_document(result["document_id"], current_user=owner)
+        body = await read_body(response)
+        admin_body = await read_body(await server.download_document(
+            result["document_id"], current_user={"user_id": str(ObjectId()), "role": "admin"}
+        ))
+        with pytest.raises(HTTPException) as denied:
+            await server.download_document(
+                result["document_id"], current_user={"user_id": str(ObjectId()), "role": "client"}
+            )
+        return user, response, body, admin_body, denied.value
+
+    user, response, body, admin_body, denied = asyncio.run(scenario())
+    document = user["profile"]["verification_documents"][0]
+    assert "file_data" not in document
+    assert document["size"] == len(PAYLOAD)
+    assert user["profile"]["verification_status"] == "pending"
+    assert len(bson.encode(user)) < 2048
+
+    assert response.media_type == "image/png"
+    assert response.headers["content-length"] == str(len(PAYLOAD))
+    assert body == admin_body == PAYLOAD
+    assert denied.status_code == 403
+
+
+def test_download_header_survives_non_ascii_and_quoted_names(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        user_id = ObjectId()
+        owner = {"user_id": str(user_id), "role": "client"}
+        info = await put_blob(
+            db, b"%PDF-1.4", 'عقد "الإيجار"\r\n.pdf', "application/pdf", {"owner_id": user_id}
+        )
+        return await server.download_document(str(info["_id"]), current_user=owner)
+
+    header = asyncio.run(scenario()).headers["content-disposition"]
+    header.encode("latin-1")
+    assert header.startswith('inline; filename="')
+    assert header.count('"') == 2
+    assert header.endswith("filename*=UTF-8''%D8%B9%D9%82%D8%AF%20%D8%A7%D9%84%D8%A5%D9%8A%D8%AC%D8%A7%D8%B1.pdf")
+
+
+def test_migration_moves_embedded_documents(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        encoded = base64.b64encode(PAYLOAD).decode()
+        result = await db.users.insert_one({
+            "email": "legacy@example.com", "role": "client",
+            "profile": {"full_name": "Legacy", "verification_documents": [
+                encoded,
+                {"file_name": "cr.pdf", "file_type": "application/pdf", "file_data": encoded, "uploaded_at": None}
+            ]}
+        })
+        moved = await move_verification_documents_to_blobs(db)
+        again = await move_verification_documents_to_blobs(db)
+        user = await db.users.find_one({"_id": result.inserted_id})
+        blobs = [await read_blob(db, d["file_id"]) for d in user["profile"]["verification_documents"]]
+        return moved, again, user, blobs
+
+    moved, again, user, blobs = asyncio.run(scenario())
+    assert (moved, again) == (2, 0)
+    documents = user["profile"]["verification_documents"]
+    assert [d["file_type"] for d in documents] == ["application/octet-stream", "application/pdf"]
+    assert all("file_data" not in d for d in documents)
+    assert blobs == [PAYLOAD, PAYLOAD]
+    assert server.serialize_user(user)["profile"]["verification_documents"][1]["file_id"] == str(documents[1]["file_id"])
+
+
+def test_pending_queue_returns_metadata_only(mongo):
+    db, counter = mongo
+
+    async def scenario():
+        user_id = ObjectId()
+        info = await put_blob(db, PAYLOAD, "civil-id.png", "image/png")
+        await db.users.insert_one({
+            "_id": user_id, "email": "p@example.com", "role": "client", "password_hash": "x",
+            "profile": {"full_name": "Pending", "verification_status": "pending", "verification_documents": [
+                {"file_id": info["_id"], "file_name": "civil-id.png", "file_type": "image/png",
+                 "size": info["length"], "uploaded_at": info["uploadDate"]},
+                {"file_name": "old.png", "file_type": "image/png", "file_data": "aGVsbG8=", "uploaded_at": None}
+            ]}
+        })
+        counter.reset()
+        queue = await server.get_pending_verifications(current_user={"user_id": str(ObjectId()), "role": "admin"})
+        return info, queue, list(counter.commands)
+
+    info, queue, commands = asyncio.run(scenario())
+    stored, legacy = queue[0]["profile"]["verification_documents"]
+    assert stored["uploaded_at"] is not None
+    assert {k: v for k, v in stored.items() if k != "uploaded_at"} == {
+        "file_id": str(info["_id"]), "file_name": "civil-id.png", "file_type": "image/png",
+        "size": len(PAYLOAD), "url": f"/api/documents/{info['_id']}"
+    }
+    assert legacy["url"] is None
+    assert [c[1] for c in commands] == ["users"]
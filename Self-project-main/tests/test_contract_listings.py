@@ -0,0 +1,82 @@
+"""
+Contract list tests: a page costs a fixed number of round trips, and the
+summary view leaves out the terms and payment schedule.
+"""
+import asyncio
+from datetime import datetime, date, timedelta
+
+from bson import ObjectId
+
+import server
+from contracts import generate_payment_schedule
+
+# contracts page + batched users + batched services
+MAX_ROUND_TRIPS = 3
+
+
+async def seed_contracts(db, student_id, count=30):
+    providers = [ObjectId() for _ in range(5)]
+    services = [ObjectId() for _ in range(5)]
+    await db.users.insert_many(
+        [{"_id": student_id, "role": "client", "profile": {"full_name": "Student"}}] +
+        [{"_id": pid, "role": "service_provider", "profile": {"full_name": f"Provider {i}"}}
+         for i, pid in enumerate(providers)]
+    )
+    await db.services.insert_many([{"_id": sid, "title": f"Service {i}"} for i, sid in enumerate(services)])
+
+    now = datetime.utcnow()
+    schedule = generate_payment_schedule(date(2025, 9, 1), 4, 50.0)
+    schedule[0]["status"] = "paid"
+    await db.contracts.insert_many([{
+        "student_id": student_id,
+        "provider_id": providers[i % 5],
+        "service_id": services[i % 5],
+        "start_date": datetime(2025, 9, 1),
+        "end_date": datetime(2026, 1, 1),
+        "monthly_price": 50.0,
+        "duration_months": 4,
+        "total_amount": 200.0,
+        "auto_generated_terms": "TERMS " * 1000,
+        "student_signature": {"signed": True},
+        "provider_signature": {"signed": True},
+        "payment_schedule": schedule,
+        "status": "active",
+        "created_at": now - timedelta(minutes=i),
+        "updated_at": now
+    } for i in range(count)])
+
+
+def test_student_contract_summaries_use_batched_lookups(mongo):
+    db, counter = mongo
+    student_id = ObjectId()
+    asyncio.run(seed_contracts(db, student_id))
+    counter.reset()
+
+    results = asyncio.run(server.get_student_contracts(
+        current_user={"user_id": str(student_id), "role": "client"},
+        skip=0, limit=50, page_cursor=None, summary=True
+    ))
+
+    assert len(results) == 30
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
+    first = results[0]
+    assert "auto_generated_terms" not in first and "payment_schedule" not in first
+    assert (first["payments_paid"], first["payments_total"]) == (1, 4)
+    assert first["provider_name"].startswith("Provider")
+
+
+def test_full_contract_list_keeps_terms(mongo):
+    db, counter = mongo
+    student_id = ObjectId()
+    asyncio.run(seed_contracts(db, student_id, count=5))
+    counter.reset()
+
+    results = asyncio.run(server.get_student_contracts(
+        current_user={"user_id": str(student_id), "role": "client"},
+        skip=0, limit=50, page_cursor=None, summary=False
+    ))
+
+    assert len(results) == 5
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
+    assert results[0]["auto_generated_terms"].startswith("TERMS")
+    assert len(results[0]["payment_schedule"]) == 4
@@ -0,0 +1,129 @@
+"""
+Contract state machine tests: each transition is one conditional write, so
+parallel transitions on the same contract are resolved deterministically.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+
+
+async def seed_contract(db, status="pending_provider_approval"):
+    student_id, provider_id, service_id = ObjectId(), ObjectId(), ObjectId()
+    await db.users.insert_many([
+        {"_id": student_id, "role": "client", "profile": {"full_name": "Student"}},
+        {"_id": provider_id, "role": "service_provider", "profile": {"full_name": "Provider"}}
+    ])
+    await db.services.insert_one({"_id": service_id, "title": "Bus", "capacity": 10, "available_slots": 10})
+    result = await db.contracts.insert_one({
+        "student_id": student_id,
+        "provider_id": provider_id,
+        "service_id": service_id,
+        "start_date": datetime(2025, 9, 1),
+        "end_date": datetime(2025, 12, 1),
+        "monthly_price": 40.0,
+        "duration_months": 3,
+        "total_amount": 120.0,
+        "auto_generated_terms": "TERMS",
+        "student_signature": {"signed": False},
+        "provider_signature": {"signed": False},
+        "payment_schedule": [],
+        "status": status,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    return (
+        str(result.inserted_id),
+        {"user_id": str(student_id), "role": "client"},
+        {"user_id": str(provider_id), "role": "service_provider"}
+    )
+
+
+async def settle(calls):
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    wins = [r for r in results if isinstance(r, dict)]
+    losses = [r for r in results if isinstance(r, HTTPException)]
+    assert len(wins) + len(losses) == len(results), results
+    return wins, losses
+
+
+def test_parallel_accepts_have_exactly_one_winner(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, _, provider = await seed_contract(db)
+        return await settle([
+            server.provider_accept_contract(contract_id, current_user=provider) for _ in range(20)
+        ])
+
+    wins, losses = asyncio.run(scenario())
+    assert len(wins) == 1
+    assert wins[0]["status"] == "awaiting_student_confirmation"
+    assert wins[0]["provider_signature"]["signed"] is True
+    assert len(losses) == 19
+    assert all(exc.status_code == 400 for exc in losses)
+
+
+def test_accept_racing_reject_leaves_one_outcome(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, _, provider = await seed_contract(db)
+        calls = []
+        for _ in range(10):
+            calls.append(server.provider_accept_contract(contract_id, current_user=provider))
+            calls.append(server.provider_reject_contract(contract_id, current_user=provider))
+        wins, losses = await settle(calls)
+        stored = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        return wins, losses, stored
+
+    wins, losses, stored = asyncio.run(scenario())
+    assert len(wins) == 1
+    assert len(losses) == 19
+    assert stored["status"] == wins[0]["status"]
+
+
+def test_parallel_cancels_restore_one_slot(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, student, _ = await seed_contract(db, status="active")
+        contract = await db.contracts.find_one_and_update(
+            {"_id": ObjectId(contract_id)}, {"$set": {"slot_reserved": True}}
+        )
+        await db.services.update_one({"_id": contract["service_id"]}, {"$inc": {"available_slots": -1}})
+        wins, _ = await settle([
+            server.cancel_contract(contract_id, current_user=student) for _ in range(10)
+        ])
+        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        service = await db.services.find_one({"_id": contract["service_id"]})
+        return wins, service
+
+    wins, service = asyncio.run(scenario())
+    assert len(wins) == 1
+    assert service["available_slots"] == 10
+
+
+def test_transition_errors(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, student, provider = await seed_contract(db)
+        stranger = {"user_id": str(ObjectId()), "role": "service_provider"}
+        errors = []
+        for call in (
+            server.provider_accept_contract(contract_id, current_user=stranger),
+            server.student_confirm_contract(contract_id, current_user=student),
+            server.provider_accept_contract(str(ObjectId()), current_user=provider),
+            server.provider_accept_contract("not-an-id", current_user=provider),
+        ):
+            with pytest.raises(HTTPException) as exc:
+                await call
+            errors.append(exc.value.status_code)
+        return errors
+
+    assert asyncio.run(scenario()) == [403, 400, 404, 400]
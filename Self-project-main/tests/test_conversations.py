@@ -0,0 +1,127 @@
+"""
+Inbox tests: unread counts come from per-participant counters on the
+conversation, the inbox is served with a fixed number of round trips, and
+reading a conversation only moves the reader's watermark.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import server
+from models import MessageCreate
+
+CONVERSATIONS = 30
+# One find for the conversations + one batched $in lookup for participants
+MAX_ROUND_TRIPS = 2
+
+
+async def seed_inbox(db, conversations=CONVERSATIONS):
+    owner_id = ObjectId()
+    tenant_ids = [ObjectId() for _ in range(conversations)]
+    await db.users.insert_many([
+        {"_id": user_id, "email": f"user{i}@example.com", "role": "client",
+         "profile": {"full_name": f"User {i}"}}
+        for i, user_id in enumerate([owner_id] + tenant_ids)
+    ])
+    now = datetime.utcnow()
+    await db.conversations.insert_many([{
+        "participants": sorted([str(owner_id), str(tenant_id)]),
+        "contract_id": None,
+        "last_message": None,
+        "last_message_time": None,
+        "unread": {str(owner_id): 0, str(tenant_id): 0},
+        "created_at": now,
+        "updated_at": now
+    } for tenant_id in tenant_ids])
+    return str(owner_id), [str(tenant_id) for tenant_id in tenant_ids]
+
+
+def test_inbox_uses_constant_round_trips(mongo):
+    db, counter = mongo
+    owner_id, _ = asyncio.run(seed_inbox(db))
+    counter.reset()
+
+    inbox = asyncio.run(server.get_conversations(current_user={"user_id": owner_id, "role": "client"}))
+
+    assert len(inbox) == CONVERSATIONS
+    assert all(len(conv["participants"]) == 2 for conv in inbox)
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
+
+
+def test_unread_counter_follows_send_and_read(mongo):
+    db, _ = mongo
+    owner_id, tenant_ids = asyncio.run(seed_inbox(db, conversations=1))
+    owner = {"user_id": owner_id, "role": "client"}
+    tenant = {"user_id": tenant_ids[0], "role": "client"}
+
+    async def scenario():
+        conv = await db.conversations.find_one({})
+        conversation_id = str(conv["_id"])
+        for text in ("Is the room free?", "From next month"):
+            await server.send_message(conversation_id, MessageCreate(content=text), current_user=tenant, idempotency_key=None)
+        before = (await server.get_conversations(current_user=owner))[0]["unread_count"]
+        sender_side = (await server.get_conversations(current_user=tenant))[0]["unread_count"]
+        await server.get_messages(conversation_id, skip=0, limit=50, page_cursor=None, latest=False, current_user=owner)
+        after = (await server.get_conversations(current_user=owner))[0]["unread_count"]
+        return before, sender_side, after
+
+    before, sender_side, after = asyncio.run(scenario())
+    assert (before, sender_side, after) == (2, 0, 0)
+
+
+def test_reading_moves_watermark_without_touching_messages(mongo):
+    db, counter = mongo
+    owner_id, tenant_ids = asyncio.run(seed_inbox(db, conversations=1))
+    owner = {"user_id": owner_id, "role": "client"}
+    tenant = {"user_id": tenant_ids[0], "role": "client"}
+
+    async def scenario():
+        conv = await db.conversations.find_one({})
+        conversation_id = str(conv["_id"])
+        for i in range(20):
+            await server.send_message(conversation_id, MessageCreate(content=f"Message {i}"), current_user=tenant, idempotency_key=None)
+
+        counter.reset()
+        await server.get_messages(conversation_id, skip=0, limit=50, page_cursor=None, latest=False, current_user=owner)
+        first_read = list(counter.commands)
+
+        counter.reset()
+        await server.get_messages(conversation_id, skip=0, limit=50, page_cursor=None, latest=False, current_user=owner)
+        second_read = list(counter.commands)
+
+        seen_by_sender = await server.get_messages(conversation_id, skip=0, limit=50, page_cursor=None, latest=False, current_user=tenant)
+        return first_read, second_read, seen_by_sender
+
+    first_read, second_read, seen_by_sender = asyncio.run(scenario())
+
+    writes = [command for command in first_read if command[0] in ("update", "findAndModify")]
+    assert writes == [("update", "conversations")]
+    # Already caught up: no write at all
+    assert all(command[0] == "find" for command in second_read), second_read
+    assert all(message["is_read"] for message in seen_by_sender)
+
+
+def test_last_message_time_never_moves_back(mongo):
+    db, _ = mongo
+    owner_id, tenant_ids = asyncio.run(seed_inbox(db, conversations=1))
+    owner = {"user_id": owner_id, "role": "client"}
+    tenant = {"user_id": tenant_ids[0], "role": "client"}
+
+    async def scenario():
+        conv = await db.conversations.find_one({})
+        conversation_id = str(conv["_id"])
+        # A concurrent send with a later timestamp already landed
+        newer = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=1)
+        await db.conversations.update_one(
+            {"_id": conv["_id"]}, {"$set": {"last_message_time": newer, f"unread.{owner_id}": 1}}
+        )
+        await server.send_message(conversation_id, MessageCreate(content="Older"), current_user=tenant, idempotency_key=None)
+        await server.get_messages(conversation_id, skip=0, limit=50, page_cursor=None, latest=False, current_user=owner)
+        conv = await db.conversations.find_one({})
+        return newer, conv
+
+    newer, conv = asyncio.run(scenario())
+    assert conv["last_message_time"] == newer
+    assert conv["read_up_to"][owner_id] == newer
+    assert conv["unread"][owner_id] == 0
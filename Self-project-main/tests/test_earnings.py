@@ -0,0 +1,124 @@
+"""
+Provider earnings tests: the dashboard reads rollups maintained on every
+payment, so its cost does not grow with the provider's payment volume.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import server
+from contracts import calculate_revenue_split, generate_payment_schedule
+from earnings import rebuild_earnings, record_earnings
+from models import PaymentCreate
+
+MAX_ROUND_TRIPS = 4
+
+
+async def add_payments(db, provider_id, amounts_by_days_ago):
+    now = datetime.utcnow()
+    for i, (days_ago, amount) in enumerate(amounts_by_days_ago):
+        split = calculate_revenue_split(amount)
+        payment = {
+            "contract_id": ObjectId(),
+            "student_id": ObjectId(),
+            "provider_id": provider_id,
+            "amount": amount,
+            "provider_amount": split["provider_amount"],
+            "platform_fee": split["platform_fee"],
+            "payment_method": "mock_card",
+            "transaction_id": f"TX-{i}",
+            "status": "paid",
+            "paid_at": now - timedelta(days=days_ago),
+            "created_at": now
+        }
+        result = await db.payments.insert_one(payment)
+        payment["_id"] = result.inserted_id
+        await record_earnings(db, payment)
+
+
+def dashboard(provider_id, days=30, months=12):
+    return server.get_provider_earnings(
+        days=days, months=months,
+        current_user={"user_id": str(provider_id), "role": "service_provider"}
+    )
+
+
+def test_dashboard_totals_and_buckets(mongo):
+    db, _ = mongo
+    provider_id = ObjectId()
+
+    async def scenario():
+        await add_payments(db, provider_id, [(0, 100.0), (0, 50.0), (3, 40.0), (400, 10.0)])
+        return await dashboard(provider_id, days=7)
+
+    result = asyncio.run(scenario())
+    assert result["total_transactions"] == 4
+    assert result["total_gross"] == 200.0
+    assert result["total_earnings"] == 180.0
+    assert result["total_platform_fees"] == 20.0
+    assert [b["transactions"] for b in result["daily"]] == [1, 2]
+    assert result["daily"][-1]["gross"] == 150.0
+    assert sum(b["transactions"] for b in result["monthly"]) == 3
+
+    paid = [p["paid_at"] for p in result["recent_payments"]]
+    assert paid == sorted(paid, reverse=True)
+
+
+def test_dashboard_cost_does_not_grow_with_payments(mongo):
+    db, counter = mongo
+    provider_id = ObjectId()
+
+    async def scenario():
+        costs = []
+        for batch in (5, 200):
+            await add_payments(db, provider_id, [(i % 20, 10.0) for i in range(batch)])
+            counter.reset()
+            await dashboard(provider_id)
+            costs.append(counter.count)
+        return costs
+
+    small, large = asyncio.run(scenario())
+    assert small == large <= MAX_ROUND_TRIPS
+
+
+def test_make_payment_updates_rollups(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        student_id, provider_id = ObjectId(), ObjectId()
+        contract = await db.contracts.insert_one({
+            "student_id": student_id,
+            "provider_id": provider_id,
+            "payment_schedule": generate_payment_schedule(datetime(2030, 1, 1), 2, 60.0)
+        })
+        await server.make_payment(
+            PaymentCreate(contract_id=str(contract.inserted_id), amount=60.0),
+            current_user={"user_id": str(student_id), "role": "client"},
+            idempotency_key=None
+        )
+        return await dashboard(provider_id)
+
+    result = asyncio.run(scenario())
+    assert result["total_transactions"] == 1
+    assert result["total_earnings"] == 54.0
+
+
+def test_rebuild_earnings_repairs_drift(mongo):
+    db, _ = mongo
+    provider_id = ObjectId()
+
+    async def scenario():
+        await add_payments(db, provider_id, [(0, 100.0), (1, 20.0)])
+        await db.provider_earnings.update_one({"_id": f"{provider_id}:all"}, {"$inc": {"gross": 5}})
+        await db.provider_earnings.delete_one({"period": "day", "provider_id": provider_id})
+        audit = await rebuild_earnings(db, apply=False)
+        fixed = await rebuild_earnings(db)
+        again = await rebuild_earnings(db, apply=False)
+        return audit, fixed, again, await dashboard(provider_id)
+
+    audit, fixed, again, result = asyncio.run(scenario())
+    assert audit["drifted"] == 2 and audit["applied"] is False
+    assert fixed["drifted"] == 2
+    assert again["drifted"] == 0
+    assert result["total_gross"] == 120.0
@@ -0,0 +1,157 @@
+"""
+Event bus tests: events on a topic are handled in publish order, a failing
+handler does not block the others, a failed publish does not fail the
+request that made the change, and with the Mongo backend an event published
+by one worker reaches every worker, once, even after the tail loses its place.
+"""
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+import server
+from events import InMemoryEventBus, MongoEventBus
+from models import MessageCreate
+
+TOPICS = ("chat", "contracts", "services")
+EVENTS_PER_TOPIC = 200
+
+
+def test_memory_bus_keeps_per_topic_order_under_concurrent_publishers():
+    bus = InMemoryEventBus()
+    received = {topic: [] for topic in TOPICS}
+
+    async def handler(topic, payload):
+        await asyncio.sleep(0)  # let the other publishers interleave
+        received[topic].append(payload["seq"])
+
+    for topic in TOPICS:
+        bus.subscribe(topic, handler)
+
+    async def publisher(topic):
+        for seq in range(EVENTS_PER_TOPIC):
+            await bus.publish(topic, {"seq": seq})
+
+    async def scenario():
+        await asyncio.gather(*(publisher(topic) for topic in TOPICS))
+
+    asyncio.run(scenario())
+    for topic in TOPICS:
+        assert received[topic] == list(range(EVENTS_PER_TOPIC))
+    assert bus.stats()["dispatched"] == len(TOPICS) * EVENTS_PER_TOPIC
+
+
+def test_failing_handler_does_not_stop_delivery():
+    bus = InMemoryEventBus()
+    received = []
+
+    async def broken(topic, payload):
+        raise RuntimeError("boom")
+
+    async def working(topic, payload):
+        received.append(payload)
+
+    bus.subscribe("chat", broken)
+    bus.subscribe("chat", working)
+    asyncio.run(bus.publish("chat", {"n": 1}))
+
+    assert received == [{"n": 1}]
+    assert bus.stats()["handler_errors"] == 1
+
+
+def test_mongo_bus_fans_out_to_every_worker_in_order(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        workers = [MongoEventBus(db, collection="events_test"), MongoEventBus(db, collection="events_test")]
+        received = [[] for _ in workers]
+        for bus, inbox in zip(workers, received):
+            async def handler(topic, payload, inbox=inbox):
+                inbox.append((topic, payload["seq"]))
+            for topic in TOPICS:
+                bus.subscribe(topic, handler)
+            await bus.start()
+
+        expected = [(TOPICS[seq % len(TOPICS)], seq) for seq in range(60)]
+        for topic, seq in expected:
+            await workers[seq % 2].publish(topic, {"seq": seq})
+
+        for _ in range(100):
+            if all(len(inbox) == len(expected) for inbox in received):
+                break
+            await asyncio.sleep(0.05)
+        for bus in workers:
+            await bus.stop()
+        return expected, received
+
+    expected, received = asyncio.run(scenario())
+    assert received[0] == expected
+    assert received[1] == expected
+
+
+def test_mongo_bus_resumes_after_the_last_event_even_once_evicted(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        await db.events_test.insert_one({"_id": ObjectId(), "topic": "chat", "payload": {"seq": -1}, "ts": datetime.utcnow()})
+        bus = MongoEventBus(db, collection="events_test")
+        received = []
+
+        async def handler(topic, payload):
+            received.append(payload["seq"])
+        bus.subscribe("chat", handler)
+        await bus.start()
+
+        async def settle(count):
+            for _ in range(100):
+                if len(received) >= count:
+                    break
+                await asyncio.sleep(0.05)
+
+        for seq in range(3):
+            await bus.publish("chat", {"seq": seq})
+        await settle(3)
+        # The cap drops the last event delivered; the tail must neither stall nor replay
+        await db.events_test.delete_one({"_id": bus._last_id})
+        for seq in range(3, 5):
+            await bus.publish("chat", {"seq": seq})
+        await settle(5)
+        await asyncio.sleep(0.3)
+        await bus.stop()
+        return received
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+
+
+class UnreachableEvents:
+    async def insert_one(self, document):
+        raise AutoReconnect("events collection unreachable")
+
+
+def test_failed_publish_does_not_fail_the_request(mongo, monkeypatch):
+    db, _ = mongo
+    bus = MongoEventBus(db)
+    monkeypatch.setattr(MongoEventBus, "collection", property(lambda self: UnreachableEvents()))
+    monkeypatch.setattr(server, "event_bus", bus)
+    tenant_id, owner_id = str(ObjectId()), str(ObjectId())
+
+    async def scenario():
+        await db.users.insert_one({"_id": ObjectId(tenant_id), "email": "t@example.com", "profile": {"full_name": "Tenant"}})
+        result = await db.conversations.insert_one({
+            "participants": sorted([tenant_id, owner_id]),
+            "unread": {tenant_id: 0, owner_id: 0},
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        sent = await server.send_message(
+            str(result.inserted_id), MessageCreate(content="Hello"),
+            current_user={"user_id": tenant_id, "role": "client"}, idempotency_key=None
+        )
+        return sent, await db.messages.count_documents({})
+
+    sent, stored = asyncio.run(scenario())
+    assert sent["content"] == "Hello"
+    assert stored == 1
+    assert bus.stats()["publish_errors"] >= 1
+    assert bus.stats()["published"] == 0
@@ -0,0 +1,118 @@
+"""
+Idempotency-Key store tests: a key runs its request once and every retry
+gets the stored response back.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from idempotency import request_fingerprint, run_idempotent
+
+
+class Handler:
+    def __init__(self, fail=False, delay=0):
+        self.calls = 0
+        self.fail = fail
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise HTTPException(status_code=400, detail="boom")
+        return {"id": f"result-{self.calls}"}
+
+
+def test_retries_replay_the_stored_response(mongo):
+    db, _ = mongo
+    handler = Handler()
+
+    async def scenario():
+        first = await run_idempotent(db, "k1", "u1", "payments", {"amount": 40}, handler)
+        again = await run_idempotent(db, "k1", "u1", "payments", {"amount": 40}, handler)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first == again == {"id": "result-1"}
+    assert handler.calls == 1
+
+
+def test_keys_are_scoped_per_user_and_endpoint(mongo):
+    db, _ = mongo
+    handler = Handler()
+
+    async def scenario():
+        await run_idempotent(db, "k1", "u1", "payments", {}, handler)
+        await run_idempotent(db, "k1", "u2", "payments", {}, handler)
+        await run_idempotent(db, "k1", "u1", "reviews", {}, handler)
+
+    asyncio.run(scenario())
+    assert handler.calls == 3
+
+
+def test_reused_key_with_different_body_is_rejected(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        await run_idempotent(db, "k1", "u1", "payments", {"amount": 40}, Handler())
+        with pytest.raises(HTTPException) as exc:
+            await run_idempotent(db, "k1", "u1", "payments", {"amount": 45}, Handler())
+        return exc.value
+
+    assert asyncio.run(scenario()).status_code == 422
+
+
+def test_concurrent_duplicate_is_rejected_while_running(mongo):
+    db, _ = mongo
+    handler = Handler(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(
+            run_idempotent(db, "k1", "u1", "payments", {}, handler),
+            run_idempotent(db, "k1", "u1", "payments", {}, handler),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert handler.calls == 1
+    assert {"id": "result-1"} in results
+    assert any(isinstance(r, HTTPException) and r.status_code == 409 for r in results)
+
+
+def test_failed_request_releases_its_key(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await run_idempotent(db, "k1", "u1", "payments", {}, Handler(fail=True))
+        return await run_idempotent(db, "k1", "u1", "payments", {}, Handler())
+
+    assert asyncio.run(scenario()) == {"id": "result-1"}
+
+
+def test_stale_claim_is_taken_over(mongo):
+    db, _ = mongo
+    handler = Handler()
+
+    async def scenario():
+        # A worker claimed the key and died before finishing
+        now = datetime.utcnow()
+        await db.idempotency_keys.insert_one({
+            "_id": "u1:payments:k1",
+            "fingerprint": request_fingerprint({}),
+            "status": "in_progress",
+            "claim": "dead-worker",
+            "locked_until": now - timedelta(seconds=1),
+            "response": None,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=1)
+        })
+        first = await run_idempotent(db, "k1", "u1", "payments", {}, handler)
+        again = await run_idempotent(db, "k1", "u1", "payments", {}, handler)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first == again == {"id": "result-1"}
+    assert handler.calls == 1
@@ -0,0 +1,224 @@
+"""
+Bucketed message storage tests: the chat endpoints behave the same with
+MESSAGE_STORAGE=buckets, buckets stay at most BUCKET_SIZE messages under
+concurrent appends, and packing existing messages keeps their order and
+picks up whatever was written during the cutover.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import server
+from message_store import BucketMessageStore, DocumentMessageStore, DualWriteMessageStore, pack_messages_into_buckets
+from models import MessageCreate, MessageResponse
+
+BUCKET_SIZE = 10
+MESSAGES = 47
+
+
+@pytest.fixture
+def bucket_store(monkeypatch):
+    store = BucketMessageStore(bucket_size=BUCKET_SIZE)
+    monkeypatch.setattr(server, "message_store", store)
+    return store
+
+
+async def seed_conversation(db):
+    tenant_id, owner_id = ObjectId(), ObjectId()
+    await db.users.insert_many([
+        {"_id": tenant_id, "email": "t@example.com", "role": "client", "profile": {"full_name": "Tenant"}},
+        {"_id": owner_id, "email": "o@example.com", "role": "service_provider", "profile": {"full_name": "Owner"}}
+    ])
+    result = await db.conversations.insert_one({
+        "participants": sorted([str(tenant_id), str(owner_id)]),
+        "unread": {str(tenant_id): 0, str(owner_id): 0},
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    return str(result.inserted_id), {"user_id": str(tenant_id), "role": "client"}
+
+
+def test_bucketed_chat_keeps_the_api(mongo, bucket_store):
+    db, _ = mongo
+
+    async def scenario():
+        await bucket_store.create_indexes(db)
+        conversation_id, tenant = await seed_conversation(db)
+        sent = [
+            await server.send_message(conversation_id, MessageCreate(content=f"Message {i}"), current_user=tenant, idempotency_key=None)
+            for i in range(MESSAGES)
+        ]
+        offset_page = await server.get_messages(conversation_id, skip=15, limit=12, page_cursor=None, latest=False, current_user=tenant)
+
+        walked, token = [], ""
+        while True:
+            page = await server.get_messages(conversation_id, skip=0, limit=20, page_cursor=token, latest=False, current_user=tenant)
+            walked.extend(page["items"])
+            if not page["next_cursor"]:
+                break
+            token = page["next_cursor"]
+
+        latest = await server.get_messages(conversation_id, skip=0, limit=5, page_cursor=None, latest=True, current_user=tenant)
+        buckets = await db.message_buckets.find({}, {"seq": 1, "count": 1}).sort("seq", 1).to_list(length=None)
+        return sent, offset_page, walked, latest, buckets
+
+    sent, offset_page, walked, latest, buckets = asyncio.run(scenario())
+
+    assert [b["count"] for b in buckets] == [10, 10, 10, 10, 7]
+    assert [m["content"] for m in offset_page] == [f"Message {i}" for i in range(15, 27)]
+    assert [m["id"] for m in walked] == [m["id"] for m in sent]
+    assert [m["content"] for m in latest] == [f"Message {i}" for i in range(42, 47)]
+    MessageResponse(**offset_page[0])
+
+
+def test_concurrent_appends_fill_buckets_exactly(mongo, bucket_store):
+    db, _ = mongo
+    conversation_id = str(ObjectId())
+    start = datetime.utcnow()
+
+    async def scenario():
+        await bucket_store.create_indexes(db)
+        await asyncio.gather(*(
+            bucket_store.append(db, {
+                "_id": ObjectId(),
+                "conversation_id": conversation_id,
+                "sender_id": "u1",
+                "sender_name": "U1",
+                "content": str(i),
+                "timestamp": start + timedelta(milliseconds=i)
+            }) for i in range(95)
+        ))
+        return await db.message_buckets.find({"conversation_id": conversation_id}).to_list(length=None)
+
+    buckets = asyncio.run(scenario())
+    assert sorted(b["count"] for b in buckets) == [5] + [BUCKET_SIZE] * 9
+    assert all(len(b["messages"]) == b["count"] for b in buckets)
+    assert len({m["_id"] for b in buckets for m in b["messages"]}) == 95
+
+
+def test_packing_existing_messages_preserves_order(mongo):
+    db, _ = mongo
+    conversation_id = str(ObjectId())
+    start = datetime.utcnow().replace(microsecond=0)
+
+    async def scenario():
+        await db.messages.insert_many([{
+            "conversation_id": conversation_id,
+            "sender_id": "u1",
+            "sender_name": "U1",
+            "content": str(i),
+            "timestamp": start + timedelta(seconds=i),
+            "is_read": False
+        } for i in range(MESSAGES)])
+        store = BucketMessageStore(bucket_size=BUCKET_SIZE)
+        first = await pack_messages_into_buckets(db, store=store)
+        again = await pack_messages_into_buckets(db, store=store)
+        packed = await store.page(db, conversation_id, 0, MESSAGES)
+        original = await DocumentMessageStore().page(db, conversation_id, 0, MESSAGES)
+        return first, again, packed, original
+
+    first, again, packed, original = asyncio.run(scenario())
+    assert first == {"conversations": 1, "messages": MESSAGES}
+    assert again == {"conversations": 0, "messages": 0}
+    assert [m["_id"] for m in packed] == [m["_id"] for m in original]
+
+
+def test_cutover_packs_messages_written_in_dual_mode(mongo):
+    db, _ = mongo
+    conversation_id = str(ObjectId())
+    start = datetime.utcnow().replace(microsecond=0)
+    buckets = BucketMessageStore(bucket_size=BUCKET_SIZE)
+    dual = DualWriteMessageStore(buckets)
+
+    def message(i):
+        return {
+            "_id": ObjectId(),
+            "conversation_id": conversation_id,
+            "sender_id": "u1",
+            "sender_name": "U1",
+            "content": str(i),
+            "timestamp": start + timedelta(seconds=i)
+        }
+
+    async def scenario():
+        await dual.create_indexes(db)
+        # Sent before the first pack: only in messages
+        for i in range(25):
+            await dual.append(db, message(i))
+        await pack_messages_into_buckets(db, store=buckets)
+        # Sent in documents mode after the pack (not yet switched to dual)
+        for i in range(25, 30):
+            await DocumentMessageStore().append(db, message(i))
+        catch_up = await pack_messages_into_buckets(db, store=buckets)
+        # Sent in dual mode: lands in both layouts
+        for i in range(30, 33):
+            await dual.append(db, message(i))
+        done = await pack_messages_into_buckets(db, store=buckets)
+        packed = await buckets.page(db, conversation_id, 0, 100)
+        original = await DocumentMessageStore().page(db, conversation_id, 0, 100)
+        return catch_up, done, packed, original
+
+    catch_up, done, packed, original = asyncio.run(scenario())
+    assert catch_up == {"conversations": 1, "messages": 5}
+    assert done == {"conversations": 0, "messages": 0}
+    assert [m["_id"] for m in packed] == [m["_id"] for m in original]
+    assert len(packed) == 33
+
+
+def test_racing_appends_of_one_message_store_it_once(mongo):
+    db, _ = mongo
+    conversation_id = str(ObjectId())
+    store = BucketMessageStore(bucket_size=3)
+    start = datetime.utcnow()
+    messages = [{
+        "_id": ObjectId(),
+        "conversation_id": conversation_id,
+        "sender_id": "u1",
+        "sender_name": "U1",
+        "content": str(i),
+        "timestamp": start + timedelta(milliseconds=i)
+    } for i in range(7)]
+
+    async def scenario():
+        await store.create_indexes(db)
+        for message in messages:
+            # The packer and a dual write both try to append every message
+            await asyncio.gather(store.append(db, message, dedupe=True), store.append(db, message, dedupe=True))
+        await store.append(db, messages[0], dedupe=True)
+        return await store.page(db, conversation_id, 0, 100)
+
+    page = asyncio.run(scenario())
+    assert [m["_id"] for m in page] == [m["_id"] for m in messages]
+
+
+def test_offset_pages_follow_bucket_counts_after_a_size_change(mongo):
+    db, _ = mongo
+    conversation_id = str(ObjectId())
+    start = datetime.utcnow()
+
+    def message(i):
+        return {
+            "_id": ObjectId(),
+            "conversation_id": conversation_id,
+            "sender_id": "u1",
+            "sender_name": "U1",
+            "content": str(i),
+            "timestamp": start + timedelta(milliseconds=i)
+        }
+
+    async def scenario():
+        small, large = BucketMessageStore(bucket_size=4), BucketMessageStore(bucket_size=BUCKET_SIZE)
+        await small.create_indexes(db)
+        for i in range(6):
+            await small.append(db, message(i))  # buckets of 4 and 2
+        for i in range(6, 30):
+            await large.append(db, message(i))  # fills up to 10, then new buckets
+        counts = [b["count"] async for b in db.message_buckets.find({}).sort("seq", 1)]
+        pages = [await large.page(db, conversation_id, skip, 7) for skip in range(0, 30, 7)]
+        return counts, pages
+
+    counts, pages = asyncio.run(scenario())
+    assert counts == [4, 10, 10, 6]
+    assert [m["content"] for page in pages for m in page] == [str(i) for i in range(30)]
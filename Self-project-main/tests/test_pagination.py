@@ -0,0 +1,72 @@
+"""
+Keyset pagination tests: walking every page with cursors must return each
+document exactly once, in order, even when timestamps collide.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+from pagination import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    value, doc_id = datetime(2025, 9, 1, 8, 30, 0, 123000), ObjectId()
+    assert decode_cursor(encode_cursor(value, doc_id)) == (value, doc_id)
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_service_pages_cover_every_service_once(mongo):
+    db, _ = mongo
+    provider_id = ObjectId()
+    same_time = datetime(2025, 9, 1, 8, 0, 0)
+
+    async def scenario():
+        await db.users.insert_one({
+            "_id": provider_id,
+            "email": "provider@example.com",
+            "role": "service_provider",
+            "profile": {"full_name": "Provider"}
+        })
+        await db.services.insert_many([{
+            "provider_id": provider_id,
+            "service_type": "residence",
+            "title": f"Room {i}",
+            "description": "Shared room",
+            "price_monthly": 90.0,
+            "capacity": 1,
+            "location": {
+                "address": "Al Khuwair",
+                "coordinates": {"lat": 23.6, "lng": 58.4},
+                "city": "Muscat",
+                "university_nearby": "GUtech"
+            },
+            "status": "active",
+            # Every service shares a timestamp, so only _id can break ties
+            "created_at": same_time,
+            "updated_at": same_time
+        } for i in range(25)])
+
+        seen, token = [], ""
+        while token is not None:
+            page = await server.list_services(
+                service_type=None, min_price=None, max_price=None, city=None,
+                university=None, min_rating=None, fuzzy_location=False, skip=0, limit=10,
+                page_cursor=token
+            )
+            seen.extend(item["id"] for item in page["items"])
+            token = page["next_cursor"]
+        return seen
+
+    seen = asyncio.run(scenario())
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+    assert seen == sorted(seen, reverse=True)
@@ -0,0 +1,128 @@
+"""
+Payment tests: each payment settles exactly one installment with a
+positional update, so concurrent payments never settle the same one.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+from contracts import generate_payment_schedule
+from models import PaymentCreate
+
+
+async def seed_contract(db, months=3):
+    student_id, provider_id = ObjectId(), ObjectId()
+    result = await db.contracts.insert_one({
+        "student_id": student_id,
+        "provider_id": provider_id,
+        "service_id": ObjectId(),
+        "status": "active",
+        "payment_schedule": generate_payment_schedule(datetime(2030, 1, 1), months, 40.0),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    return str(result.inserted_id), {"user_id": str(student_id), "role": "client"}
+
+
+def pay(contract_id, student, key=None):
+    return server.make_payment(
+        PaymentCreate(contract_id=contract_id, amount=40.0),
+        current_user=student,
+        idempotency_key=key
+    )
+
+
+def test_concurrent_payments_settle_distinct_installments(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, student = await seed_contract(db, months=3)
+        results = await asyncio.gather(*[pay(contract_id, student) for _ in range(5)], return_exceptions=True)
+        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        payments = await db.payments.find({"contract_id": ObjectId(contract_id)}).to_list(length=10)
+        return results, contract, payments
+
+    results, contract, payments = asyncio.run(scenario())
+    paid = [r for r in results if isinstance(r, dict)]
+    refused = [r for r in results if isinstance(r, HTTPException)]
+    assert len(paid) == 3
+    assert len(refused) == 2 and all(exc.status_code == 400 for exc in refused)
+
+    schedule = contract["payment_schedule"]
+    assert all(item["status"] == "paid" for item in schedule)
+    assert sorted(item["transaction_id"] for item in schedule) == sorted(p["transaction_id"] for p in payments)
+
+
+def test_payment_settles_first_pending_installment(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, student = await seed_contract(db, months=4)
+        await db.contracts.update_one(
+            {"_id": ObjectId(contract_id)},
+            {"$set": {"payment_schedule.0.status": "paid"}}
+        )
+        payment = await pay(contract_id, student)
+        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        return payment, contract["payment_schedule"]
+
+    payment, schedule = asyncio.run(scenario())
+    assert [item["status"] for item in schedule] == ["paid", "paid", "pending", "pending"]
+    assert schedule[1]["transaction_id"] == payment["transaction_id"]
+
+
+def test_retried_payment_is_not_charged_twice(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, student = await seed_contract(db, months=3)
+        first = await pay(contract_id, student, key="pay-1")
+        retries = await asyncio.gather(*[pay(contract_id, student, key="pay-1") for _ in range(5)])
+        other = await pay(contract_id, student, key="pay-2")
+        payments = await db.payments.count_documents({"contract_id": ObjectId(contract_id)})
+        return first, retries, other, payments
+
+    first, retries, other, payments = asyncio.run(scenario())
+    assert all(r["transaction_id"] == first["transaction_id"] for r in retries)
+    assert other["transaction_id"] != first["transaction_id"]
+    assert payments == 2
+
+
+def test_failed_earnings_rollup_keeps_the_key(mongo, monkeypatch):
+    db, _ = mongo
+
+    async def broken_rollup(db, payment):
+        raise RuntimeError("rollup down")
+
+    monkeypatch.setattr(server, "record_earnings", broken_rollup)
+
+    async def scenario():
+        contract_id, student = await seed_contract(db, months=3)
+        first = await pay(contract_id, student, key="pay-1")
+        retry = await pay(contract_id, student, key="pay-1")
+        payments = await db.payments.count_documents({"contract_id": ObjectId(contract_id)})
+        return first, retry, payments
+
+    first, retry, payments = asyncio.run(scenario())
+    assert retry["transaction_id"] == first["transaction_id"]
+    assert payments == 1
+
+
+def test_payment_errors(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        contract_id, _ = await seed_contract(db)
+        stranger = {"user_id": str(ObjectId()), "role": "client"}
+        codes = []
+        for target in (contract_id, str(ObjectId()), "not-an-id"):
+            with pytest.raises(HTTPException) as exc:
+                await pay(target, stranger)
+            codes.append(exc.value.status_code)
+        return codes
+
+    assert asyncio.run(scenario()) == [403, 404, 400]
@@ -0,0 +1,151 @@
+"""
+Rating aggregate tests: concurrent reviews must all be counted, a failed
+rating update does not fail a committed review, and the reconciliation job
+must rebuild totals that have drifted. A page of reviews loads its students
+in one batched lookup.
+"""
+import asyncio
+
+from bson import ObjectId
+
+import server
+from models import ReviewCreate, ReviewCategories
+from ratings import reconcile_ratings, rating_from_totals
+
+
+async def seed_service(db, rating=None):
+    service_id = ObjectId()
+    await db.services.insert_one({
+        "_id": service_id,
+        "provider_id": ObjectId(),
+        "title": "Campus shuttle",
+        "rating": rating or rating_from_totals({})
+    })
+    return service_id
+
+
+async def add_reviews(db, service_id, ratings, categories=None):
+    students = [ObjectId() for _ in ratings]
+    await db.users.insert_many([
+        {"_id": sid, "role": "client", "profile": {"full_name": f"Student {i}"}}
+        for i, sid in enumerate(students)
+    ])
+    await asyncio.gather(*[
+        server.create_review(
+            ReviewCreate(
+                service_id=str(service_id), rating=r, safety_rating=5, review_text="ok",
+                categories=categories
+            ),
+            current_user={"user_id": str(sid), "role": "client"},
+            idempotency_key=None
+        )
+        for sid, r in zip(students, ratings)
+    ])
+
+
+def test_concurrent_reviews_are_all_counted(mongo):
+    db, _ = mongo
+    ratings = [5, 4, 3, 5, 1, 2, 4, 4, 5, 3] * 3
+
+    async def scenario():
+        service_id = await seed_service(db)
+        await add_reviews(db, service_id, ratings)
+        return await db.services.find_one({"_id": service_id})
+
+    service = asyncio.run(scenario())
+    assert service["rating"]["count"] == len(ratings)
+    assert service["rating"]["sum"] == sum(ratings)
+    assert service["rating"]["safety_sum"] == 5 * len(ratings)
+    assert service["rating"]["average"] == round(sum(ratings) / len(ratings), 2)
+
+
+def test_failed_rating_update_keeps_the_review_and_its_key(mongo, monkeypatch):
+    db, _ = mongo
+
+    def broken_pipeline(*args):
+        raise RuntimeError("rating update down")
+
+    monkeypatch.setattr(server, "rating_update_pipeline", broken_pipeline)
+    student_id = ObjectId()
+
+    async def scenario():
+        service_id = await seed_service(db)
+        await db.users.insert_one({"_id": student_id, "role": "client", "profile": {"full_name": "Student"}})
+        review = ReviewCreate(service_id=str(service_id), rating=4, safety_rating=5, review_text="ok")
+        student = {"user_id": str(student_id), "role": "client"}
+        first = await server.create_review(review, current_user=student, idempotency_key="review-1")
+        retry = await server.create_review(review, current_user=student, idempotency_key="review-1")
+        drift = await reconcile_ratings(db, apply=False)
+        return first, retry, drift
+
+    first, retry, drift = asyncio.run(scenario())
+    assert retry["id"] == first["id"]
+    assert first["student_name"] == "Student"
+    assert drift["drifted"] == 1
+
+
+def test_legacy_rating_without_totals_is_extended(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id = await seed_service(db, rating={"average": 4.5, "count": 2})
+        await add_reviews(db, service_id, [3])
+        return await db.services.find_one({"_id": service_id})
+
+    service = asyncio.run(scenario())
+    assert service["rating"]["count"] == 3
+    assert service["rating"]["average"] == 4.0
+
+
+def test_reconcile_rebuilds_drifted_totals(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id = await seed_service(db)
+        await add_reviews(db, service_id, [5, 3])
+        await db.services.update_one({"_id": service_id}, {"$set": {"rating.count": 99}})
+
+        audit = await reconcile_ratings(db, apply=False)
+        fixed = await reconcile_ratings(db)
+        return audit, fixed, await db.services.find_one({"_id": service_id})
+
+    audit, fixed, service = asyncio.run(scenario())
+    assert audit["drifted"] == 1
+    assert fixed["drifted"] == 1
+    rating = service["rating"]
+    assert (rating["average"], rating["count"], rating["sum"], rating["safety_sum"]) == (4.0, 2, 8, 10)
+    assert rating["histogram"] == {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}
+
+
+def test_summary_reports_histogram_and_category_averages(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id = await seed_service(db)
+        await add_reviews(db, service_id, [5, 4], ReviewCategories(punctuality=5, cleanliness=4))
+        await add_reviews(db, service_id, [2], ReviewCategories(punctuality=2))
+        return await server.get_service_rating_summary(str(service_id))
+
+    summary = asyncio.run(scenario())
+    assert summary["count"] == 3
+    assert summary["histogram"] == {"1": 0, "2": 1, "3": 0, "4": 1, "5": 1}
+    assert summary["categories"]["punctuality"] == {"average": 4.0, "count": 3}
+    assert summary["categories"]["cleanliness"] == {"average": 4.0, "count": 2}
+    assert summary["categories"]["communication"] == {"average": 0.0, "count": 0}
+
+
+def test_review_page_loads_students_in_one_lookup(mongo):
+    db, counter = mongo
+    ratings = [5, 4, 3, 5, 1, 2, 4, 4, 5, 3]
+
+    async def scenario():
+        service_id = await seed_service(db)
+        await add_reviews(db, service_id, ratings)
+        counter.reset()
+        return await server.get_service_reviews(str(service_id), skip=0, limit=20, page_cursor=None)
+
+    reviews = asyncio.run(scenario())
+    assert len(reviews) == len(ratings)
+    assert all(review["student_name"].startswith("Student") for review in reviews)
+    # The service, the page of reviews, one $in lookup for their students
+    assert counter.count <= 3, counter.commands
@@ -0,0 +1,100 @@
+"""
+Push channel tests: chat writes publish events to the participants'
+connections, slow connections are cut off instead of buffered forever, and
+the socket only accepts a valid JWT.
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import server
+from auth import create_access_token
+from models import MessageCreate
+from realtime import SubscriberRegistry, registry
+
+
+def drain(subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+
+def test_slow_subscriber_is_disconnected_not_buffered():
+    local = SubscriberRegistry(max_queue=3)
+    slow = local.subscribe("u1")
+    fast = local.subscribe("u2")
+
+    for i in range(5):
+        local.publish(["u1"], {"type": "message.created", "data": {"n": i}})
+        local.publish(["u2"], {"type": "message.created", "data": {"n": i}})
+        drain(fast)
+
+    assert slow.overflowed
+    assert drain(slow) == [None]  # only the close marker is left
+    assert not fast.overflowed
+    assert local.stats()["disconnected_slow"] == 1
+
+
+def test_send_and_read_push_events_to_participants(mongo):
+    db, _ = mongo
+    tenant_id, owner_id = str(ObjectId()), str(ObjectId())
+
+    async def scenario():
+        await db.users.insert_many([
+            {"_id": ObjectId(tenant_id), "email": "t@example.com", "role": "client", "profile": {"full_name": "Tenant"}},
+            {"_id": ObjectId(owner_id), "email": "o@example.com", "role": "service_provider", "profile": {"full_name": "Owner"}}
+        ])
+        result = await db.conversations.insert_one({
+            "participants": sorted([tenant_id, owner_id]),
+            "unread": {tenant_id: 0, owner_id: 0},
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        conversation_id = str(result.inserted_id)
+
+        tenant_socket = registry.subscribe(tenant_id)
+        owner_socket = registry.subscribe(owner_id)
+        try:
+            await server.send_message(
+                conversation_id, MessageCreate(content="Hello"),
+                current_user={"user_id": tenant_id, "role": "client"}, idempotency_key=None
+            )
+            after_send = (drain(tenant_socket), drain(owner_socket))
+            await server.get_messages(
+                conversation_id, skip=0, limit=50, page_cursor=None, latest=False,
+                current_user={"user_id": owner_id, "role": "service_provider"}
+            )
+            after_read = (drain(tenant_socket), drain(owner_socket))
+        finally:
+            registry.unsubscribe(tenant_socket)
+            registry.unsubscribe(owner_socket)
+        return conversation_id, after_send, after_read
+
+    conversation_id, (tenant_events, owner_events), (tenant_read, owner_read) = asyncio.run(scenario())
+
+    assert [e["type"] for e in tenant_events] == ["message.created"]
+    assert [e["type"] for e in owner_events] == ["message.created", "unread.changed"]
+    assert owner_events[1]["data"] == {"conversation_id": conversation_id, "unread_count": 1}
+
+    assert [e["type"] for e in tenant_read] == ["conversation.read"]
+    assert tenant_read[0]["data"]["reader_id"] == owner_id
+    assert owner_read == [{"type": "unread.changed", "data": {"conversation_id": conversation_id, "unread_count": 0}}]
+
+
+def test_socket_requires_valid_token():
+    client = TestClient(server.app)
+
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/ws?token=not-a-jwt") as websocket:
+            websocket.receive_text()
+    assert exc.value.code == 1008
+
+    token = create_access_token({"sub": str(ObjectId()), "role": "client"})
+    with client.websocket_connect(f"/api/ws?token={token}") as websocket:
+        websocket.send_text("ping")
+        assert websocket.receive_text() == "pong"
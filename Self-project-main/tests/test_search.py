@@ -0,0 +1,47 @@
+"""
+Search normalization tests: indexed text and user queries must normalize the
+same way so Arabic spelling variants and English case differences still match.
+"""
+from search import text_fields, text_query, location_fields, place_key, place_filter
+
+
+def test_arabic_variants_match_query_terms():
+    fields = text_fields({
+        "title": "السَّكنُ الجامعيّ للطالبات",
+        "description": "شقة مفروشة قريبة من الجامعة",
+        "category": "residence"
+    })
+    indexed = set(fields["search_title"].split()) | set(fields["search_body"].split())
+
+    for term in text_query("سكن جامعي طالبات مفروشه").split():
+        assert term in indexed
+
+
+def test_english_terms_are_case_folded():
+    fields = text_fields({
+        "title": "Furnished Apartment",
+        "description": "Near SQU",
+        "category": "residence",
+        "residence": {"amenities": ["WiFi", "Parking"]}
+    })
+    assert fields["search_title"] == "furnished apartment"
+    assert fields["search_tags"] == "residence wifi parking"
+    assert text_query("  WIFI ") == "wifi"
+
+
+def test_location_point_is_longitude_first():
+    fields = location_fields({"coordinates": {"lat": 23.59, "lng": 58.17}})
+    assert fields["location_point"] == {"type": "Point", "coordinates": [58.17, 23.59]}
+
+
+def test_place_keys_are_canonical():
+    assert place_key("  MUSCAT ") == "muscat"
+    assert place_key("مسقط") == "muscat"
+    assert place_key("SQU") == "sultan qaboos university"
+
+
+def test_place_filter_is_anchored_unless_fuzzy():
+    assert place_filter("location.city", "city_key", "Mus") == {"city_key": {"$regex": "^mus"}}
+    assert place_filter("location.city", "city_key", "cat", fuzzy=True) == {
+        "location.city": {"$regex": "cat", "$options": "i"}
+    }
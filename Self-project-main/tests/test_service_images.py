@@ -0,0 +1,153 @@
+"""
+Service image pipeline tests: listing images are stored once with rendered
+size variants, lists carry only thumbnails and the detail view the large ones,
+and a listing never deletes another provider's blobs.
+"""
+import asyncio
+import base64
+import io
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from PIL import Image
+
+import server
+from blobs import files_collection, get_blob_info, read_blob
+from images import IMAGE_URL, IMAGE_VARIANTS, ImageProcessor
+from models import ServiceCreate, ServiceUpdate
+
+EXTERNAL_IMAGE = "https://cdn.example.com/van.jpg"
+
+
+def photo_data_uri(width=2400, height=1200) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (30, 120, 200)).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def image_size(data: bytes) -> tuple:
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+def blob_id(url: str) -> ObjectId:
+    return ObjectId(IMAGE_URL.match(url).group(1))
+
+
+async def seed_provider(db, email="vans@example.com") -> dict:
+    provider_id = ObjectId()
+    await db.users.insert_one({
+        "_id": provider_id,
+        "email": email,
+        "role": "service_provider",
+        "profile": {"full_name": "Campus Vans", "verification_status": "verified"}
+    })
+    return {"user_id": str(provider_id), "role": "service_provider"}
+
+
+def service_payload(images) -> ServiceCreate:
+    return ServiceCreate(
+        service_type="transportation",
+        title="Morning shuttle",
+        description="Daily campus shuttle",
+        category="shuttle",
+        images=images,
+        price_monthly=40.0,
+        capacity=10,
+        location={
+            "address": "Al Khoud",
+            "coordinates": {"lat": 23.59, "lng": 58.17},
+            "city": "Muscat",
+            "university_nearby": "Sultan Qaboos University"
+        },
+        transportation={"vehicle_type": "van"}
+    )
+
+
+def test_created_service_stores_variants_and_lists_thumbnails(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        provider = await seed_provider(db)
+        created = await server.create_service(service_payload([photo_data_uri(), EXTERNAL_IMAGE]), current_user=provider)
+        stored = await db.services.find_one({"_id": ObjectId(created["id"])})
+        thumb = await read_blob(db, blob_id(stored["image_variants"][0]["thumb"]))
+        large = await read_blob(db, blob_id(stored["image_variants"][0]["large"]))
+        listed = await server.list_services(
+            service_type=None, min_price=None, max_price=None, city=None,
+            university=None, min_rating=None, fuzzy_location=False, skip=0, limit=20,
+            page_cursor=None
+        )
+        detail = await server.get_service(created["id"])
+        return stored, thumb, large, listed, detail
+
+    stored, thumb, large, listed, detail = asyncio.run(scenario())
+
+    # The base64 payload is gone from the document
+    assert all(not image.startswith("data:") for image in stored["images"])
+    assert stored["images"][1] == EXTERNAL_IMAGE
+    assert max(image_size(thumb)) == IMAGE_VARIANTS["thumb"]
+    assert max(image_size(large)) == IMAGE_VARIANTS["large"]
+
+    variants = stored["image_variants"]
+    assert listed[0]["images"] == [variants[0]["thumb"], EXTERNAL_IMAGE]
+    assert detail["images"] == [variants[0]["large"], EXTERNAL_IMAGE]
+
+
+def test_update_reuses_kept_images_and_drops_removed_ones(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        provider = await seed_provider(db)
+        created = await server.create_service(
+            service_payload([photo_data_uri(), photo_data_uri(800, 800)]), current_user=provider
+        )
+        before = await db.services.find_one({"_id": ObjectId(created["id"])})
+        blobs_before = await files_collection(db).count_documents({})
+
+        # The edit screen sends back the URLs it was given for the image it keeps
+        await server.update_service(
+            created["id"], ServiceUpdate(images=[created["images"][0]]), current_user=provider
+        )
+        after = await db.services.find_one({"_id": ObjectId(created["id"])})
+        blobs_after = await files_collection(db).count_documents({})
+        return before, after, blobs_before, blobs_after
+
+    before, after, blobs_before, blobs_after = asyncio.run(scenario())
+    assert after["image_variants"] == before["image_variants"][:1]
+    per_image = 1 + len(IMAGE_VARIANTS)
+    assert blobs_before == 2 * per_image
+    assert blobs_after == per_image
+
+
+def test_foreign_images_are_copied_and_never_deleted(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        owner = await seed_provider(db)
+        other = await seed_provider(db, email="other@example.com")
+        theirs = await server.create_service(service_payload([photo_data_uri()]), current_user=owner)
+        their_original = (await db.services.find_one({"_id": ObjectId(theirs["id"])}))["images"][0]
+
+        mine = await server.create_service(service_payload([their_original]), current_user=other)
+        copied = (await db.services.find_one({"_id": ObjectId(mine["id"])}))["images"][0]
+        await server.update_service(mine["id"], ServiceUpdate(images=[]), current_user=other)
+        return their_original, copied, await get_blob_info(db, blob_id(their_original))
+
+    their_original, copied, still_there = asyncio.run(scenario())
+    assert copied != their_original
+    assert still_there is not None
+
+
+def test_decompression_bomb_is_a_bad_request(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    processor = ImageProcessor(max_workers=1)
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100)).save(buffer, "PNG")
+    try:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(processor.render(buffer.getvalue()))
+    finally:
+        processor.shutdown()
+    assert exc.value.status_code == 400
@@ -0,0 +1,94 @@
+"""
+Query-count regression tests for the service listing endpoints.
+Each page must be served with a fixed number of round trips, no matter how
+many services (or distinct providers) it contains.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import server
+from models import ServiceFilters
+
+PAGE_SIZE = 100
+# One find for the services page + one batched $in lookup for providers
+MAX_ROUND_TRIPS = 2
+
+
+async def seed_services(db, providers=10, services=PAGE_SIZE):
+    provider_ids = [ObjectId() for _ in range(providers)]
+    await db.users.insert_many([{
+        "_id": pid,
+        "email": f"provider{i}@example.com",
+        "role": "service_provider",
+        "profile": {"full_name": f"Provider {i}", "verification_status": "verified"}
+    } for i, pid in enumerate(provider_ids)])
+
+    now = datetime.utcnow()
+    await db.services.insert_many([{
+        "provider_id": provider_ids[i % providers],
+        "service_type": "transportation",
+        "title": f"Route {i}",
+        "description": "Daily campus shuttle",
+        "images": [],
+        "price_monthly": 40.0,
+        "capacity": 10,
+        "available_slots": 10,
+        "location": {
+            "address": "Al Khoud",
+            "coordinates": {"lat": 23.59, "lng": 58.17},
+            "city": "Muscat",
+            "university_nearby": "Sultan Qaboos University"
+        },
+        "rating": {"average": 0.0, "count": 0},
+        "safety_score": 100.0,
+        "status": "active",
+        "created_at": now - timedelta(minutes=i),
+        "updated_at": now
+    } for i in range(services)])
+    return provider_ids
+
+
+def test_list_services_uses_batched_provider_lookup(mongo):
+    db, counter = mongo
+    asyncio.run(seed_services(db))
+    counter.reset()
+
+    results = asyncio.run(server.list_services(
+        service_type=None, min_price=None, max_price=None, city=None,
+        university=None, min_rating=None, fuzzy_location=False, skip=0, limit=PAGE_SIZE,
+        page_cursor=None
+    ))
+
+    assert len(results) == PAGE_SIZE
+    assert results[0]["provider_name"].startswith("Provider")
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
+
+
+def test_search_services_uses_batched_provider_lookup(mongo):
+    db, counter = mongo
+    asyncio.run(seed_services(db))
+    counter.reset()
+
+    results = asyncio.run(server.search_services(ServiceFilters(limit=PAGE_SIZE)))
+
+    assert len(results) == PAGE_SIZE
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
+
+
+def test_admin_and_provider_listings_use_batched_provider_lookup(mongo):
+    db, counter = mongo
+    provider_ids = asyncio.run(seed_services(db, providers=1))
+    counter.reset()
+
+    admin = {"user_id": str(ObjectId()), "role": "admin"}
+    results = asyncio.run(server.admin_list_services(export_format="json", skip=0, limit=500, current_user=admin))
+    assert len(results) == PAGE_SIZE
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
+
+    counter.reset()
+    provider = {"user_id": str(provider_ids[0]), "role": "service_provider"}
+    results = asyncio.run(server.get_my_listings(current_user=provider, skip=0, limit=PAGE_SIZE))
+    assert len(results) == PAGE_SIZE
+    assert counter.count <= MAX_ROUND_TRIPS, counter.commands
@@ -0,0 +1,159 @@
+"""
+Slot reservation tests: confirms take a slot with a conditional decrement, so
+a burst of concurrent confirms against one service never overbooks it.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+from reservations import reconcile_slots
+
+CONFIRMS = int(os.getenv("SLOT_LOAD_CONFIRMS", "2000"))
+CAPACITY = 150
+
+
+async def seed_service(db, capacity):
+    provider_id, service_id = ObjectId(), ObjectId()
+    await db.users.insert_one(
+        {"_id": provider_id, "role": "service_provider", "profile": {"full_name": "Provider"}}
+    )
+    await db.services.insert_one(
+        {"_id": service_id, "title": "Route 7", "capacity": capacity, "available_slots": capacity}
+    )
+    return service_id, provider_id
+
+
+async def seed_contracts(db, service_id, provider_id, count, status="awaiting_student_confirmation"):
+    students = [ObjectId() for _ in range(count)]
+    await db.users.insert_many([
+        {"_id": student_id, "role": "client", "profile": {"full_name": f"Student {i}"}}
+        for i, student_id in enumerate(students)
+    ])
+    now = datetime.utcnow()
+    result = await db.contracts.insert_many([{
+        "student_id": student_id,
+        "provider_id": provider_id,
+        "service_id": service_id,
+        "start_date": datetime(2025, 9, 1),
+        "end_date": datetime(2025, 12, 1),
+        "monthly_price": 40.0,
+        "duration_months": 3,
+        "total_amount": 120.0,
+        "auto_generated_terms": "TERMS",
+        "student_signature": {"signed": False},
+        "provider_signature": {"signed": True},
+        "payment_schedule": [],
+        "status": status,
+        "created_at": now,
+        "updated_at": now
+    } for student_id in students])
+    return [
+        (str(contract_id), {"user_id": str(student_id), "role": "client"})
+        for contract_id, student_id in zip(result.inserted_ids, students)
+    ]
+
+
+def test_concurrent_confirms_never_overbook(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, provider_id = await seed_service(db, CAPACITY)
+        contracts = await seed_contracts(db, service_id, provider_id, CONFIRMS)
+        results = await asyncio.gather(*[
+            server.student_confirm_contract(contract_id, current_user=student)
+            for contract_id, student in contracts
+        ], return_exceptions=True)
+        service = await db.services.find_one({"_id": service_id})
+        active = await db.contracts.count_documents({"service_id": service_id, "status": "active"})
+        return results, service, active
+
+    results, service, active = asyncio.run(scenario())
+    wins = [r for r in results if isinstance(r, dict)]
+    full = [r for r in results if isinstance(r, HTTPException) and "No available slots" in r.detail]
+    assert len(wins) == CAPACITY
+    assert len(full) == CONFIRMS - CAPACITY
+    assert active == CAPACITY
+    assert service["available_slots"] == 0
+
+
+def test_cancel_only_releases_slots_of_active_contracts(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, provider_id = await seed_service(db, 3)
+        (pending_id, pending_student), = await seed_contracts(db, service_id, provider_id, 1)
+        (active_id, active_student), = await seed_contracts(db, service_id, provider_id, 1)
+        await server.student_confirm_contract(active_id, current_user=active_student)
+
+        await server.cancel_contract(pending_id, current_user=pending_student)
+        after_pending = (await db.services.find_one({"_id": service_id}))["available_slots"]
+        await server.cancel_contract(active_id, current_user=active_student)
+        after_active = (await db.services.find_one({"_id": service_id}))["available_slots"]
+        return after_pending, after_active
+
+    assert asyncio.run(scenario()) == (2, 3)
+
+
+def test_confirm_on_full_service_leaves_contract_untouched(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, provider_id = await seed_service(db, 0)
+        (contract_id, student), = await seed_contracts(db, service_id, provider_id, 1)
+        with pytest.raises(HTTPException) as exc:
+            await server.student_confirm_contract(contract_id, current_user=student)
+        contract = await db.contracts.find_one({"_id": ObjectId(contract_id)})
+        service = await db.services.find_one({"_id": service_id})
+        return exc.value, contract, service
+
+    exc, contract, service = asyncio.run(scenario())
+    assert exc.status_code == 400
+    assert contract["status"] == "awaiting_student_confirmation"
+    assert service["available_slots"] == 0
+
+
+def test_confirm_in_wrong_status_writes_nothing(mongo):
+    db, counter = mongo
+
+    async def scenario():
+        service_id, provider_id = await seed_service(db, 3)
+        (contract_id, student), = await seed_contracts(db, service_id, provider_id, 1, status="active")
+        (_, stranger), = await seed_contracts(db, service_id, provider_id, 1)
+        counter.reset()
+        errors = []
+        for user, target in ((student, contract_id), (stranger, contract_id), (student, str(ObjectId()))):
+            with pytest.raises(HTTPException) as exc:
+                await server.student_confirm_contract(target, current_user=user)
+            errors.append(exc.value.status_code)
+        service = await db.services.find_one({"_id": service_id})
+        return errors, list(counter.commands), service
+
+    errors, commands, service = asyncio.run(scenario())
+    assert errors == [400, 403, 404]
+    assert all(command[0] == "find" for command in commands), commands
+    assert service["available_slots"] == 3
+
+
+def test_reconcile_slots_repairs_drift(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, provider_id = await seed_service(db, 10)
+        contracts = await seed_contracts(db, service_id, provider_id, 4)
+        for contract_id, student in contracts:
+            await server.student_confirm_contract(contract_id, current_user=student)
+        await db.services.update_one({"_id": service_id}, {"$set": {"available_slots": -2}})
+        audit = await reconcile_slots(db, apply=False)
+        fixed = await reconcile_slots(db)
+        service = await db.services.find_one({"_id": service_id})
+        return audit, fixed, service
+
+    audit, fixed, service = asyncio.run(scenario())
+    assert audit["drifted"] == 1 and audit["applied"] is False
+    assert fixed["drifted"] == 1
+    assert service["available_slots"] == 6
@@ -0,0 +1,195 @@
+"""
+Streaming upload tests: multipart bodies go straight into the blob store,
+limits are enforced mid-stream, JSON endpoints accept the returned ids and
+anonymous uploads can only be claimed with their token.
+"""
+import asyncio
+import os
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+from blobs import CHUNK_SIZE, chunks_collection, files_collection, read_blob
+from models import UploadKind, UserCreate, UserRole
+from uploads import ANONYMOUS_UPLOAD_BYTES_PER_IP, UPLOAD_KINDS
+
+BOUNDARY = "muyassir-test-boundary"
+PDF = b"%PDF-1.4\n" + os.urandom(CHUNK_SIZE + 4321)
+PNG = b"\x89PNG\r\n\x1a\n" + os.urandom(2048)
+
+
+def multipart_body(data: bytes, file_type: str, filename: str = "upload.bin") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {file_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def streamed_request(body: bytes, piece: int = 8192) -> Request:
+    """A request whose body arrives in small pieces, like a real client upload"""
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)]
+
+    async def receive():
+        data = pieces.pop(0) if pieces else b""
+        return {"type": "http.request", "body": data, "more_body": bool(pieces)}
+
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/uploads",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    }, receive)
+
+
+def upload(body: bytes, kind: UploadKind, current_user=None):
+    return server.upload_file(request=streamed_request(body), kind=kind, current_user=current_user)
+
+
+def test_upload_streams_into_blob_store(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        result = await upload(multipart_body(PDF, "application/pdf", "civil-id.pdf"), UploadKind.VERIFICATION_DOCUMENT)
+        data = await read_blob(db, ObjectId(result["id"]))
+        return result, data
+
+    result, data = asyncio.run(scenario())
+    assert result["size"] == len(PDF)
+    assert result["file_name"] == "civil-id.pdf"
+    assert result["url"] == f"/api/documents/{result['id']}"
+    assert data == PDF
+
+
+@pytest.mark.parametrize("data,file_type,code", [
+    (PNG, "image/gif", 415),
+    (b"not really a pdf at all", "application/pdf", 415),
+    (b"RIFF\x00\x10\x00\x00AVI LIST" + os.urandom(256), "image/webp", 415),
+    (b"%PDF-" + b"0" * UPLOAD_KINDS["verification_document"]["max_bytes"], "application/pdf", 413),
+])
+def test_rejected_upload_leaves_no_chunks(mongo, data, file_type, code):
+    db, _ = mongo
+    kind = UploadKind.SERVICE_IMAGE if file_type == "image/webp" else UploadKind.VERIFICATION_DOCUMENT
+    provider = {"user_id": str(ObjectId()), "role": "service_provider"}
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(upload(multipart_body(data, file_type), kind, provider))
+
+    assert exc.value.status_code == code
+    assert asyncio.run(chunks_collection(db).count_documents({})) == 0
+    assert asyncio.run(files_collection(db).count_documents({})) == 0
+
+
+def test_service_images_need_a_provider(mongo):
+    student = {"user_id": str(ObjectId()), "role": "client"}
+    for current_user in (None, student):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(upload(multipart_body(PNG, "image/png"), UploadKind.SERVICE_IMAGE, current_user))
+        assert exc.value.status_code == 403
+
+
+def test_register_claims_uploaded_document(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        uploaded = await upload(multipart_body(PDF, "application/pdf", "cr.pdf"), UploadKind.VERIFICATION_DOCUMENT)
+        token = await server.register(UserCreate(
+            email="provider@example.com",
+            password="secret123",
+            role=UserRole.SERVICE_PROVIDER,
+            full_name="Provider",
+            verification_document_id=uploaded["id"],
+            verification_document_token=uploaded["claim_token"]
+        ))
+        info = await files_collection(db).find_one({"_id": ObjectId(uploaded["id"])})
+        return uploaded, token, info
+
+    uploaded, token, info = asyncio.run(scenario())
+    profile = token["user"]["profile"]
+    assert profile["verification_status"] == "pending"
+    assert str(profile["verification_documents"][0]["file_id"]) == uploaded["id"]
+    assert str(info["metadata"]["owner_id"]) == token["user"]["id"]
+    assert info["metadata"]["attached"] is True
+    assert "claim_token_hash" not in info["metadata"]
+
+    # An upload can only be attached once
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(server.register(UserCreate(
+            email="other@example.com",
+            password="secret123",
+            role=UserRole.SERVICE_PROVIDER,
+            full_name="Other",
+            verification_document_id=uploaded["id"],
+            verification_document_token=uploaded["claim_token"]
+        )))
+    assert exc.value.status_code == 400
+
+
+def test_anonymous_upload_needs_its_claim_token(mongo):
+    db, _ = mongo
+
+    def register(email, upload_id, token):
+        return server.register(UserCreate(
+            email=email,
+            password="secret123",
+            role=UserRole.CLIENT,
+            full_name="Student",
+            verification_document_id=upload_id,
+            verification_document_token=token
+        ))
+
+    async def scenario():
+        victim = await upload(multipart_body(PDF, "application/pdf"), UploadKind.VERIFICATION_DOCUMENT)
+        attacker = await upload(multipart_body(PDF, "application/pdf"), UploadKind.VERIFICATION_DOCUMENT)
+        codes = []
+        for token in (None, attacker["claim_token"], "guess"):
+            with pytest.raises(HTTPException) as exc:
+                await register(f"attacker{len(codes)}@example.com", victim["id"], token)
+            codes.append(exc.value.status_code)
+        stored = await files_collection(db).find_one({"_id": ObjectId(victim["id"])})
+        return victim, codes, stored
+
+    victim, codes, stored = asyncio.run(scenario())
+    assert codes == [400, 400, 400]
+    assert stored["metadata"]["attached"] is False
+    assert victim["claim_token"] not in str(stored)
+
+
+def test_anonymous_uploads_are_capped_per_address(mongo):
+    allowed = ANONYMOUS_UPLOAD_BYTES_PER_IP // UPLOAD_KINDS["verification_document"]["max_bytes"]
+    body = multipart_body(b"%PDF-" + b"0" * (UPLOAD_KINDS["verification_document"]["max_bytes"] - 5), "application/pdf")
+
+    async def scenario():
+        for _ in range(allowed):
+            await upload(body, UploadKind.VERIFICATION_DOCUMENT)
+        with pytest.raises(HTTPException) as exc:
+            await upload(body, UploadKind.VERIFICATION_DOCUMENT)
+        # Signed-in uploads do not count against the anonymous budget
+        provider = {"user_id": str(ObjectId()), "role": "service_provider"}
+        await upload(body, UploadKind.VERIFICATION_DOCUMENT, provider)
+        return exc.value
+
+    assert asyncio.run(scenario()).status_code == 429
+
+
+def test_service_images_accept_upload_ids(mongo):
+    provider = {"user_id": str(ObjectId()), "role": "service_provider"}
+    other = {"user_id": str(ObjectId()), "role": "service_provider"}
+
+    async def scenario():
+        mine = await upload(multipart_body(PNG, "image/png"), UploadKind.SERVICE_IMAGE, provider)
+        theirs = await upload(multipart_body(PNG, "image/png"), UploadKind.SERVICE_IMAGE, other)
+        images = await server.resolve_service_images(
+            [mine["id"], "https://cdn.example.com/bus.jpg"], ObjectId(provider["user_id"])
+        )
+        try:
+            await server.resolve_service_images([theirs["id"]], ObjectId(provider["user_id"]))
+        except HTTPException as exc:
+            return mine, images, exc.status_code
+
+    mine, images, stolen_code = asyncio.run(scenario())
+    assert images == [f"/api/images/{mine['id']}", "https://cdn.example.com/bus.jpg"]
+    assert stolen_code == 400
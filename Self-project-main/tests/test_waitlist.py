@@ -0,0 +1,323 @@
+"""
+Waitlist tests: students queue on a full service and the head of the line is
+turned into a contract request whenever a slot is freed; the student hears
+about it, a suspended service keeps its line, and a promotion left
+unanswered expires.
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+from models import ContractCreate, WaitlistJoin
+
+
+async def seed_full_service(db, waiting=3, active=1):
+    provider_id, service_id = ObjectId(), ObjectId()
+    await db.users.insert_one({
+        "_id": provider_id, "role": "service_provider",
+        "profile": {"full_name": "Provider", "verification_status": "verified"}
+    })
+    await db.services.insert_one({
+        "_id": service_id,
+        "provider_id": provider_id,
+        "service_type": "transportation",
+        "title": "Route 7",
+        "price_monthly": 40.0,
+        "capacity": active,
+        "available_slots": 0,
+        "location": {"address": "Al Khoudh", "city": "Muscat", "university_nearby": "SQU"},
+        "transportation": {"vehicle_type": "bus", "route": [], "amenities": []},
+        "auto_accept": False,
+        "status": "active"
+    })
+
+    students = []
+    for i in range(active + waiting):
+        student_id = ObjectId()
+        await db.users.insert_one({
+            "_id": student_id, "role": "client",
+            "profile": {"full_name": f"Student {i}", "verification_status": "verified"}
+        })
+        students.append({"user_id": str(student_id), "role": "client"})
+
+    holders = []
+    for student in students[:active]:
+        result = await db.contracts.insert_one({
+            "student_id": ObjectId(student["user_id"]),
+            "provider_id": provider_id,
+            "service_id": service_id,
+            "start_date": datetime(2030, 1, 1),
+            "end_date": datetime(2030, 4, 1),
+            "monthly_price": 40.0,
+            "duration_months": 3,
+            "total_amount": 120.0,
+            "auto_generated_terms": "TERMS",
+            "student_signature": {"signed": True},
+            "provider_signature": {"signed": True},
+            "payment_schedule": [],
+            "status": "active",
+            "slot_reserved": True,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        holders.append((str(result.inserted_id), student))
+    return str(service_id), holders, students[active:]
+
+
+def join(service_id, student):
+    return server.join_waitlist(
+        service_id,
+        WaitlistJoin(start_date=date(2030, 9, 1), duration_months=3),
+        current_user=student
+    )
+
+
+def test_join_assigns_fifo_positions(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, _, waiting = await seed_full_service(db)
+        entries = [await join(service_id, student) for student in waiting]
+        with pytest.raises(HTTPException) as duplicate:
+            await join(service_id, waiting[0])
+        return entries, duplicate.value
+
+    entries, duplicate = asyncio.run(scenario())
+    assert [e["position"] for e in entries] == [1, 2, 3]
+    assert all(e["status"] == "waiting" for e in entries)
+    assert duplicate.status_code == 400
+
+
+def test_join_refused_while_slots_are_free(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, _, waiting = await seed_full_service(db)
+        await db.services.update_one({"_id": ObjectId(service_id)}, {"$set": {"available_slots": 1}})
+        with pytest.raises(HTTPException) as exc:
+            await join(service_id, waiting[0])
+        return exc.value
+
+    assert asyncio.run(scenario()).status_code == 400
+
+
+def test_cancel_promotes_head_of_line(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db)
+        for student in waiting:
+            await join(service_id, student)
+        contract_id, holder = holders[0]
+        await server.cancel_contract(contract_id, current_user=holder)
+
+        first = await server.get_my_waitlist(current_user=waiting[0])
+        second = await server.get_my_waitlist(current_user=waiting[1])
+        promoted = await db.contracts.find_one({"student_id": ObjectId(waiting[0]["user_id"])})
+        return first[0], second[0], promoted
+
+    first, second, promoted = asyncio.run(scenario())
+    assert first["status"] == "promoted"
+    assert first["contract_id"] == str(promoted["_id"])
+    assert promoted["status"] == "pending_provider_approval"
+    assert promoted["slot_reserved"] is True
+    assert promoted["start_date"] == datetime(2030, 9, 1)
+    assert second["status"] == "waiting"
+    assert second["position"] == 1
+
+
+def test_concurrent_frees_promote_distinct_students(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=4, active=3)
+        for student in waiting:
+            await join(service_id, student)
+        await asyncio.gather(
+            server.cancel_contract(holders[0][0], current_user=holders[0][1]),
+            server.cancel_contract(holders[1][0], current_user=holders[1][1]),
+            server.complete_contract(holders[2][0], current_user=holders[2][1])
+        )
+        promoted = await db.contracts.find(
+            {"service_id": ObjectId(service_id), "status": "pending_provider_approval"}
+        ).to_list(length=10)
+        still_waiting = await db.waitlist.count_documents({"status": "waiting"})
+        return promoted, still_waiting, waiting
+
+    promoted, still_waiting, waiting = asyncio.run(scenario())
+    assert sorted(str(c["student_id"]) for c in promoted) == sorted(s["user_id"] for s in waiting[:3])
+    assert still_waiting == 1
+
+
+def test_promoted_student_keeps_the_freed_slot(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=2)
+        await join(service_id, waiting[0])
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        slots_after_cancel = (await db.services.find_one({"_id": ObjectId(service_id)}))["available_slots"]
+
+        with pytest.raises(HTTPException) as newcomer:
+            await server.record_contract(
+                ContractCreate(service_id=service_id, start_date=date(2030, 9, 1), duration_months=3),
+                waiting[1]
+            )
+
+        promoted = await db.contracts.find_one({"student_id": ObjectId(waiting[0]["user_id"])})
+        provider = {"user_id": str(promoted["provider_id"]), "role": "service_provider"}
+        await server.provider_accept_contract(str(promoted["_id"]), current_user=provider)
+        confirmed = await server.student_confirm_contract(str(promoted["_id"]), current_user=waiting[0])
+        service = await db.services.find_one({"_id": ObjectId(service_id)})
+        return slots_after_cancel, newcomer.value, confirmed, service
+
+    slots_after_cancel, newcomer, confirmed, service = asyncio.run(scenario())
+    assert slots_after_cancel == 0
+    assert newcomer.status_code == 400
+    assert confirmed["status"] == "active"
+    assert service["available_slots"] == 0
+
+
+def test_rejected_promotion_passes_the_slot_on(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=2)
+        for student in waiting:
+            await join(service_id, student)
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        first = await db.contracts.find_one({"student_id": ObjectId(waiting[0]["user_id"])})
+        provider = {"user_id": str(first["provider_id"]), "role": "service_provider"}
+        await server.provider_reject_contract(str(first["_id"]), current_user=provider)
+        second = await db.contracts.find_one({"student_id": ObjectId(waiting[1]["user_id"])})
+        service = await db.services.find_one({"_id": ObjectId(service_id)})
+        return second, service
+
+    second, service = asyncio.run(scenario())
+    assert second["slot_reserved"] is True
+    assert service["available_slots"] == 0
+
+
+def test_missing_student_or_service_does_not_break_the_cancel(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=2, active=2)
+        for student in waiting:
+            await join(service_id, student)
+        # The head of the line deleted their account: the next student is promoted
+        await db.users.delete_one({"_id": ObjectId(waiting[0]["user_id"])})
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        entries = {str(e["student_id"]): e["status"] async for e in db.waitlist.find({})}
+
+        # The service is gone: the cancel still succeeds and nobody is promoted
+        await db.waitlist.update_many({}, {"$set": {"status": "waiting"}})
+        await db.services.delete_one({"_id": ObjectId(service_id)})
+        cancelled = await server.cancel_contract(holders[1][0], current_user=holders[1][1])
+        still_waiting = await db.waitlist.count_documents({"status": "waiting"})
+        return entries, cancelled, still_waiting
+
+    entries, cancelled, still_waiting = asyncio.run(scenario())
+    assert sorted(entries.values()) == ["left", "promoted"]
+    assert cancelled["status"] == "cancelled"
+    assert still_waiting == 2
+
+
+def test_promoted_student_is_notified(mongo, monkeypatch):
+    db, _ = mongo
+    pushed = []
+
+    async def record(user_ids, event_type, data, topic="chat"):
+        pushed.append(([str(user_id) for user_id in user_ids], event_type, data))
+    monkeypatch.setattr(server, "notify", record)
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=1)
+        await join(service_id, waiting[0])
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        promoted = await db.contracts.find_one({"student_id": ObjectId(waiting[0]["user_id"])})
+        return waiting[0], promoted
+
+    student, promoted = asyncio.run(scenario())
+    promotions = [p for p in pushed if p[1] == "waitlist.promoted"]
+    assert promotions == [([student["user_id"]], "waitlist.promoted", {
+        "entry_id": str(promoted["waitlist_entry_id"]),
+        "contract_id": str(promoted["_id"]),
+        "service_id": str(promoted["service_id"])
+    })]
+
+
+def test_suspended_service_keeps_its_line_until_unsuspended(mongo):
+    db, _ = mongo
+    admin = {"user_id": str(ObjectId()), "role": "admin"}
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=1)
+        await join(service_id, waiting[0])
+        await server.admin_suspend_service(service_id, current_user=admin)
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        suspended = await db.services.find_one({"_id": ObjectId(service_id)})
+        promoted_while_suspended = await db.contracts.count_documents({"waitlist_entry_id": {"$exists": True}})
+
+        await server.admin_unsuspend_service(service_id, current_user=admin)
+        promoted = await db.contracts.find_one({"student_id": ObjectId(waiting[0]["user_id"])})
+        service = await db.services.find_one({"_id": ObjectId(service_id)})
+        return suspended, promoted_while_suspended, promoted, service
+
+    suspended, promoted_while_suspended, promoted, service = asyncio.run(scenario())
+    assert suspended["available_slots"] == 1
+    assert promoted_while_suspended == 0
+    assert promoted["slot_reserved"] is True
+    assert service["available_slots"] == 0
+
+
+def test_unanswered_promotion_expires_and_passes_the_slot_on(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=2)
+        for student in waiting:
+            await join(service_id, student)
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        assert await server.expire_stale_promotions() == 0
+
+        await db.contracts.update_one(
+            {"student_id": ObjectId(waiting[0]["user_id"])},
+            {"$set": {"updated_at": datetime.utcnow() - timedelta(days=3)}}
+        )
+        expired = await server.expire_stale_promotions()
+        first = await db.contracts.find_one({"student_id": ObjectId(waiting[0]["user_id"])})
+        second = await db.contracts.find_one({"student_id": ObjectId(waiting[1]["user_id"])})
+        entries = await server.get_my_waitlist(current_user=waiting[0])
+        service = await db.services.find_one({"_id": ObjectId(service_id)})
+        return expired, first, second, entries[0], service
+
+    expired, first, second, entry, service = asyncio.run(scenario())
+    assert expired == 1
+    assert first["status"] == "cancelled"
+    assert entry["status"] == "left"
+    assert second["status"] == "pending_provider_approval"
+    assert second["slot_reserved"] is True
+    assert service["available_slots"] == 0
+
+
+def test_leave_waitlist(mongo):
+    db, _ = mongo
+
+    async def scenario():
+        service_id, holders, waiting = await seed_full_service(db, waiting=2)
+        entry = await join(service_id, waiting[0])
+        await join(service_id, waiting[1])
+        await server.leave_waitlist(entry["id"], current_user=waiting[0])
+        with pytest.raises(HTTPException) as again:
+            await server.leave_waitlist(entry["id"], current_user=waiting[0])
+        await server.cancel_contract(holders[0][0], current_user=holders[0][1])
+        return again.value, await server.get_my_waitlist(current_user=waiting[1])
+
+    again, entries = asyncio.run(scenario())
+    assert again.status_code == 404
+    assert entries[0]["status"] == "promoted"